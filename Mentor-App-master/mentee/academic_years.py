@@ -0,0 +1,71 @@
+"""
+Academic-year catalogue: which years each student has records in (StudentAcademicYear).
+
+Signals refresh one student's rows whenever an achievement or semester result is saved or deleted,
+so building a year dropdown is one DISTINCT over the catalogue rows of a mentor's cohort or a
+department, whatever the size of the record tables. `manage.py rebuild_academic_years` backfills it.
+Filter dropdowns add the configured AY choices (filter_years), so a year can be picked before its
+first upload.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count
+
+from . import analytics_cache
+from .achievements import ACHIEVEMENT_CATEGORIES
+from .models import AY, MentorMentee, SemesterResult, StudentAcademicYear
+
+YEAR_SOURCES = [model for model, _, _ in ACHIEVEMENT_CATEGORIES.values()] + [SemesterResult]
+
+
+def _year_counts(user_ids=None):
+    """{(user_id, academic_year): records} over every source table (one GROUP BY per table)."""
+    counts = Counter()
+    for model in YEAR_SOURCES:
+        qs = model.objects.filter(user__isnull=False).exclude(academic_year__isnull=True).exclude(academic_year="")
+        if user_ids is not None:
+            qs = qs.filter(user_id__in=user_ids)
+        for r in qs.values("user_id", "academic_year").annotate(n=Count("id")).order_by():
+            counts[(r["user_id"], r["academic_year"])] += r["n"]
+    return counts
+
+
+def _entries(counts):
+    return [StudentAcademicYear(user_id=uid, academic_year=year, records=n) for (uid, year), n in counts.items()]
+
+
+def refresh_student_years(user_id):
+    """Recomputes the catalogue rows of one student (called from signals)."""
+    with transaction.atomic():
+        StudentAcademicYear.objects.filter(user_id=user_id).delete()
+        StudentAcademicYear.objects.bulk_create(_entries(_year_counts([user_id])))
+
+
+def rebuild_student_years(user_ids=None, batch_size=1000):
+    """Rebuilds the catalogue (or only `user_ids`) from the record tables. Returns the number of rows."""
+    entries = _entries(_year_counts(user_ids))
+    with transaction.atomic():
+        stale = StudentAcademicYear.objects.all()
+        if user_ids is not None:
+            stale = stale.filter(user_id__in=user_ids)
+        stale.delete()
+        StudentAcademicYear.objects.bulk_create(entries, batch_size=batch_size)
+    analytics_cache.bump_global()
+    return len(entries)
+
+
+def catalogue_years(mentor=None, branch=None, newest_first=False):
+    """Sorted academic years with records, optionally limited to `mentor`'s mentees and/or a department."""
+    qs = StudentAcademicYear.objects.all()
+    if mentor is not None:
+        qs = qs.filter(user_id__in=MentorMentee.objects.filter(mentor=mentor).values("mentee__user_id"))
+    if branch:
+        qs = qs.filter(user__profile__branch=branch)
+    years = qs.values_list("academic_year", flat=True).distinct().order_by()
+    return sorted(years, reverse=newest_first)
+
+
+def filter_years(mentor=None, branch=None):
+    """Years for a filter dropdown: the configured AY choices plus any other year in the catalogue."""
+    return sorted({value for value, _ in AY} | set(catalogue_years(mentor=mentor, branch=branch)))
@@ -0,0 +1,107 @@
+"""
+AchievementFact rollup: record counts of the six achievement tables per
+(user, category, academic_year, semester, branch, level, prize).
+
+Signals refresh one (user, category) slice whenever a record is saved or deleted, and re-stamp the
+branch when a Profile changes; `manage.py rebuild_achievement_facts` backfills or repairs the table.
+The mentor analytics read this table instead of re-aggregating the raw tables on every request.
+Missing values are stored as "" so the unique key also holds for them.
+"""
+from django.db import transaction
+from django.db.models import Count, Sum, Value
+from django.db.models.functions import Coalesce
+
+from . import analytics_cache
+from .models import (AchievementFact, InternshipPBL, Project, SportsCulturalEvent, CertificationCourse, OtherEvent,
+                     PaperPublication)
+
+# category -> (model, level field, prize field); keys match the chart `category` parameter
+ACHIEVEMENT_CATEGORIES = {
+    "internship": (InternshipPBL, None, None),
+    "project": (Project, None, None),
+    "sports": (SportsCulturalEvent, "level", "prize_won"),
+    "course": (CertificationCourse, "level", None),
+    "other": (OtherEvent, "level", "prize_won"),
+    "paper": (PaperPublication, "level", None),
+}
+
+
+def _fact_rows(category, user_ids=None):
+    """GROUP BY of one raw table into fact dimensions (one query)."""
+    model, level_field, prize_field = ACHIEVEMENT_CATEGORIES[category]
+    qs = model.objects.filter(user__isnull=False)
+    if user_ids is not None:
+        qs = qs.filter(user_id__in=user_ids)
+    return (
+        qs.values("user_id")
+        .annotate(
+            f_academic_year=Coalesce("academic_year", Value("")),
+            f_semester=Coalesce("semester", Value("")),
+            f_level=Coalesce(level_field, Value("")) if level_field else Value(""),
+            f_prize=Coalesce(prize_field, Value("")) if prize_field else Value(""),
+            f_branch=Coalesce("user__profile__branch", Value("")),
+        )
+        .values("user_id", "f_academic_year", "f_semester", "f_level", "f_prize", "f_branch")
+        .annotate(n=Count("id"))
+        .order_by()
+    )
+
+
+def _facts(category, rows):
+    return [
+        AchievementFact(
+            user_id=r["user_id"],
+            category=category,
+            academic_year=r["f_academic_year"],
+            semester=r["f_semester"],
+            level=r["f_level"],
+            prize=r["f_prize"],
+            branch=r["f_branch"],
+            count=r["n"],
+        )
+        for r in rows
+    ]
+
+
+def refresh_achievement_facts(user_id, category):
+    """Recomputes the facts of one user in one category (called from signals)."""
+    with transaction.atomic():
+        AchievementFact.objects.filter(user_id=user_id, category=category).delete()
+        AchievementFact.objects.bulk_create(_facts(category, _fact_rows(category, [user_id])))
+
+
+def update_fact_branch(user_id, branch):
+    """Keeps the denormalised branch in step with Profile.branch (one UPDATE)."""
+    branch = branch or ""
+    AchievementFact.objects.filter(user_id=user_id).exclude(branch=branch).update(branch=branch)
+
+
+def rebuild_achievement_facts(user_ids=None, batch_size=1000):
+    """Rebuilds the table (or only `user_ids`) from the raw tables. Returns the number of fact rows."""
+    total = 0
+    with transaction.atomic():
+        stale = AchievementFact.objects.all()
+        if user_ids is not None:
+            stale = stale.filter(user_id__in=user_ids)
+        stale.delete()
+        for category in ACHIEVEMENT_CATEGORIES:
+            facts = _facts(category, _fact_rows(category, user_ids))
+            AchievementFact.objects.bulk_create(facts, batch_size=batch_size)
+            total += len(facts)
+    analytics_cache.bump_global()
+    return total
+
+
+def branch_totals(user_ids):
+    """{category: [{"user__profile__branch": branch, "total": n}, ...]} for the given users (one query)."""
+    result = {category: [] for category in ACHIEVEMENT_CATEGORIES}
+    rows = (
+        AchievementFact.objects.filter(user_id__in=user_ids)
+        .values("category", "branch")
+        .annotate(total=Sum("count"))
+        .order_by("category", "branch")
+    )
+    for r in rows:
+        result[r["category"]].append({"user__profile__branch": r["branch"], "total": r["total"]})
+    return result
+
@@ -0,0 +1,181 @@
+"""
+Versioned cache for the mentor / HOD analytics.
+
+Cached values are keyed by (endpoint, request params, scope versions). A scope is one of
+
+    ("mentor", <mentor user id>)   a mentor's cohort
+    ("dept", <branch>)             one department
+    ("all",)                       everything (HOD views without a branch filter)
+
+and every key also carries the ("global",) generation. Signals bump the scopes a write touches
+(see signals.py), and the rebuild commands bump the global generation after bulk changes. Stale
+entries are never deleted; they stop being addressed and age out through the backend's TTL / LRU cull.
+
+The backend is the ANALYTICS_CACHE_ALIAS entry of CACHES. It is local memory by default, and any
+Django backend (file based, Redis) can be configured there. JSON endpoints also get an ETag derived
+from the key, so a browser holding the current version is answered with 304 without touching the cache.
+
+Settings:
+  ANALYTICS_CACHE_ENABLED   False = always compute (the decorators become pass-through)
+  ANALYTICS_CACHE_ALIAS     CACHES alias to use (default "analytics")
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import Counter
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, HttpResponseNotModified
+
+GLOBAL_SCOPE = ("global",)
+ALL_SCOPE = ("all",)
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def enabled():
+    return getattr(settings, "ANALYTICS_CACHE_ENABLED", True)
+
+
+def get_cache():
+    return caches[getattr(settings, "ANALYTICS_CACHE_ALIAS", "analytics")]
+
+
+def mentor_scope(mentor_user_id):
+    return ("mentor", mentor_user_id)
+
+
+def department_scope(branch):
+    """Scope of one department; no branch means the whole institute."""
+    return ("dept", branch) if branch else ALL_SCOPE
+
+
+def _version_key(scope):
+    return "analytics:v:" + ":".join(str(part) for part in scope)
+
+
+def versions(scopes):
+    """Current version of each scope (missing counters are seeded, see bump)."""
+    scopes = [GLOBAL_SCOPE] + list(scopes)
+    cache = get_cache()
+    found = cache.get_many([_version_key(s) for s in scopes])
+    result = []
+    for scope in scopes:
+        key = _version_key(scope)
+        if key not in found:
+            # seed from the clock, so a counter lost to eviction never reuses an older version
+            cache.add(key, time.time_ns(), timeout=None)
+            found[key] = cache.get(key)
+        result.append(found[key])
+    return result
+
+
+def bump(*scopes):
+    """Invalidates everything cached under any of `scopes`."""
+    if not enabled():
+        return
+    cache = get_cache()
+    for scope in scopes:
+        key = _version_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), timeout=None)
+    record("bumps", len(scopes))
+
+
+def bump_global():
+    bump(GLOBAL_SCOPE)
+
+
+def make_key(endpoint, params, scopes):
+    """Stable cache key for (endpoint, params, scopes, versions of scopes)."""
+    parts = {
+        "endpoint": endpoint,
+        "params": sorted((k, v) for k, v in params.items()),
+        # the scopes themselves: two mentors whose counters happen to match must not share a key
+        "scopes": [list(scope) for scope in scopes],
+        "versions": versions(scopes),
+    }
+    digest = hashlib.sha1(json.dumps(parts, default=str, sort_keys=True).encode("utf-8")).hexdigest()
+    return f"analytics:{endpoint}:{digest}"
+
+
+def record(event, n=1):
+    with _stats_lock:
+        _stats[event] += n
+
+
+def stats():
+    """Hit / miss / 304 / bump counters of this process, plus the hit ratio."""
+    with _stats_lock:
+        counters = dict(_stats)
+    lookups = counters.get("hits", 0) + counters.get("misses", 0)
+    counters["hit_ratio"] = round(counters.get("hits", 0) / lookups, 3) if lookups else None
+    return counters
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def get_or_build(endpoint, params, scopes, build):
+    """Returns the cached value of `build()` for (endpoint, params, scopes)."""
+    if not enabled():
+        return build()
+    key = make_key(endpoint, params, scopes)
+    value = get_cache().get(key)
+    if value is not None:
+        record("hits")
+        return value
+    record("misses")
+    value = build()
+    get_cache().set(key, value)
+    return value
+
+
+def cached_json(endpoint, scopes):
+    """
+    Caches a JSON view's 200 responses under `scopes(request)` and adds an ETag.
+    `scopes` may return None to bypass the cache for that request.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            scope_list = scopes(request) if enabled() else None
+            if scope_list is None:
+                return view(request, *args, **kwargs)
+
+            key = make_key(endpoint, request.GET, scope_list)
+            etag = '"%s"' % key.rsplit(":", 1)[1]
+            if etag in request.headers.get("If-None-Match", ""):
+                record("not_modified")
+                response = HttpResponseNotModified()
+            else:
+                cached = get_cache().get(key)
+                if cached is not None:
+                    record("hits")
+                    response = HttpResponse(cached["content"], content_type=cached["content_type"])
+                else:
+                    record("misses")
+                    response = view(request, *args, **kwargs)
+                    if response.status_code != 200:
+                        return response
+                    get_cache().set(key, {"content": response.content, "content_type": response["Content-Type"]})
+            response["ETag"] = etag
+            response["Cache-Control"] = "private, no-cache"
+            return response
+        return wrapper
+    return decorator
+
+
+def request_mentor_scope(request):
+    """Scopes of the logged-in mentor's chart endpoints (None for anonymous users)."""
+    if not request.user.is_authenticated:
+        return None
+    return [mentor_scope(request.user.pk)]
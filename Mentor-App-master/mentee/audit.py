@@ -0,0 +1,186 @@
+"""
+Buffered ActivityLog writer.
+
+signals.py builds ActivityLog objects and hands them to record() instead of inserting each one.
+Records are collected per request (RequestCaptureMiddleware opens a batch()) and written with a
+single bulk_create when the request ends or the buffer fills up. Records made inside a transaction
+only enter the buffer once it commits (transaction.on_commit), so rolled-back work is not logged.
+
+Settings:
+  ACTIVITY_LOG_BATCHING         False = old behaviour, one INSERT per record
+  ACTIVITY_LOG_BUFFER_SIZE      flush early once this many records are pending
+  ACTIVITY_LOG_ASYNC            True = hand batches to a background thread instead of writing inline
+  ACTIVITY_LOG_MODULES          allow-list of module names (None = all)
+  ACTIVITY_LOG_EXCLUDE_MODULES  deny-list of module names
+  ACTIVITY_LOG_SNAPSHOT_CACHE   max pre_save snapshots kept per request (LRU)
+
+Pre-save snapshots used for "Updated" diffs live in the same request scope: each batch() gets its
+own bounded LRU cache, so snapshots whose post_save never fires (e.g. the save raised) are evicted
+instead of accumulating for the life of the process.
+"""
+import atexit
+import logging
+import queue
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction, close_old_connections
+
+from .models import ActivityLog
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def module_enabled(module):
+    allow = _setting("ACTIVITY_LOG_MODULES", None)
+    deny = _setting("ACTIVITY_LOG_EXCLUDE_MODULES", ())
+    if allow is not None and module not in allow:
+        return False
+    return module not in deny
+
+
+def record(log):
+    """Queue an unsaved ActivityLog for writing."""
+    if not module_enabled(log.module):
+        return
+    if not _setting("ACTIVITY_LOG_BATCHING", True):
+        log.save()
+        return
+
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _add(log))
+    else:
+        _add(log)
+
+
+def _add(log):
+    buffer = getattr(_local, "buffer", None)
+    if buffer is None:
+        # no batch open (management command, shell): write straight away
+        _write([log])
+        return
+    buffer.append(log)
+    if len(buffer) >= _setting("ACTIVITY_LOG_BUFFER_SIZE", 500):
+        flush()
+
+
+def flush():
+    """Write everything buffered in the current batch."""
+    buffer = getattr(_local, "buffer", None)
+    if not buffer:
+        return
+    pending = buffer[:]
+    buffer.clear()
+    _write(pending)
+
+
+@contextmanager
+def batch():
+    """Collect records made inside the block and write them together at the end."""
+    previous = getattr(_local, "buffer", None), getattr(_local, "snapshots", None)
+    _local.buffer = []
+    _local.snapshots = SnapshotCache(_setting("ACTIVITY_LOG_SNAPSHOT_CACHE", 256))
+    try:
+        yield
+    finally:
+        try:
+            flush()
+        finally:
+            _local.buffer, _local.snapshots = previous
+
+
+class SnapshotCache:
+    """Small LRU map of (model label, pk) -> pre_save field values."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def put(self, key, snapshot):
+        self._data[key] = snapshot
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key):
+        return self._data.pop(key, None)
+
+
+def snapshots():
+    """Snapshot cache of the current batch; outside a batch, a bounded per-thread one."""
+    cache = getattr(_local, "snapshots", None)
+    if cache is None:
+        cache = _local.snapshots = SnapshotCache(_setting("ACTIVITY_LOG_SNAPSHOT_CACHE", 256))
+    return cache
+
+
+def _write(logs):
+    if _setting("ACTIVITY_LOG_ASYNC", False):
+        try:
+            _get_writer().put_nowait(logs)
+            return
+        except queue.Full:
+            pass  # back-pressure: write inline rather than grow the queue
+    _bulk_insert(logs)
+
+
+def _bulk_insert(logs):
+    try:
+        ActivityLog.objects.bulk_create(logs)
+    except Exception:
+        # audit logging must never turn a finished request into an error
+        logger.exception("Could not write %d activity log record(s)", len(logs))
+
+
+class _BackgroundWriter:
+    """Daemon thread that drains batches from a bounded queue."""
+
+    def __init__(self, maxsize):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.thread = threading.Thread(target=self._run, name="activity-log-writer", daemon=True)
+        self.thread.start()
+        atexit.register(self.stop)
+
+    def put_nowait(self, logs):
+        self.queue.put_nowait(logs)
+
+    def _run(self):
+        while True:
+            logs = self.queue.get()
+            try:
+                if logs is None:
+                    return
+                _bulk_insert(logs)
+            finally:
+                close_old_connections()
+                self.queue.task_done()
+
+    def stop(self, timeout=5):
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self.thread.join(timeout)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def _get_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None or not _writer.thread.is_alive():
+            _writer = _BackgroundWriter(_setting("ACTIVITY_LOG_QUEUE_SIZE", 1000))
+        return _writer
@@ -0,0 +1,54 @@
+"""Helpers for the benchmark_* management commands."""
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+# chat benchmarks run in one process with an in-memory channel layer; the chat caches that are
+# shared in production (Redis) can then be process-local as well
+PROCESS_LOCAL_CHAT_CACHES = {"CHAT_MEMBERSHIP_CACHE_ALIAS": "default", "CHAT_PRESENCE_CACHE_ALIAS": "default"}
+
+
+@contextmanager
+def throwaway_database(verbosity=0):
+    """
+    Runs the block against a freshly migrated test database (the same one `manage.py test` builds),
+    so benchmarks never touch real data. The database is destroyed afterwards.
+    """
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, serialize=False)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+
+
+@contextmanager
+def measure():
+    """Yields a dict that is filled with `queries` (list of SQL strings) and `seconds` when the block exits."""
+    result = {}
+    start = time.perf_counter()
+    with CaptureQueriesContext(connection) as ctx:
+        yield result
+    result["seconds"] = time.perf_counter() - start
+    result["queries"] = [q["sql"] for q in ctx.captured_queries]
+
+
+@contextmanager
+def count_statements():
+    """
+    Like measure(), but only counts statements per SQL verb (no 9000-query log cap), for long runs.
+    Yields a dict that gets `statements` (Counter of SELECT / INSERT / UPDATE / ...) and `seconds`.
+    """
+    result = {"statements": Counter()}
+
+    def wrapper(execute, sql, params, many, context):
+        result["statements"][sql.lstrip().split(None, 1)[0].upper()] += 1
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    with connection.execute_wrapper(wrapper):
+        yield result
+    result["seconds"] = time.perf_counter() - start
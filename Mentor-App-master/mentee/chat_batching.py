@@ -0,0 +1,147 @@
+"""
+Per-connection micro-batching of chat receipts (seen / reaction frames).
+
+A client scrolling through history sends a seen frame per visible bubble and may fire reactions in
+bursts. ChatConsumer feeds these frames into a ReceiptBatcher instead of writing each one. The batcher
+keeps only the newest seen reply and the last emoji per reply. It persists them once per window
+(CHAT_BATCH_WINDOW_MS), using one watermark UPDATE and one reaction upsert, and the consumer then
+broadcasts one aggregated frame.
+
+Backpressure: once CHAT_BATCH_MAX_PENDING distinct items are waiting, the next frame flushes inline,
+so the socket's receive loop waits for the database instead of growing the buffer.
+Everything still pending is flushed when the socket disconnects. A flush that fails is logged and
+its receipts go back into the batch for the next window, except for that final flush: a closed
+socket drops them rather than retrying.
+
+Settings:
+  CHAT_RECEIPT_BATCHING   False = write and broadcast every frame on its own (the previous behaviour)
+  CHAT_BATCH_WINDOW_MS    how long receipts are collected before a flush
+  CHAT_BATCH_MAX_PENDING  pending items that force an immediate flush
+"""
+import asyncio
+import logging
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import audit
+from .models import ActivityLog, Reaction, Reply
+from .read_receipts import mark_seen
+
+logger = logging.getLogger(__name__)
+
+
+def batching_enabled():
+    return getattr(settings, "CHAT_RECEIPT_BATCHING", True)
+
+
+def save_receipts(conversation_id, user_id, seen_reply_id, reactions):
+    """
+    Persists one window of receipts. `reactions` maps reply id -> emoji.
+    Returns (seen moved?, {reply id: emoji} actually stored). At most three queries for the reactions,
+    plus one for their activity log.
+    """
+    seen = bool(seen_reply_id) and mark_seen(conversation_id, user_id, seen_reply_id)
+
+    stored = {}
+    if reactions:
+        valid = set(
+            Reply.objects.filter(conversation_id=conversation_id, pk__in=list(reactions))
+            .values_list("pk", flat=True)
+        )
+        stored = {reply_id: emoji for reply_id, emoji in reactions.items() if reply_id in valid}
+        logged = audit.module_enabled("Reaction")
+        existing = set(
+            Reaction.objects.filter(user_id=user_id, reply_id__in=list(stored)).values_list("reply_id", flat=True)
+        ) if logged and stored else set()
+        now = timezone.now()
+        Reaction.objects.bulk_create(
+            [Reaction(reply_id=reply_id, user_id=user_id, emoji=emoji, reacted_at=now) for reply_id, emoji in stored.items()],
+            update_conflicts=True,
+            unique_fields=["reply", "user"],
+            update_fields=["emoji", "reacted_at"],
+        )
+        if logged:
+            _log_reactions(user_id, stored, existing, now)
+    return seen, stored
+
+
+def _log_reactions(user_id, stored, existing, now):
+    """bulk_create skips the post_save audit receivers: log the reactions as they would have, in one insert."""
+    with audit.batch():
+        for reply_id, emoji in stored.items():
+            audit.record(ActivityLog(
+                user_id=user_id,
+                action="Updated" if reply_id in existing else "Created",
+                module="Reaction",
+                details=f"{emoji} on {reply_id}",
+                new_data={"reply": reply_id, "user": user_id, "emoji": emoji},
+                timestamp=now,
+            ))
+
+
+class ReceiptBatcher:
+    """
+    Collects seen / reaction frames of one connection and hands them to `flush_callback(seen_reply_id,
+    reactions)` at most once per `window` seconds (or sooner under backpressure).
+    """
+
+    def __init__(self, flush_callback, window=None, max_pending=None):
+        self.flush_callback = flush_callback
+        self.window = window if window is not None else getattr(settings, "CHAT_BATCH_WINDOW_MS", 250) / 1000
+        self.max_pending = max_pending or getattr(settings, "CHAT_BATCH_MAX_PENDING", 200)
+        self.seen_reply_id = 0
+        self.reactions = {}
+        self._timer = None
+        self._lock = asyncio.Lock()
+        self.closed = False
+
+    @property
+    def pending(self):
+        return len(self.reactions) + (1 if self.seen_reply_id else 0)
+
+    async def add_seen(self, reply_id):
+        self.seen_reply_id = max(self.seen_reply_id, reply_id)
+        await self._schedule()
+
+    async def add_reaction(self, reply_id, emoji):
+        self.reactions[reply_id] = emoji
+        await self._schedule()
+
+    async def _schedule(self):
+        if self.closed:
+            return
+        if self.pending >= self.max_pending:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.ensure_future(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.window)
+        self._timer = None
+        await self.flush()
+
+    async def flush(self, final=False):
+        """Writes what is pending. `final` (the socket is closing): no retry, nothing is scheduled again."""
+        async with self._lock:
+            if final:
+                self.closed = True
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            seen_reply_id, reactions = self.seen_reply_id, self.reactions
+            self.seen_reply_id, self.reactions = 0, {}
+            if not (seen_reply_id or reactions):
+                return
+            try:
+                await self.flush_callback(seen_reply_id, reactions)
+            except Exception:
+                if self.closed:
+                    logger.exception("Could not flush chat receipts of a closed socket; dropping them")
+                    return
+                # keep the receipts: nothing confirmed them, and the client will not send them again
+                logger.exception("Could not flush chat receipts; retrying with the next window")
+                self.seen_reply_id = max(self.seen_reply_id, seen_reply_id)
+                self.reactions = {**reactions, **self.reactions}
+                if self._timer is None:
+                    self._timer = asyncio.ensure_future(self._flush_later())
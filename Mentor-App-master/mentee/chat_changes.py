@@ -0,0 +1,93 @@
+"""
+Per-conversation change log for reconnect catch-up.
+
+Every group event that changes what a chat page shows (new / edited / deleted message, seen and
+reaction receipts) is stored as a ChatEvent before it is broadcast, and the broadcast carries the
+event id as `seq`. The page keeps the highest seq it has received and reconnects with
+`?since=<seq>` (or sends {"action": "resync", "since": seq}); the consumer then replays only the
+events after it. The replay is one indexed range read, so its cost follows the number of missed
+changes, not the length of the conversation.
+
+Retention is bounded per conversation by count and age. Pruning raises Conversation.changelog_floor,
+and a client behind the floor (or missing more than CHAT_CHANGELOG_MAX_REPLAY events) is told to
+reload instead.
+
+Settings:
+  CHAT_CHANGELOG_MAX_EVENTS        events kept per conversation
+  CHAT_CHANGELOG_RETENTION_HOURS   events older than this are pruned
+  CHAT_CHANGELOG_MAX_REPLAY        largest replay before the client is told to reload
+"""
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from .models import ChatEvent, Conversation
+
+# prune a conversation roughly once per this many events written
+PRUNE_EVERY = 100
+
+
+def group_name(conversation_id):
+    return f"conversation_{conversation_id}"
+
+
+def record(conversation_id, event):
+    """Stores a group event in the change log; returns it with its `seq`."""
+    entry = ChatEvent.objects.create(conversation_id=conversation_id, type=event["type"], payload=event)
+    if entry.pk % PRUNE_EVERY == 0:
+        prune(conversation_id)
+    return {**event, "seq": entry.pk}
+
+
+def publish(conversation_id, event):
+    """Records and broadcasts a group event (for synchronous callers such as the HTTP chat views)."""
+    event = record(conversation_id, event)
+    async_to_sync(get_channel_layer().group_send)(group_name(conversation_id), event)
+    return event
+
+
+def latest_seq(conversation_id):
+    """Seq a freshly rendered page resumes from."""
+    return ChatEvent.objects.filter(conversation_id=conversation_id).aggregate(seq=Max("id"))["seq"] or 0
+
+
+def changes_since(conversation_id, since):
+    """
+    Group events after `since`, oldest first, or None when they can no longer be replayed
+    (pruned, or more than CHAT_CHANGELOG_MAX_REPLAY). Two queries.
+    """
+    floor = Conversation.objects.filter(pk=conversation_id).values_list("changelog_floor", flat=True).first()
+    if floor is None or since < floor:
+        return None
+    limit = getattr(settings, "CHAT_CHANGELOG_MAX_REPLAY", 500)
+    rows = list(
+        ChatEvent.objects.filter(conversation_id=conversation_id, id__gt=since)
+        .order_by("id")
+        .values_list("id", "payload")[:limit + 1]
+    )
+    if len(rows) > limit:
+        return None
+    return [{**payload, "seq": seq} for seq, payload in rows]
+
+
+def prune(conversation_id):
+    """Drops the conversation's events beyond the count / age limits. Returns the number deleted."""
+    events = ChatEvent.objects.filter(conversation_id=conversation_id)
+    cutoff = timezone.now() - timedelta(hours=getattr(settings, "CHAT_CHANGELOG_RETENTION_HOURS", 72))
+    doomed = Q(created_at__lt=cutoff)
+    keep = getattr(settings, "CHAT_CHANGELOG_MAX_EVENTS", 1000)
+    oldest_kept = list(events.order_by("-id").values_list("id", flat=True)[keep - 1:keep])
+    if oldest_kept:
+        doomed |= Q(id__lt=oldest_kept[0])
+
+    top = events.filter(doomed).aggregate(top=Max("id"))["top"]
+    if top is None:
+        return 0
+    # always a prefix of the log, so one floor describes what is gone
+    deleted, _ = events.filter(id__lte=top).delete()
+    Conversation.objects.filter(pk=conversation_id, changelog_floor__lt=top).update(changelog_floor=top)
+    return deleted
@@ -0,0 +1,167 @@
+"""
+Wire formats of the chat socket, negotiated through the WebSocket subprotocol.
+
+    (none) / mentorchat.json     JSON with the full keys, one event per frame (the default, unchanged)
+    mentorchat.compact+json      short keys (SHORT_KEYS), null fields dropped, batched
+    mentorchat.msgpack           the same compact events as MessagePack binary frames, batched
+
+With a compact format, events queued within CHAT_FRAME_BATCH_MS are written as one frame holding a
+list of events. A client sends frames in the format it negotiated, and short keys are expanded on
+the way in. msgpack is optional: without it the binary format is not offered.
+
+Settings:
+  CHAT_FRAME_BATCH_MS   how long outgoing events are collected into one frame (compact formats)
+"""
+import asyncio
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+try:
+    import msgpack
+except ImportError:  # optional: the msgpack subprotocol is simply not offered
+    msgpack = None
+
+JSON_PROTOCOL = "mentorchat.json"
+COMPACT_JSON_PROTOCOL = "mentorchat.compact+json"
+MSGPACK_PROTOCOL = "mentorchat.msgpack"
+
+# full key -> short key; values of these keys are never renamed, only the keys
+SHORT_KEYS = {
+    "action": "a",
+    "message": "m",
+    "events": "v",
+    "id": "i",
+    "sender_id": "s",
+    "sender_username": "su",
+    "text": "t",
+    "file_url": "f",
+    "replied_at": "r",
+    "edited": "e",
+    "edited_at": "ea",
+    "seen_count": "sc",
+    "reactions": "x",
+    "client_id": "k",
+    "seq": "q",
+    "user_id": "u",
+    "username": "un",
+    "reply_id": "ri",
+    "emoji": "em",
+    "typing": "ty",
+    "joined": "j",
+    "left": "l",
+    "online": "o",
+    "source": "so",
+    "error": "er",
+    "since": "sn",
+}
+LONG_KEYS = {short: full for full, short in SHORT_KEYS.items()}
+
+
+def compact(value):
+    """Short keys, null fields dropped."""
+    if isinstance(value, dict):
+        return {SHORT_KEYS.get(k, k): compact(v) for k, v in value.items() if v is not None}
+    if isinstance(value, list):
+        return [compact(v) for v in value]
+    return value
+
+
+def expand(value):
+    """Inverse of compact() for incoming frames (full keys pass through)."""
+    if isinstance(value, dict):
+        return {LONG_KEYS.get(k, k): expand(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [expand(v) for v in value]
+    return value
+
+
+class JsonCodec:
+    protocol = None
+    batched = False
+
+    def encode(self, payload):
+        return {"text_data": json.dumps(payload, cls=DjangoJSONEncoder)}
+
+    def decode(self, text_data=None, bytes_data=None):
+        return json.loads(text_data) if text_data else None
+
+
+class CompactJsonCodec(JsonCodec):
+    protocol = COMPACT_JSON_PROTOCOL
+    batched = True
+
+    def encode(self, payload):
+        return {"text_data": json.dumps(compact(payload), cls=DjangoJSONEncoder, separators=(",", ":"))}
+
+    def decode(self, text_data=None, bytes_data=None):
+        return expand(json.loads(text_data)) if text_data else None
+
+
+class MsgpackCodec(JsonCodec):
+    protocol = MSGPACK_PROTOCOL
+    batched = True
+
+    def encode(self, payload):
+        return {"bytes_data": msgpack.packb(compact(payload), use_bin_type=True, default=str)}
+
+    def decode(self, text_data=None, bytes_data=None):
+        if bytes_data:
+            return expand(msgpack.unpackb(bytes_data, raw=False))
+        return expand(json.loads(text_data)) if text_data else None
+
+
+def negotiate(subprotocols):
+    """Codec for the first subprotocol offered by the client that the server supports (JSON otherwise)."""
+    codecs = {JSON_PROTOCOL: JsonCodec, COMPACT_JSON_PROTOCOL: CompactJsonCodec}
+    if msgpack is not None:
+        codecs[MSGPACK_PROTOCOL] = MsgpackCodec
+    for protocol in subprotocols or ():
+        if protocol in codecs:
+            codec = codecs[protocol]()
+            codec.protocol = protocol
+            return codec
+    return JsonCodec()
+
+
+class FrameWriter:
+    """
+    Writes events of one socket with its codec. For batched codecs, events are collected for
+    `window` seconds and written as one frame holding a list; otherwise each event is its own frame.
+    """
+
+    def __init__(self, send, codec, window=None):
+        self.send = send
+        self.codec = codec
+        self.window = window if window is not None else getattr(settings, "CHAT_FRAME_BATCH_MS", 5) / 1000
+        self.pending = []
+        self._timer = None
+
+    async def write(self, payload):
+        if not self.codec.batched or self.window <= 0:
+            await self.send(**self.codec.encode(payload))
+            return
+        self.pending.append(payload)
+        if self._timer is None:
+            self._timer = asyncio.ensure_future(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.window)
+        self._timer = None
+        await self.flush()
+
+    async def flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        events, self.pending = self.pending, []
+        if events:
+            await self.send(**self.codec.encode(events))
+
+    def discard(self):
+        """Drops what is pending (the socket is gone)."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self.pending = []
@@ -0,0 +1,76 @@
+"""
+Keyset-paged chat history.
+
+Pages walk a conversation backwards by (replied_at, id), served by the reply_conv_time_idx index.
+Each page costs one query for the replies (with sender), one for their reactions and one for the
+conversation's read watermarks, however long the thread is. The chat pages render only the latest
+window and fetch older pages from the history endpoint as the user scrolls up.
+
+Replies without replied_at never carried text or a file (see Reply.save) and are not paged.
+"""
+from collections import defaultdict
+
+from django.db.models import Q
+
+from .models import Reaction, ReadWatermark, Reply
+from .utils import encode_cursor
+
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 200
+
+
+def history_page(conversation_id, before=None, limit=HISTORY_PAGE_SIZE):
+    """
+    Up to `limit` replies older than the `before` (replied_at, id) position, oldest first.
+    Returns (replies, next_cursor); next_cursor is None once the start of the thread is reached.
+    Every reply gets `seen_total` and `reaction_list` ([{"user_id", "emoji"}]) attached.
+    """
+    qs = (
+        Reply.objects.filter(conversation_id=conversation_id, replied_at__isnull=False)
+        .select_related("sender")
+        .order_by("-replied_at", "-id")
+    )
+    if before:
+        ts, pk = before
+        qs = qs.filter(Q(replied_at__lt=ts) | Q(replied_at=ts, id__lt=pk))
+
+    replies = list(qs[:limit + 1])
+    has_more = len(replies) > limit
+    replies = replies[:limit]
+    replies.reverse()
+
+    reactions = defaultdict(list)
+    for reply_id, user_id, emoji in (
+        Reaction.objects.filter(reply__in=[r.pk for r in replies])
+        .order_by("reacted_at", "id")
+        .values_list("reply_id", "user_id", "emoji")
+    ):
+        reactions[reply_id].append({"user_id": user_id, "emoji": emoji})
+
+    marks = list(ReadWatermark.objects.filter(conversation_id=conversation_id).values_list("user_id", "last_seen_reply_id"))
+    for r in replies:
+        r.seen_total = sum(1 for user_id, last in marks if user_id != r.sender_id and last >= r.pk)
+        r.reaction_list = reactions[r.pk]
+
+    next_cursor = encode_cursor(replies[0].replied_at, replies[0].pk) if has_more else None
+    return replies, next_cursor
+
+
+def serialize_reply(reply):
+    """
+    Payload of a reply in history pages and new_message broadcasts. Replies that did not come
+    through history_page (just created) count as unseen and without reactions.
+    """
+    return {
+        "id": reply.pk,
+        "sender_id": reply.sender_id,
+        "sender_username": reply.sender.username if reply.sender else None,
+        "text": reply.reply or "",
+        "file_url": reply.file.url if reply.file else None,
+        "replied_at": reply.replied_at.isoformat(),
+        "edited": reply.edited,
+        "edited_at": reply.edited_at.isoformat() if reply.edited_at else None,
+        "seen_count": getattr(reply, "seen_total", 0),
+        "reactions": getattr(reply, "reaction_list", []),
+        "client_id": reply.client_id,
+    }
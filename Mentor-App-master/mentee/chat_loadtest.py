@@ -0,0 +1,181 @@
+"""
+Fan-out load test of ChatConsumer (`manage.py loadtest_chat`).
+
+N conversations get M sockets each, opened through channels.testing.WebsocketCommunicator against
+the real routing and whatever CHANNEL_LAYERS is active. Sockets alternate between the
+conversation's mentor and mentee, so M > 2 stands for extra tabs / devices. The phases are:
+
+    connect    every socket connects (latency per socket)
+    send       each conversation sends `messages` text replies round-robin; latency from the send
+               until the reply arrives on every other socket of the conversation
+    typing / seen / reaction
+               one frame per socket, then the sockets are drained (frames delivered)
+
+Each phase counts the SQL statements it caused, reported per frame sent. The counter wraps the
+connection of the calling thread, which is the one database_sync_to_async uses. Memory per
+connection is the Python allocation growth (tracemalloc) while the sockets are open. It covers the
+consumers, the communicators and the in-process channel-layer queues, not the database.
+The caller provides the database: the command runs inside benchmarking.throwaway_database().
+"""
+import asyncio
+import time
+import tracemalloc
+
+from asgiref.sync import async_to_sync
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.utils import timezone
+
+from .benchmarking import count_statements
+from .models import Conversation, Reply, User
+from .routing import websocket_urlpatterns
+
+# how long a socket has to stay silent before a burst counts as fully delivered
+# (the receipt window plus the flushes queueing for the single database thread)
+QUIET_SECONDS = 1.0
+
+
+def percentiles(seconds):
+    """p50 / p95 / p99 / max in milliseconds."""
+    if not seconds:
+        return None
+    ordered = sorted(seconds)
+
+    def pick(pct):
+        return round(ordered[min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))] * 1000, 2)
+
+    return {"p50": pick(50), "p95": pick(95), "p99": pick(99), "max": pick(100)}
+
+
+def create_conversations(count):
+    """`count` mentor-mentee conversations in which both sides have written. Returns [(conv, [mentor, mentee])]."""
+    conversations = []
+    now = timezone.now()
+    for i in range(count):
+        mentor = User.objects.create_user(username=f"load_mentor_{i}", password=None, is_mentor=True)
+        mentee = User.objects.create_user(username=f"load_mentee_{i}", password=None, is_mentee=True)
+        conv = Conversation.objects.create(sender=mentor, receipient=mentee, conversation=f"load test {i}")
+        Reply.objects.bulk_create([
+            Reply(conversation=conv, sender=mentee, reply="hello", replied_at=now),
+            Reply(conversation=conv, sender=mentor, reply="hello", replied_at=now),
+        ])
+        conversations.append((conv, [mentor, mentee]))
+    return conversations
+
+
+async def _connect(app, conv, user):
+    ws = WebsocketCommunicator(app, f"/ws/chat/{conv.pk}/")
+    ws.scope["user"] = user
+    start = time.perf_counter()
+    connected, _ = await ws.connect()
+    elapsed = time.perf_counter() - start
+    if not connected:
+        raise RuntimeError(f"{user.username} could not connect to conversation {conv.pk}")
+    return ws, elapsed
+
+
+async def _drain(ws):
+    """Frames waiting on `ws` until it has been quiet for QUIET_SECONDS."""
+    received = 0
+    while not await ws.receive_nothing(timeout=QUIET_SECONDS):
+        await ws.receive_output()
+        received += 1
+    return received
+
+
+async def _arrival(ws, client_id, start):
+    while True:
+        frame = await ws.receive_json_from(timeout=10)
+        if frame.get("action") == "new_message" and frame["message"].get("client_id") == client_id:
+            return time.perf_counter() - start
+
+
+async def _conversation_traffic(index, sockets, messages):
+    latencies = []
+    for i in range(messages):
+        sender = sockets[i % len(sockets)]
+        client_id = f"load-{index}-{i}"
+        start = time.perf_counter()
+        await sender.send_json_to({"action": "send", "text": f"load message {i}", "client_id": client_id})
+        latencies += await asyncio.gather(*(_arrival(ws, client_id, start) for ws in sockets if ws is not sender))
+    return latencies
+
+
+async def _burst(rooms, frame_for):
+    """Every socket sends one frame; returns (frames sent, frames delivered)."""
+    sent = 0
+    for conv, sockets, reply_id in rooms:
+        for ws in sockets:
+            await ws.send_json_to(frame_for(reply_id))
+            sent += 1
+    delivered = await asyncio.gather(*(_drain(ws) for _, sockets, _ in rooms for ws in sockets))
+    return sent, sum(delivered)
+
+
+def run_load_test(conversations, participants=2, messages=20):
+    """Runs all phases against existing `conversations` (see create_conversations) and returns the report."""
+    if participants < 2:
+        raise ValueError("fan-out needs at least two participants per conversation")
+    with count_statements() as result:
+        return async_to_sync(_run)(conversations, participants, messages, result["statements"])
+
+
+async def _run(conversations, participants, messages, statements):
+    def queries_since(mark):
+        return sum(statements.values()) - mark
+
+    app = URLRouter(websocket_urlpatterns)
+    report = {"conversations": len(conversations), "sockets": len(conversations) * participants, "frames": {}}
+
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    rooms, connect_times = [], []
+    mark = queries_since(0)
+    for conv, users in conversations:
+        sockets = []
+        for i in range(participants):
+            ws, elapsed = await _connect(app, conv, users[i % len(users)])
+            sockets.append(ws)
+            connect_times.append(elapsed)
+        rooms.append([conv, sockets, None])
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    report["connect_ms"] = percentiles(connect_times)
+    report["connect_queries"] = round(queries_since(mark) / len(connect_times), 2)
+    report["memory_per_connection_kb"] = round((after - before) / len(connect_times) / 1024, 1)
+    await asyncio.gather(*(_drain(ws) for _, sockets, _ in rooms for ws in sockets))  # presence notices
+
+    mark = queries_since(0)
+    latencies = await asyncio.gather(*(
+        _conversation_traffic(i, sockets, messages) for i, (_, sockets, _) in enumerate(rooms)
+    ))
+    sent_queries = queries_since(mark)
+    sent = len(rooms) * messages
+    report["fanout_ms"] = percentiles([s for per_room in latencies for s in per_room])
+    report["frames"]["send"] = {
+        "sent": sent,
+        "delivered": sum(len(per_room) for per_room in latencies),
+        "queries_per_frame": round(sent_queries / sent, 2) if sent else 0,
+    }
+    await asyncio.gather(*(_drain(ws) for _, sockets, _ in rooms for ws in sockets))  # senders' own copies
+
+    for room in rooms:
+        room[2] = await Reply.objects.filter(conversation=room[0]).order_by("-id").values_list("id", flat=True).afirst()
+    phases = {
+        "typing": lambda reply_id: {"action": "typing", "typing": True},
+        "seen": lambda reply_id: {"action": "seen", "reply_id": reply_id},
+        "reaction": lambda reply_id: {"action": "reaction", "reply_id": reply_id, "emoji": "👍"},
+    }
+    for phase, frame_for in phases.items():
+        mark = queries_since(0)
+        sent, delivered = await _burst(rooms, frame_for)
+        report["frames"][phase] = {
+            "sent": sent,
+            "delivered": delivered,
+            "queries_per_frame": round(queries_since(mark) / sent, 2),
+        }
+
+    for _, sockets, _ in rooms:
+        for ws in sockets:
+            await ws.disconnect()
+    return report
@@ -0,0 +1,50 @@
+"""
+Cached conversation membership for the chat socket and the chat HTTP views.
+
+A conversation's participants (sender and receipient user ids) are cached per conversation, so
+a reconnecting socket or a chat request is authorised without a query once the conversation is
+warm. Signals drop the entry when a Conversation is saved or deleted.
+
+Settings:
+  CHAT_MEMBERSHIP_CACHE_ALIAS   CACHES alias to use (default "default"); must be shared by the web and the
+                                socket processes, or invalidations of one process miss the other
+  CHAT_MEMBERSHIP_TTL           seconds an entry lives without being invalidated
+"""
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import Conversation
+
+
+def get_cache():
+    return caches[getattr(settings, "CHAT_MEMBERSHIP_CACHE_ALIAS", "default")]
+
+
+def _key(conversation_id):
+    return f"chat:members:{conversation_id}"
+
+
+def participants(conversation_id):
+    """Frozenset of the participants' user ids, or None if the conversation does not exist."""
+    members = get_cache().get(_key(conversation_id))
+    if members is None:
+        row = Conversation.objects.filter(pk=conversation_id).values_list("sender_id", "receipient_id").first()
+        if row is None:
+            return None
+        members = frozenset(uid for uid in row if uid is not None)
+        get_cache().set(_key(conversation_id), members, getattr(settings, "CHAT_MEMBERSHIP_TTL", 3600))
+    return members
+
+
+def is_member(conversation_id, user_id):
+    members = participants(conversation_id)
+    return members is not None and user_id in members
+
+
+def remember(conversation_id, user_ids):
+    """Caches a participant set as given (load tests of group-sized conversations)."""
+    get_cache().set(_key(conversation_id), frozenset(user_ids), getattr(settings, "CHAT_MEMBERSHIP_TTL", 3600))
+
+
+def forget(conversation_id):
+    get_cache().delete(_key(conversation_id))
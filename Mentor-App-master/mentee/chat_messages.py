@@ -0,0 +1,45 @@
+"""
+Text replies sent over the chat WebSocket ({"action": "send", "text", "client_id"}).
+
+The consumer stores the reply and its change-log entry in one database round-trip and broadcasts
+straight away, so a text message no longer costs an HTTP request (the upload view remains for
+file attachments). `client_id` is generated by the page and is unique per sender: a send that is
+retried after a reconnect finds the stored reply instead of creating a second one.
+
+Settings:
+  CHAT_MAX_MESSAGE_LENGTH   longest text accepted over the socket
+"""
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from . import chat_changes
+from .chat_history import serialize_reply
+from .models import Reply
+
+
+def max_message_length():
+    return getattr(settings, "CHAT_MAX_MESSAGE_LENGTH", 5000)
+
+
+def send_text_reply(conversation_id, sender, text, client_id=None):
+    """
+    Stores a text reply and logs its new_message event.
+    Returns (event, created); for an already stored client_id the event of that reply, created=False.
+    """
+    try:
+        with transaction.atomic():
+            reply = Reply.objects.create(
+                conversation_id=conversation_id,
+                sender=sender,
+                reply=text,
+                client_id=client_id or None,
+                replied_at=timezone.now(),
+            )
+            event = chat_changes.record(conversation_id, {"type": "new_message", "message": serialize_reply(reply)})
+    except IntegrityError:
+        if not client_id:
+            raise
+        reply = Reply.objects.get(conversation_id=conversation_id, sender=sender, client_id=client_id)
+        return {"type": "new_message", "message": serialize_reply(reply)}, False
+    return event, True
@@ -0,0 +1,123 @@
+"""
+Presence registry of the chat sockets.
+
+Every open socket has an entry (channel name -> user id, username, expiry) in its conversation's
+registry, kept in the CHAT_PRESENCE_CACHE_ALIAS cache (local memory in tests, Redis or any shared
+backend when several workers serve the sockets). A socket re-registers every CHAT_PRESENCE_HEARTBEAT
+seconds. Entries that have not been refreshed for CHAT_PRESENCE_TTL seconds, for example those of a
+crashed worker, are dropped, and the user goes offline.
+
+A connecting socket gets a snapshot of who is online. Changes are not broadcast per join / leave.
+A change schedules a diff for its conversation, and after CHAT_PRESENCE_DIFF_MS one presence_diff
+frame reports everything that changed since the last one. A storm of N joins then costs one frame
+per socket instead of N. Registry updates are last-writer-wins; an entry lost to a concurrent
+write comes back with its socket's next heartbeat.
+
+Settings:
+  CHAT_PRESENCE_CACHE_ALIAS   CACHES alias holding the registry (default "default")
+  CHAT_PRESENCE_TTL           seconds an entry lives without a heartbeat
+  CHAT_PRESENCE_HEARTBEAT     seconds between heartbeats of a socket
+  CHAT_PRESENCE_DIFF_MS       how long changes are collected before a diff is broadcast
+"""
+import asyncio
+import time
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import caches
+
+from .chat_changes import group_name
+
+# conversation id -> pending diff task of this process
+_pending_diffs = {}
+
+
+def get_cache():
+    return caches[getattr(settings, "CHAT_PRESENCE_CACHE_ALIAS", "default")]
+
+
+def ttl():
+    return getattr(settings, "CHAT_PRESENCE_TTL", 60)
+
+
+def heartbeat_interval():
+    return getattr(settings, "CHAT_PRESENCE_HEARTBEAT", 20)
+
+
+def _registry_key(conversation_id):
+    return f"chat:presence:{conversation_id}"
+
+
+def _sent_key(conversation_id):
+    return f"chat:presence:{conversation_id}:sent"
+
+
+def _online(entries):
+    return {user_id: username for user_id, username, _ in entries.values()}
+
+
+async def _update(conversation_id, change=None):
+    """
+    Applies `change(entries)` to the registry after dropping expired entries.
+    Returns ({user_id: username} online, True if an entry expired).
+    """
+    cache = get_cache()
+    now = time.time()
+    entries = await cache.aget(_registry_key(conversation_id)) or {}
+    live = {channel: entry for channel, entry in entries.items() if entry[2] > now}
+    expired = len(live) != len(entries)
+    if change is not None:
+        change(live)
+    if change is not None or expired:
+        await cache.aset(_registry_key(conversation_id), live, ttl())
+    return _online(live), expired
+
+
+async def register(conversation_id, channel_name, user_id, username):
+    """Adds or refreshes a socket's entry (join and heartbeat). Returns (online users, entry expired?)."""
+    def change(entries):
+        entries[channel_name] = (user_id, username, time.time() + ttl())
+    return await _update(conversation_id, change)
+
+
+async def unregister(conversation_id, channel_name):
+    def change(entries):
+        entries.pop(channel_name, None)
+    return await _update(conversation_id, change)
+
+
+async def online_users(conversation_id):
+    return (await _update(conversation_id))[0]
+
+
+def schedule_diff(conversation_id):
+    """Makes sure a presence_diff for the conversation goes out after CHAT_PRESENCE_DIFF_MS."""
+    loop = asyncio.get_running_loop()
+    task = _pending_diffs.get(conversation_id)
+    if task is not None and not task.done() and task.get_loop() is loop:
+        return
+    _pending_diffs[conversation_id] = loop.create_task(_diff_later(conversation_id))
+
+
+async def _diff_later(conversation_id):
+    await asyncio.sleep(getattr(settings, "CHAT_PRESENCE_DIFF_MS", 500) / 1000)
+    if _pending_diffs.get(conversation_id) is asyncio.current_task():
+        del _pending_diffs[conversation_id]
+    await broadcast_diff(conversation_id)
+
+
+async def broadcast_diff(conversation_id):
+    """Sends the conversation one presence_diff against the last broadcast state, if anything changed."""
+    cache = get_cache()
+    online = await online_users(conversation_id)
+    sent = await cache.aget(_sent_key(conversation_id)) or {}
+    joined = [{"user_id": uid, "username": name} for uid, name in online.items() if uid not in sent]
+    left = [uid for uid in sent if uid not in online]
+    if not joined and not left:
+        return False
+    await cache.aset(_sent_key(conversation_id), online, None)
+    await get_channel_layer().group_send(
+        group_name(conversation_id),
+        {"type": "presence_diff", "joined": joined, "left": left},
+    )
+    return True
@@ -0,0 +1,87 @@
+"""
+Tick-based typing indicators.
+
+Typing frames no longer turn into one group_send each. ChatConsumer hands them to the
+conversation's TypingAggregator in this process. Every CHAT_TYPING_TICK_MS the aggregator drops
+typists whose last frame is older than CHAT_TYPING_EXPIRE_MS. When the set of typists has changed
+since the last tick, it broadcasts one typing_state frame listing who is typing. A busy
+conversation therefore gets at most one frame per tick, and none while nothing changes. The
+ticker stops once nobody is typing.
+
+The state is per process. Frames carry `source` (this process), and a page combines the lists of
+all sources, so sockets of one conversation may be spread over several workers.
+
+Settings:
+  CHAT_TYPING_AGGREGATION   False = one broadcast per typing frame (the previous behaviour)
+  CHAT_TYPING_TICK_MS       broadcast interval
+  CHAT_TYPING_EXPIRE_MS     a typist without a fresh frame for this long stops typing
+"""
+import asyncio
+import time
+import uuid
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from .chat_changes import group_name
+
+SOURCE = uuid.uuid4().hex[:12]
+
+# conversation id -> TypingAggregator of this process
+_aggregators = {}
+
+
+def aggregation_enabled():
+    return getattr(settings, "CHAT_TYPING_AGGREGATION", True)
+
+
+class TypingAggregator:
+
+    def __init__(self, conversation_id):
+        self.conversation_id = conversation_id
+        self.typists = {}  # user id -> (username, expires at)
+        self.sent = frozenset()
+        self._ticker = None
+
+    def set_typing(self, user_id, username, typing):
+        if typing:
+            expire = getattr(settings, "CHAT_TYPING_EXPIRE_MS", 5000) / 1000
+            self.typists[user_id] = (username, time.monotonic() + expire)
+        else:
+            self.typists.pop(user_id, None)
+        if self._ticker is None or self._ticker.done():
+            self._ticker = asyncio.ensure_future(self._run())
+
+    async def _run(self):
+        tick = getattr(settings, "CHAT_TYPING_TICK_MS", 300) / 1000
+        while True:
+            await asyncio.sleep(tick)
+            await self.tick()
+            if not self.typists and not self.sent:
+                if _aggregators.get(self.conversation_id) is self:
+                    del _aggregators[self.conversation_id]
+                return
+
+    async def tick(self):
+        """Expires stale typists and broadcasts the set if it changed. Returns True if a frame was sent."""
+        now = time.monotonic()
+        self.typists = {uid: entry for uid, entry in self.typists.items() if entry[1] > now}
+        current = frozenset(self.typists)
+        if current == self.sent:
+            return False
+        self.sent = current
+        await get_channel_layer().group_send(group_name(self.conversation_id), {
+            "type": "typing_state",
+            "source": SOURCE,
+            "typing": [{"user_id": uid, "username": name} for uid, (name, _) in sorted(self.typists.items())],
+        })
+        return True
+
+
+def aggregator(conversation_id):
+    """The conversation's aggregator in this process (one per event loop)."""
+    agg = _aggregators.get(conversation_id)
+    loop = asyncio.get_running_loop()
+    if agg is None or (agg._ticker is not None and agg._ticker.get_loop() is not loop):
+        agg = _aggregators[conversation_id] = TypingAggregator(conversation_id)
+    return agg
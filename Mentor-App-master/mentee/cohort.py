@@ -0,0 +1,80 @@
+"""
+Mentor cohort read model: everything the mentor pages need about their mentees in a fixed
+number of queries, whatever the cohort size.
+
+    mentor_cohort(mentor)          one query for mappings + mentee + user + profile,
+                                   one for document progress (MenteeProgress, see utils)
+    mentor_reminder_counts(mentor) three COUNTs (unapproved messages, open queries, upcoming meetings)
+    cohort_documents(users, ...)   one query per document category for the whole selection
+"""
+from django.utils import timezone
+
+from .models import (MentorMentee, Meeting, Msg, Query, InternshipPBL, SportsCulturalEvent, OtherEvent,
+                     CertificationCourse, PaperPublication, SemesterResult)
+from .utils import get_document_progress_bulk
+
+# (label used by the mentor document views, model, file field, url key for open_document)
+COHORT_DOCUMENT_TYPES = [
+    ("Internship / PBL", InternshipPBL, "certificate", "internship"),
+    ("Sports / Cultural", SportsCulturalEvent, "certificate", "sports"),
+    ("Other Event", OtherEvent, "certificate", "other"),
+    ("Course", CertificationCourse, "certificate", "course"),
+    ("Publication", PaperPublication, "certificate", "publication"),
+    ("Semester Result", SemesterResult, "marksheet", "semester"),
+]
+
+
+def mentor_cohort(mentor, with_progress=True):
+    """
+    Returns one dict per mentee of `mentor` (mapping order):
+    mapping, mentee, user, profile (or None), moodle_id ("" if unset) and, with_progress,
+    completed / total / has_pending.
+    """
+    mappings = list(
+        MentorMentee.objects.filter(mentor=mentor)
+        .select_related("mentee__user__profile")
+        .order_by("id")
+    )
+    progress = get_document_progress_bulk([m.mentee_id for m in mappings]) if with_progress else {}
+
+    cohort = []
+    for mapping in mappings:
+        user = mapping.mentee.user
+        profile = getattr(user, "profile", None)
+        member = {
+            "mapping": mapping,
+            "mentee": mapping.mentee,
+            "user": user,
+            "profile": profile,
+            "moodle_id": str(profile.moodle_id).strip() if profile and profile.moodle_id else "",
+        }
+        if with_progress:
+            member["completed"], member["total"], member["has_pending"] = progress[user.pk]
+        cohort.append(member)
+    return cohort
+
+
+def mentor_reminder_counts(mentor):
+    """Counts shown on the mentor home page."""
+    return {
+        "unapproved_messages": Msg.objects.filter(receipient=mentor.user, is_approved=False).count(),
+        "pending_queries": Query.objects.filter(mentor=mentor, status__in=["pending", "open"]).count(),
+        "pending_meetings": Meeting.objects.filter(
+            mentor=mentor, status="scheduled", ends_at__gt=timezone.now(),
+        ).count(),
+    }
+
+
+def cohort_documents(users, types=None):
+    """
+    Yields (user, label, url_key, item, filefield) for every document row of `users`,
+    grouped per user in COHORT_DOCUMENT_TYPES order. One query per category.
+    """
+    by_user = {u.pk: [] for u in users}
+    for label, model, file_field, url_key in COHORT_DOCUMENT_TYPES:
+        if types is not None and label not in types:
+            continue
+        for item in model.objects.filter(user_id__in=by_user).order_by("pk"):
+            by_user[item.user_id].append((label, url_key, item, getattr(item, file_field)))
+    for user in users:
+        yield from ((user,) + doc for doc in by_user[user.pk])
@@ -1,11 +1,14 @@
-import json
+import asyncio
 import time
+from urllib.parse import parse_qs
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
-from django.core.serializers.json import DjangoJSONEncoder
 from django.contrib.auth import get_user_model
 
-from .models import Reply, Reaction, ReplySeen
+from .models import Reply, Reaction
+from . import chat_changes, chat_framing, chat_membership, chat_presence, chat_typing, read_receipts
+from .chat_batching import ReceiptBatcher, batching_enabled, save_receipts
+from .chat_messages import max_message_length, send_text_reply
 
 User = get_user_model()
 
@@ -15,16 +18,24 @@ class ChatConsumer(AsyncWebsocketConsumer):
     Production-grade WebSocket consumer for chat:
     - Authenticated users only
     - Conversation-level authorization
-    - Presence, typing, reactions, seen
-    - HTTP creates messages, WS broadcasts only
+    - Presence registry with heartbeats, snapshot on connect, coalesced diffs (see chat_presence)
+    - Typing aggregated per conversation and broadcast per tick (see chat_typing)
+    - Reactions, seen (micro-batched, see chat_batching)
+    - Text replies are sent over the socket (send action, see chat_messages); HTTP only for files
+    - Reconnect catch-up: ?since=<seq> or a resync action replays the change log (see chat_changes)
+    - Wire format negotiated by subprotocol: JSON by default, compact JSON / msgpack with batched frames (see chat_framing)
     """
 
+    # group events that go through the change log
+    REPLAYABLE = {"new_message", "edited_message", "deleted_message", "seen_event", "reaction_event", "receipt_batch"}
+
     # -----------------------
     # CONNECT / DISCONNECT
     # -----------------------
 
     async def connect(self):
         self.accepted = False  # safety flag
+        self.frames = chat_framing.FrameWriter(self.send, chat_framing.negotiate(self.scope.get("subprotocols")))
 
         try:
             # --- AUTH CHECK ---
@@ -46,6 +57,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 return
 
             self.room_group_name = f"conversation_{self.conv_id}"
+            self.receipts = ReceiptBatcher(self.flush_receipts) if batching_enabled() else None
 
             # --- JOIN GROUP ---
             await self.channel_layer.group_add(
@@ -54,19 +66,24 @@ class ChatConsumer(AsyncWebsocketConsumer):
             )
 
             # --- ACCEPT SOCKET ---
-            await self.accept()
+            await self.accept(subprotocol=self.frames.codec.protocol)
             self.accepted = True
 
-            # --- PRESENCE JOIN ---
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                {
-                    "type": "presence",
-                    "user_id": user.id,
-                    "username": getattr(user, "username", ""),
-                    "joined": True,
-                }
+            # --- PRESENCE JOIN: snapshot for this socket, a diff for the others ---
+            online, _ = await chat_presence.register(
+                self.conv_id, self.channel_name, user.id, getattr(user, "username", "")
             )
+            await self.send_json({
+                "action": "presence_snapshot",
+                "online": [{"user_id": uid, "username": name} for uid, name in online.items()],
+            })
+            chat_presence.schedule_diff(self.conv_id)
+            self._heartbeat = asyncio.ensure_future(self.presence_heartbeat())
+
+            # --- CATCH-UP AFTER A RECONNECT ---
+            since = parse_qs(self.scope.get("query_string", b"").decode()).get("since")
+            if since:
+                await self.replay_changes(since[0])
 
         except Exception as e:
             print("WebSocket connect error:", e)
@@ -76,37 +93,43 @@ class ChatConsumer(AsyncWebsocketConsumer):
         if not getattr(self, "accepted", False):
             return
 
+        self.frames.discard()
+
+        if getattr(self, "receipts", None) is not None:
+            await self.receipts.flush(final=True)  # also cancels a pending window
+
+        if getattr(self, "_heartbeat", None) is not None:
+            self._heartbeat.cancel()
+
+        user = self.scope.get("user")
+        if chat_typing.aggregation_enabled() and user and user.is_authenticated:
+            chat_typing.aggregator(self.conv_id).set_typing(user.id, "", False)
+
         if hasattr(self, "room_group_name"):
             await self.channel_layer.group_discard(
                 self.room_group_name,
                 self.channel_name
             )
 
-            user = self.scope.get("user")
-            if user and user.is_authenticated:
-                await self.channel_layer.group_send(
-                    self.room_group_name,
-                    {
-                        "type": "presence",
-                        "user_id": user.id,
-                        "username": getattr(user, "username", ""),
-                        "joined": False,
-                    }
-                )
+            # --- PRESENCE LEAVE (reported in the next diff) ---
+            await chat_presence.unregister(self.conv_id, self.channel_name)
+            chat_presence.schedule_diff(self.conv_id)
 
     # -----------------------
     # RECEIVE
     # -----------------------
 
     async def receive(self, text_data=None, bytes_data=None):
-        if not text_data:
+        if not text_data and not bytes_data:
             return
 
         try:
-            data = json.loads(text_data)
-        except json.JSONDecodeError:
+            data = self.frames.codec.decode(text_data, bytes_data)
+        except ValueError:  # invalid JSON / msgpack
             await self.close(code=4000)
             return
+        if not isinstance(data, dict):
+            return
 
         user = self.scope.get("user")
         if not user or not user.is_authenticated:
@@ -114,8 +137,22 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
         action = data.get("action")
 
-        # ---- TYPING (throttled) ----
-        if action == "typing":
+        if action == "resync":
+            await self.replay_changes(data.get("since"))
+            return
+
+        # ---- SEND (text replies; attachments still go through the upload view) ----
+        if action == "send":
+            await self.send_text(user, data)
+            return
+
+        # ---- TYPING (aggregated per tick; the throttled per-frame broadcast is the fallback) ----
+        if action == "typing" and chat_typing.aggregation_enabled():
+            chat_typing.aggregator(self.conv_id).set_typing(
+                user.id, getattr(user, "username", ""), bool(data.get("typing", False))
+            )
+
+        elif action == "typing":
             now = time.time()
             if hasattr(self, "_last_typing") and now - self._last_typing < 0.8:
                 return
@@ -131,38 +168,46 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 }
             )
 
-        # ---- SEEN ----
+        # ---- SEEN (watermark: everything up to reply_id) ----
         elif action == "seen":
-            reply_id = data.get("reply_id")
-            if reply_id:
+            try:
+                reply_id = int(data.get("reply_id") or 0)
+            except (TypeError, ValueError):
+                return
+            # replies at or below what this socket already acknowledged need no DB round-trip;
+            # the socket's watermark only moves once a write confirmed it (not for foreign / unknown ids)
+            if reply_id > getattr(self, "_seen_watermark", 0):
+                if self.receipts is not None:
+                    await self.receipts.add_seen(reply_id)
+                    return
                 saved = await self.mark_seen(reply_id, user.id)
                 if saved:
-                    await self.channel_layer.group_send(
-                        self.room_group_name,
-                        {
-                            "type": "seen_event",
-                            "reply_id": reply_id,
-                            "user_id": user.id,
-                        }
-                    )
+                    self._seen_watermark = max(getattr(self, "_seen_watermark", 0), reply_id)
+                    await self.publish({
+                        "type": "seen_event",
+                        "reply_id": reply_id,
+                        "user_id": user.id,
+                    })
 
         # ---- REACTION ----
         elif action == "reaction":
             reply_id = data.get("reply_id")
             emoji = data.get("emoji")
 
-            if reply_id and emoji:
+            if reply_id and emoji and self.receipts is not None:
+                try:
+                    await self.receipts.add_reaction(int(reply_id), str(emoji)[:20])
+                except (TypeError, ValueError):
+                    pass
+            elif reply_id and emoji:
                 reaction = await self.add_reaction(reply_id, user.id, emoji)
                 if reaction:
-                    await self.channel_layer.group_send(
-                        self.room_group_name,
-                        {
-                            "type": "reaction_event",
-                            "reply_id": reply_id,
-                            "user_id": user.id,
-                            "emoji": emoji,
-                        }
-                    )
+                    await self.publish({
+                        "type": "reaction_event",
+                        "reply_id": reply_id,
+                        "user_id": user.id,
+                        "emoji": emoji,
+                    })
 
     # -----------------------
     # GROUP EVENT HANDLERS
@@ -176,10 +221,18 @@ class ChatConsumer(AsyncWebsocketConsumer):
             "typing": event["typing"],
         })
 
+    async def typing_state(self, event):
+        await self.send_json({
+            "action": "typing_state",
+            "source": event["source"],
+            "typing": event["typing"],
+        })
+
     async def new_message(self, event):
         await self.send_json({
             "action": "new_message",
             "message": event["message"],
+            "seq": event.get("seq"),
         })
 
     async def seen_event(self, event):
@@ -187,6 +240,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
             "action": "seen_event",
             "reply_id": event["reply_id"],
             "user_id": event["user_id"],
+            "seq": event.get("seq"),
         })
 
     async def reaction_event(self, event):
@@ -195,52 +249,146 @@ class ChatConsumer(AsyncWebsocketConsumer):
             "reply_id": event["reply_id"],
             "user_id": event["user_id"],
             "emoji": event["emoji"],
+            "seq": event.get("seq"),
         })
 
-    async def presence(self, event):
+    async def receipt_batch(self, event):
         await self.send_json({
-            "action": "presence",
-            "user_id": event["user_id"],
-            "username": event["username"],
+            "action": "batch",
+            "events": event["events"],
+            "seq": event.get("seq"),
+        })
+
+    async def presence_diff(self, event):
+        await self.send_json({
+            "action": "presence_diff",
             "joined": event["joined"],
+            "left": event["left"],
         })
 
     async def edited_message(self, event):
         await self.send_json({
             "action": "edited_message",
             "message": event["message"],
+            "seq": event.get("seq"),
         })
 
     async def deleted_message(self, event):
         await self.send_json({
             "action": "deleted_message",
             "message": event["message"],
+            "seq": event.get("seq"),
         })
 
+    # -----------------------
+    # RECEIPT BATCHING
+    # -----------------------
+
+    async def flush_receipts(self, seen_reply_id, reactions):
+        """Called by the ReceiptBatcher once per window: one write round-trip, one broadcast."""
+        user = self.scope["user"]
+        seen, stored = await self.save_receipts(user.id, seen_reply_id, reactions)
+
+        events = []
+        if seen:
+            self._seen_watermark = max(getattr(self, "_seen_watermark", 0), seen_reply_id)
+            events.append({"action": "seen_event", "reply_id": seen_reply_id, "user_id": user.id})
+        events += [
+            {"action": "reaction", "reply_id": reply_id, "user_id": user.id, "emoji": emoji}
+            for reply_id, emoji in stored.items()
+        ]
+        if events:
+            await self.publish({"type": "receipt_batch", "events": events})
+
+    # -----------------------
+    # PRESENCE
+    # -----------------------
+
+    async def presence_heartbeat(self):
+        """Keeps this socket's registry entry alive; also notices entries of sockets that stopped beating."""
+        user = self.scope["user"]
+        while True:
+            await asyncio.sleep(chat_presence.heartbeat_interval())
+            _, expired = await chat_presence.register(
+                self.conv_id, self.channel_name, user.id, getattr(user, "username", "")
+            )
+            if expired:
+                chat_presence.schedule_diff(self.conv_id)
+
+    # -----------------------
+    # SEND
+    # -----------------------
+
+    async def send_text(self, user, data):
+        client_id = str(data.get("client_id") or "")[:64] or None
+        text = str(data.get("text") or "").strip()
+        if not text or len(text) > max_message_length():
+            await self.send_json({
+                "action": "send_error",
+                "client_id": client_id,
+                "error": "Message is empty" if not text else "Message is too long",
+            })
+            return
+
+        event, created = await self.save_text_reply(user, text, client_id)
+        if created:
+            await self.channel_layer.group_send(self.room_group_name, event)
+        else:
+            # a retry of something already delivered: only the sender needs its confirmation again
+            await self.new_message(event)
+
+    # -----------------------
+    # CHANGE LOG
+    # -----------------------
+
+    async def publish(self, event):
+        """Records a group event in the change log, then broadcasts it with its seq."""
+        event = await self.record_change(event)
+        await self.channel_layer.group_send(self.room_group_name, event)
+
+    async def replay_changes(self, since):
+        """Sends this socket the events it missed after `since`, as the frames it would have received."""
+        try:
+            since = int(since)
+        except (TypeError, ValueError):
+            return
+        events = await self.changes_since(since)
+        if events is None:
+            await self.send_json({"action": "resync_required"})
+            return
+        for event in events:
+            handler = getattr(self, event["type"], None) if event["type"] in self.REPLAYABLE else None
+            if handler:
+                await handler(event)
+
     # -----------------------
     # DB HELPERS
     # -----------------------
 
+    @database_sync_to_async
+    def save_text_reply(self, user, text, client_id):
+        return send_text_reply(self.conv_id, user, text, client_id)
+
+    @database_sync_to_async
+    def record_change(self, event):
+        return chat_changes.record(self.conv_id, event)
+
+    @database_sync_to_async
+    def changes_since(self, since):
+        return chat_changes.changes_since(self.conv_id, since)
+
+    @database_sync_to_async
+    def save_receipts(self, user_id, seen_reply_id, reactions):
+        return save_receipts(self.conv_id, user_id, seen_reply_id, reactions)
+
     @database_sync_to_async
     def user_allowed_in_conversation(self, user_id, conv_id):
-        """
-        Authorization check.
-        Adjust logic if you have a Conversation/Members table.
-        """
-        return Reply.objects.filter(
-            conversation_id=conv_id,
-            sender_id=user_id
-        ).exists()
+        """Authorization check: the conversation's participants (cached, see chat_membership)."""
+        return chat_membership.is_member(conv_id, user_id)
 
     @database_sync_to_async
     def mark_seen(self, reply_id, user_id):
-        try:
-            reply = Reply.objects.get(pk=reply_id)
-            user = User.objects.get(pk=user_id)
-            ReplySeen.objects.get_or_create(reply=reply, user=user)
-            return True
-        except Exception:
-            return False
+        return read_receipts.mark_seen(self.conv_id, user_id, reply_id)
 
     @database_sync_to_async
     def add_reaction(self, reply_id, user_id, emoji):
@@ -257,10 +405,9 @@ class ChatConsumer(AsyncWebsocketConsumer):
             return None
 
     # -----------------------
-    # SEND JSON HELPER
+    # SEND HELPER
     # -----------------------
 
     async def send_json(self, payload):
-        await self.send(
-            text_data=json.dumps(payload, cls=DjangoJSONEncoder)
-        )
+        """Sends one event in the negotiated format (compact formats may batch it with the next ones)."""
+        await self.frames.write(payload)
@@ -0,0 +1,214 @@
+"""
+Background export jobs.
+
+Slow export views are wrapped with @export_job. Instead of building the workbook/PDF inside
+the request, the wrapper stores the request parameters in an ExportJob row and returns at once.
+`python manage.py run_export_worker` later replays the same view with those parameters in a
+process pool and saves the response body under MEDIA_ROOT/exports/.
+
+An identical request (same view, user and parameters) reuses the queued, running or finished
+job until its artifact expires (settings.EXPORT_JOB_TTL_SECONDS).
+"""
+import hashlib
+import json
+import re
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.files.base import ContentFile
+from django.http import JsonResponse
+from django.shortcuts import redirect
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from .models import ExportJob, User
+
+FORM_CONTENT_TYPES = ("application/x-www-form-urlencoded", "multipart/form-data")
+IGNORED_PARAMS = {"csrfmiddlewaretoken"}
+
+_filename_re = re.compile(r'filename\*?=(?:UTF-8\'\')?"?([^";]+)"?')
+
+
+def jobs_enabled():
+    return getattr(settings, "EXPORT_JOBS_ASYNC", False)
+
+
+def job_ttl():
+    return timedelta(seconds=getattr(settings, "EXPORT_JOB_TTL_SECONDS", 30 * 60))
+
+
+def wants_json(request):
+    return (
+        request.headers.get("x-requested-with") == "XMLHttpRequest"
+        or "application/json" in request.headers.get("accept", "")
+    )
+
+
+def _request_params(request):
+    params = {
+        "method": request.method,
+        "path": request.path,
+        "query": {k: v for k, v in request.GET.lists() if k not in IGNORED_PARAMS},
+    }
+    if request.method == "POST":
+        if request.content_type in FORM_CONTENT_TYPES:
+            params["post"] = {k: v for k, v in request.POST.lists() if k not in IGNORED_PARAMS}
+        else:
+            params["body"] = request.body.decode("utf-8", errors="replace")
+            params["content_type"] = request.content_type
+    return params
+
+
+def _params_hash(kind, user_id, params):
+    raw = json.dumps([kind, user_id, params], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def enqueue_export(kind, request):
+    """Returns (job, created). Reuses a pending or still-valid finished job with identical parameters."""
+    params = _request_params(request)
+    params_hash = _params_hash(kind, request.user.pk, params)
+
+    for job in ExportJob.objects.filter(params_hash=params_hash, status__in=["queued", "running", "done"]):
+        if job.status != "done":
+            return job, False
+        if job.expires_at and job.expires_at > timezone.now() and job.file and job.file.storage.exists(job.file.name):
+            return job, False
+
+    job = ExportJob.objects.create(
+        kind=kind,
+        params=params,
+        params_hash=params_hash,
+        requested_by=request.user,
+    )
+    return job, True
+
+
+def job_payload(job):
+    payload = {
+        "job_id": job.pk,
+        "kind": job.kind,
+        "status": job.status,
+        "progress": job.progress,
+        "status_url": reverse("export_job_status", args=[job.pk]),
+        "page_url": reverse("export_job_page", args=[job.pk]),
+        "download_url": reverse("export_job_download", args=[job.pk]) if job.status == "done" else None,
+        "filename": job.filename or None,
+        "error": job.error or None,
+    }
+    return payload
+
+
+def export_job(methods=("GET", "POST")):
+    """
+    View decorator: enqueue the export instead of running it inline.
+    XHR/JSON clients get a 202 with the job status; browsers are redirected to the job page.
+    Put it below login_required/user_passes_test so permissions are checked before enqueueing.
+    """
+    def decorator(view_func):
+        kind = view_func.__name__
+
+        @wraps(view_func)
+        def _wrapped(request, *args, **kwargs):
+            if getattr(request, "export_job", None) is not None or not jobs_enabled() or request.method not in methods:
+                return view_func(request, *args, **kwargs)
+
+            job, _ = enqueue_export(kind, request)
+            if wants_json(request):
+                return JsonResponse(job_payload(job), status=200 if job.status == "done" else 202)
+            return redirect("export_job_page", pk=job.pk)
+        return _wrapped
+    return decorator
+
+
+def report_progress(request, percent):
+    """Lets a view running inside the worker publish coarse progress (0-100). No-op for normal requests."""
+    job = getattr(request, "export_job", None)
+    if job is not None:
+        job.progress = max(0, min(99, int(percent)))
+        ExportJob.objects.filter(pk=job.pk).update(progress=job.progress)
+
+
+def _build_request(job):
+    params = job.params
+    factory = RequestFactory()
+    method = params.get("method", "GET")
+    if method == "GET":
+        request = factory.get(params["path"], data=params.get("query") or {})
+    elif "post" in params:
+        request = factory.post(params["path"], data=params["post"])
+    else:
+        request = factory.generic(
+            method, params["path"],
+            data=params.get("body", "").encode("utf-8"),
+            content_type=params.get("content_type") or "application/octet-stream",
+        )
+        if params.get("query"):
+            request.GET = request.GET.copy()
+            for key, values in params["query"].items():
+                request.GET.setlist(key, values)
+
+    request.user = User.objects.get(pk=job.requested_by_id)
+    request.session = {}
+    request._messages = CookieStorage(request)
+    request.export_job = job
+    return request
+
+
+def _response_filename(response, job):
+    match = _filename_re.search(response.get("Content-Disposition", ""))
+    return match.group(1) if match else f"{job.kind}_{job.pk}"
+
+
+def run_export_job(job_id):
+    """Builds one job's artifact. Runs inside a worker process; returns the final status."""
+    job = ExportJob.objects.get(pk=job_id)
+    job.status = "running"
+    job.progress = 5
+    job.started_at = job.started_at or timezone.now()
+    job.save(update_fields=["status", "progress", "started_at"])
+
+    try:
+        request = _build_request(job)
+        match = resolve(job.params["path"])
+        response = match.func(request, *match.args, **match.kwargs)
+
+        if response.status_code != 200 or "attachment" not in response.get("Content-Disposition", ""):
+            location = response.get("Location")
+            raise ValueError(f"Export returned HTTP {response.status_code}" + (f" (redirect to {location})" if location else ""))
+
+        if response.streaming:
+            content = b"".join(response.streaming_content)
+        else:
+            content = response.content
+        response.close()
+
+        job.filename = _response_filename(response, job)
+        job.content_type = response.get("Content-Type", "application/octet-stream")
+        job.file.save(f"{job.pk}_{job.filename}", ContentFile(content), save=False)
+        job.status = "done"
+        job.progress = 100
+    except Exception as exc:
+        job.status = "failed"
+        job.error = str(exc)[:2000] or exc.__class__.__name__
+
+    job.finished_at = timezone.now()
+    job.expires_at = job.finished_at + job_ttl()
+    job.save()
+    return job.status
+
+
+def cleanup_expired_jobs(now=None):
+    """Deletes expired jobs and their artifacts. Returns the number of jobs removed."""
+    now = now or timezone.now()
+    expired = ExportJob.objects.filter(expires_at__lte=now)
+    removed = 0
+    for job in expired:
+        if job.file:
+            job.file.delete(save=False)
+        job.delete()
+        removed += 1
+    return removed
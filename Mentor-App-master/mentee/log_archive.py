@@ -0,0 +1,233 @@
+"""
+Cold storage for old ActivityLog rows.
+
+Rows older than the hot window are moved into gzip-compressed JSON-lines files, one partition
+per UTC day:
+
+    <ACTIVITY_LOG_ARCHIVE_DIR>/2025/01/activitylog-2025-01-03.jsonl.gz
+    <ACTIVITY_LOG_ARCHIVE_DIR>/manifest.json
+
+manifest.json indexes the partitions (file, row count, id and timestamp bounds) and records
+`archived_through`, the cutoff of the last run. Everything older than that may live in the archive,
+which is how activity_logs_api decides to read it.
+
+The move is resumable. Each batch is written in four steps: note the batch and the current file
+sizes in the manifest, append to the partition files, mark the batch as written, then delete the rows.
+After a crash, an unwritten batch is rolled back by truncating the files, and a written batch only
+has its delete replayed.
+"""
+import gzip
+import json
+import os
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import ActivityLog
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+def archive_dir():
+    return str(getattr(settings, "ACTIVITY_LOG_ARCHIVE_DIR", os.path.join(settings.BASE_DIR, "log_archive")))
+
+
+def hot_days():
+    return getattr(settings, "ACTIVITY_LOG_HOT_DAYS", 90)
+
+
+def _manifest_path():
+    return os.path.join(archive_dir(), MANIFEST_NAME)
+
+
+def load_manifest():
+    try:
+        with open(_manifest_path(), encoding="utf-8") as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return {"version": MANIFEST_VERSION, "archived_through": None, "partitions": {}, "pending": None}
+
+
+def _save_manifest(manifest):
+    os.makedirs(archive_dir(), exist_ok=True)
+    tmp = _manifest_path() + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, indent=1, sort_keys=True)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, _manifest_path())
+
+
+def partition_key(ts):
+    return ts.astimezone(dt_timezone.utc).date().isoformat()
+
+
+def _partition_file(key):
+    year, month, _ = key.split("-")
+    return os.path.join(year, month, f"activitylog-{key}.jsonl.gz")
+
+
+def serialize(log):
+    return {
+        "id": log.pk,
+        "user_id": log.user_id,
+        # kept by name too: the user may be gone by the time the archive is read
+        "user": log.user.username if log.user_id and log.user else None,
+        "action": log.action,
+        "module": log.module,
+        "details": log.details,
+        "ip_address": log.ip_address,
+        "browser": log.browser,
+        "request_path": log.request_path,
+        "old_data": log.old_data,
+        "new_data": log.new_data,
+        "changes": log.changes,
+        "timestamp": log.timestamp.isoformat(),
+    }
+
+
+def _recover(manifest):
+    """Finish or roll back a batch interrupted by a crash."""
+    pending = manifest.get("pending")
+    if not pending:
+        return 0
+    cutoff = datetime.fromisoformat(pending["cutoff"])
+    if not pending.get("written"):
+        for rel, size in pending["offsets"].items():
+            path = os.path.join(archive_dir(), rel)
+            if os.path.exists(path):
+                with open(path, "r+b") as fh:
+                    fh.truncate(size)
+        manifest["pending"] = None
+        _save_manifest(manifest)
+        return 0
+
+    deleted, _ = ActivityLog.objects.filter(
+        id__gte=pending["min_id"], id__lte=pending["max_id"], timestamp__lt=cutoff,
+    ).delete()
+    _merge_stats(manifest, pending["stats"])
+    manifest["pending"] = None
+    _save_manifest(manifest)
+    return deleted
+
+
+def _merge_stats(manifest, stats):
+    partitions = manifest["partitions"]
+    for key, st in stats.items():
+        current = partitions.get(key)
+        if current is None:
+            partitions[key] = st
+            continue
+        current["rows"] += st["rows"]
+        current["min_id"] = min(current["min_id"], st["min_id"])
+        current["max_id"] = max(current["max_id"], st["max_id"])
+        current["min_ts"] = min(current["min_ts"], st["min_ts"])
+        current["max_ts"] = max(current["max_ts"], st["max_ts"])
+
+
+def archive_logs(older_than_days=None, batch_size=5000, max_batches=None, now=None, stdout=None):
+    """
+    Moves rows older than `older_than_days` (default ACTIVITY_LOG_HOT_DAYS) into the archive.
+    Returns the number of rows moved. Safe to interrupt and re-run.
+    """
+    manifest = load_manifest()
+    moved = _recover(manifest)
+
+    days = hot_days() if older_than_days is None else older_than_days
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    batches = 0
+
+    while max_batches is None or batches < max_batches:
+        logs = list(
+            ActivityLog.objects.filter(timestamp__lt=cutoff)
+            .select_related("user")
+            .order_by("id")[:batch_size]
+        )
+        if not logs:
+            break
+
+        groups, stats = {}, {}
+        for log in logs:
+            key = partition_key(log.timestamp)
+            groups.setdefault(key, []).append(serialize(log))
+        for key, rows in groups.items():
+            stamps = [r["timestamp"] for r in rows]
+            stats[key] = {
+                "file": _partition_file(key),
+                "rows": len(rows),
+                "min_id": min(r["id"] for r in rows),
+                "max_id": max(r["id"] for r in rows),
+                "min_ts": min(stamps),
+                "max_ts": max(stamps),
+            }
+
+        offsets = {}
+        for key in groups:
+            path = os.path.join(archive_dir(), stats[key]["file"])
+            offsets[stats[key]["file"]] = os.path.getsize(path) if os.path.exists(path) else 0
+
+        # 1. intent
+        manifest["pending"] = {
+            "cutoff": cutoff.isoformat(),
+            "min_id": logs[0].pk,
+            "max_id": logs[-1].pk,
+            "offsets": offsets,
+            "stats": stats,
+            "written": False,
+        }
+        _save_manifest(manifest)
+
+        # 2. append one gzip member per partition
+        for key, rows in groups.items():
+            path = os.path.join(archive_dir(), stats[key]["file"])
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "ab") as raw:
+                with gzip.GzipFile(fileobj=raw, mode="ab") as gz:
+                    for row in rows:
+                        gz.write((json.dumps(row, default=str) + "\n").encode("utf-8"))
+                raw.flush()
+                os.fsync(raw.fileno())
+
+        # 3. mark written, 4. delete + fold stats into the index
+        manifest["pending"]["written"] = True
+        _save_manifest(manifest)
+        moved += _recover(manifest)
+
+        batches += 1
+        if stdout:
+            stdout.write(f"  archived batch {batches}: ids {logs[0].pk}-{logs[-1].pk}")
+
+    previous = manifest.get("archived_through")
+    if previous is None or datetime.fromisoformat(previous) < cutoff:
+        manifest["archived_through"] = cutoff.isoformat()
+        _save_manifest(manifest)
+    return moved
+
+
+def archived_through():
+    """Cutoff of the last archive run (aware datetime) or None if nothing was ever archived."""
+    value = load_manifest().get("archived_through")
+    return datetime.fromisoformat(value) if value else None
+
+
+def iter_archived(start, end):
+    """Yields archived rows (dicts) with start <= timestamp < end."""
+    manifest = load_manifest()
+    start_key, end_key = partition_key(start), partition_key(end)
+    start_iso = start.astimezone(dt_timezone.utc)
+    end_iso = end.astimezone(dt_timezone.utc)
+
+    for key in sorted(manifest["partitions"]):
+        if not (start_key <= key <= end_key):
+            continue
+        path = os.path.join(archive_dir(), manifest["partitions"][key]["file"])
+        if not os.path.exists(path):
+            continue
+        with gzip.open(path, "rt", encoding="utf-8") as fh:
+            for line in fh:
+                row = json.loads(line)
+                ts = datetime.fromisoformat(row["timestamp"])
+                if start_iso <= ts < end_iso:
+                    yield row
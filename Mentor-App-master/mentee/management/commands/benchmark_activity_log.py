@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+
+from ...benchmarking import throwaway_database, measure
+from ...middleware import RequestCaptureMiddleware
+from ...models import ActivityLog, Notification, User
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare ActivityLog writes per request with batching off and on. "
+        "Runs in a throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=20, help="Simulated requests per mode")
+        parser.add_argument("--saves", type=int, default=25, help="Notifications created and updated per request")
+
+    def handle(self, *args, **options):
+        n_requests, n_saves = options["requests"], options["saves"]
+
+        with throwaway_database():
+            user = User.objects.create_user(username="bench_user", password="x", is_mentor=True)
+            factory = RequestFactory()
+
+            def view(request):
+                for i in range(n_saves):
+                    note = Notification.objects.create(user=user, message=f"benchmark {i}")
+                    note.is_read = True
+                    note.save()
+                return HttpResponse("ok")
+
+            middleware = RequestCaptureMiddleware(view)
+
+            for label, batching in (("per-row", False), ("batched", True)):
+                with override_settings(ACTIVITY_LOG_BATCHING=batching, ACTIVITY_LOG_ASYNC=False):
+                    logs_before = ActivityLog.objects.count()
+                    queries = inserts = 0
+                    seconds = 0.0
+                    for _ in range(n_requests):
+                        request = factory.post("/benchmark/")
+                        request.user = user
+                        with measure() as result:
+                            middleware(request)
+                        queries += len(result["queries"])
+                        inserts += sum(
+                            1 for sql in result["queries"]
+                            if sql.startswith('INSERT INTO "mentee_activitylog"')
+                        )
+                        seconds += result["seconds"]
+                    written = ActivityLog.objects.count() - logs_before
+
+                self.stdout.write(
+                    f"{label:>8}: {written / n_requests:.0f} log rows/request, "
+                    f"{inserts / n_requests:.1f} log INSERTs/request, "
+                    f"{queries / n_requests:.1f} queries/request, "
+                    f"{seconds / n_requests * 1000:.1f} ms/request"
+                )
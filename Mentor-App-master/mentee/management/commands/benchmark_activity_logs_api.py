@@ -0,0 +1,116 @@
+import json
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.utils import timezone
+
+from ...benchmarking import throwaway_database
+from ...models import ActivityLog, User
+from ...views.admin_logs import activity_logs_api
+
+MODULES = ["Profile", "InternshipPBL", "Project", "SemesterResult", "CertificationCourse", "PaperPublication",
+           "SportsCulturalEvent", "OtherEvent", "Msg", "Notification", "MentorMenteeInteraction", "Authentication"]
+ACTIONS = ["Created", "Updated", "Deleted", "User Logged In"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway database with activity logs and report p50/p95 latency of the "
+        "activity-log API per filter combination, for OFFSET and cursor pagination."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1_000_000)
+        parser.add_argument("--users", type=int, default=200)
+        parser.add_argument("--runs", type=int, default=20, help="Requests per scenario")
+        parser.add_argument("--per", type=int, default=50)
+        parser.add_argument("--deep-page", type=int, default=2000, help="Page number used for the deep OFFSET case")
+
+    def handle(self, *args, **options):
+        with throwaway_database() as connection:
+            staff = User.objects.create_user(username="bench_staff", password="x", is_staff=True)
+            self._seed(connection, options["rows"], options["users"])
+            self.stdout.write(f"Seeded {ActivityLog.objects.count()} rows\n")
+
+            day = timezone.localdate() - timedelta(days=30)
+            combos = [
+                ("no filter", {}),
+                ("module", {"module": "Msg", "exact": "1"}),
+                ("user", {"user": "bench_user_7", "exact": "1"}),
+                ("date", {"date": day.isoformat()}),
+                ("module+date", {"module": "Project", "exact": "1", "date": day.isoformat()}),
+                ("search", {"q": "row 12345"}),
+                ("module icontains", {"module": "event"}),
+            ]
+
+            factory = RequestFactory()
+            runs, per = options["runs"], options["per"]
+
+            def call(params):
+                request = factory.get("/admin/api/activity-logs/", params)
+                request.user = staff
+                start = time.perf_counter()
+                response = activity_logs_api(request)
+                elapsed = (time.perf_counter() - start) * 1000
+                return elapsed, response
+
+            header = f"{'filter':<18}{'mode':<22}{'p50 ms':>10}{'p95 ms':>10}"
+            self.stdout.write(header)
+            self.stdout.write("-" * len(header))
+
+            for label, filters in combos:
+                base = {**filters, "per": per}
+                scenarios = [
+                    ("offset page 1", {**base, "page": 1}),
+                    (f"offset page {options['deep_page']}", {**base, "page": options["deep_page"]}),
+                    ("cursor page 1", {**base, "cursor": ""}),
+                ]
+                for mode, params in scenarios:
+                    timings = [call(params)[0] for _ in range(runs)]
+                    self._report(label, mode, timings)
+
+                # walk forward with cursors: every request is a keyset seek, however deep
+                timings, cursor = [], ""
+                for _ in range(runs):
+                    elapsed, response = call({**base, "cursor": cursor, "count": "none"})
+                    timings.append(elapsed)
+                    cursor = json.loads(response.content)["next_cursor"]
+                    if not cursor:
+                        break
+                self._report(label, "cursor next pages", timings)
+
+    def _report(self, label, mode, timings):
+        timings = sorted(timings)
+        p50 = statistics.median(timings)
+        p95 = timings[min(len(timings) - 1, int(round(len(timings) * 0.95)) - 1)]
+        self.stdout.write(f"{label:<18}{mode:<22}{p50:>10.1f}{p95:>10.1f}")
+
+    def _seed(self, connection, rows, users):
+        created = User.objects.bulk_create([User(username=f"bench_user_{i}") for i in range(users)])
+        user_ids = [u.pk for u in created]
+        now = timezone.now()
+        rng = random.Random(42)
+        table = ActivityLog._meta.db_table
+        sql = (
+            f"INSERT INTO {connection.ops.quote_name(table)} "
+            "(user_id, action, module, details, request_path, timestamp) VALUES (%s, %s, %s, %s, %s, %s)"
+        )
+        batch = 10_000
+        with connection.cursor() as cursor:
+            for offset in range(0, rows, batch):
+                values = []
+                for i in range(offset, min(offset + batch, rows)):
+                    ts = now - timedelta(seconds=rng.randint(0, 365 * 24 * 3600))
+                    values.append((
+                        rng.choice(user_ids),
+                        rng.choice(ACTIONS),
+                        rng.choice(MODULES),
+                        f"benchmark row {i}",
+                        "/benchmark/",
+                        connection.ops.adapt_datetimefield_value(ts),
+                    ))
+                cursor.executemany(sql, values)
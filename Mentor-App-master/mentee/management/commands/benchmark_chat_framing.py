@@ -0,0 +1,82 @@
+import time
+
+from asgiref.sync import async_to_sync
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from ... import chat_framing
+from ...benchmarking import PROCESS_LOCAL_CHAT_CACHES, throwaway_database
+from ...models import Conversation, User
+from ...routing import websocket_urlpatterns
+
+IN_MEMORY_LAYER = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+
+
+class Command(BaseCommand):
+    help = (
+        "Send a burst of text replies over the chat socket and report, per "
+        "wire format (JSON, compact JSON, msgpack), the frames and bytes the receiving socket got and "
+        "the server's encode cost per event. Runs in a throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=200)
+
+    def handle(self, *args, **options):
+        protocols = [None, chat_framing.COMPACT_JSON_PROTOCOL]
+        if chat_framing.msgpack is not None:
+            protocols.append(chat_framing.MSGPACK_PROTOCOL)
+        else:
+            self.stdout.write("msgpack is not installed; skipping mentorchat.msgpack")
+
+        with throwaway_database(), override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYER, **PROCESS_LOCAL_CHAT_CACHES):
+            mentor = User.objects.create_user(username="bench_framing_mentor", password=None, is_mentor=True)
+            mentee = User.objects.create_user(username="bench_framing_mentee", password=None, is_mentee=True)
+            conv = Conversation.objects.create(sender=mentor, receipient=mentee, conversation="benchmark")
+
+            for protocol in protocols:
+                frames, size = async_to_sync(self._run)(conv, mentor, mentee, protocol, options["messages"])
+                events = sum(len(f) if isinstance(f, list) else 1 for f in frames)
+                # server CPU: encoding the frames as they were sent (a batch is encoded once)
+                codec = chat_framing.negotiate([protocol] if protocol else [])
+                start = time.perf_counter()
+                for frame in frames:
+                    codec.encode(frame)
+                encode_us = (time.perf_counter() - start) / events * 1e6
+                self.stdout.write(
+                    f"{protocol or 'json (default)':>24}: {events} events in {len(frames)} frames, "
+                    f"{size} bytes ({size / events:.0f} B/event), encode {encode_us:.1f} us/event"
+                )
+
+    async def _run(self, conv, mentor, mentee, protocol, messages):
+        app = URLRouter(websocket_urlpatterns)
+        subprotocols = [protocol] if protocol else None
+        sender = WebsocketCommunicator(app, f"/ws/chat/{conv.pk}/", subprotocols=subprotocols)
+        sender.scope["user"] = mentee
+        receiver = WebsocketCommunicator(app, f"/ws/chat/{conv.pk}/", subprotocols=subprotocols)
+        receiver.scope["user"] = mentor
+        for ws in (sender, receiver):
+            connected, _ = await ws.connect()
+            if not connected:
+                raise RuntimeError("could not connect")
+        while not await receiver.receive_nothing(timeout=1):  # presence frames
+            await receiver.receive_output()
+        while not await sender.receive_nothing(timeout=0.1):
+            await sender.receive_output()
+
+        # the sender speaks plain JSON frames, which every format accepts
+        for i in range(messages):
+            await sender.send_json_to({"action": "send", "text": f"benchmark message {i}", "client_id": f"{protocol}-{i}"})
+        frames, size = [], 0
+        codec = chat_framing.negotiate(subprotocols)
+        while not await receiver.receive_nothing(timeout=1):
+            output = await receiver.receive_output()
+            data = output.get("text") or output.get("bytes")
+            size += len(data.encode() if isinstance(data, str) else data)
+            frames.append(codec.decode(output.get("text"), output.get("bytes")))
+
+        for ws in (sender, receiver):
+            await ws.disconnect()
+        return frames, size
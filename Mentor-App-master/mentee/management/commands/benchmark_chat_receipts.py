@@ -0,0 +1,84 @@
+import asyncio
+import random
+
+from asgiref.sync import async_to_sync
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from ...benchmarking import PROCESS_LOCAL_CHAT_CACHES, count_statements, throwaway_database
+from ...models import Conversation, Reply, User
+from ...routing import websocket_urlpatterns
+
+IN_MEMORY_LAYER = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulate a chatty client (seen + reaction frames while scrolling) against ChatConsumer with "
+        "receipt batching off and on, and report DB writes per second. Runs in a throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=300, help="Replies in the conversation")
+        parser.add_argument("--frames", type=int, default=600, help="Frames sent by the client")
+        parser.add_argument("--interval-ms", type=float, default=2.0, help="Pause between frames")
+        parser.add_argument("--reaction-share", type=float, default=0.2, help="Fraction of frames that are reactions")
+
+    def handle(self, *args, **options):
+        with throwaway_database(), override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYER, **PROCESS_LOCAL_CHAT_CACHES):
+            mentor = User.objects.create_user(username="bench_mentor", password="x", is_mentor=True)
+            mentee = User.objects.create_user(username="bench_mentee", password="x", is_mentee=True)
+            conv = Conversation.objects.create(sender=mentor, receipient=mentee, conversation="benchmark")
+            Reply.objects.create(conversation=conv, sender=mentee, reply="hello")
+            Reply.objects.bulk_create(
+                [Reply(conversation=conv, sender=mentor, reply=f"message {i}") for i in range(options["messages"])]
+            )
+            reply_ids = list(conv.replies.order_by("id").values_list("id", flat=True))
+
+            rng = random.Random(1)
+            frames = []
+            for i in range(options["frames"]):
+                reply_id = reply_ids[min(i * len(reply_ids) // options["frames"], len(reply_ids) - 1)]
+                if rng.random() < options["reaction_share"]:
+                    frames.append({"action": "reaction", "reply_id": rng.choice(reply_ids), "emoji": rng.choice("👍❤😂")})
+                else:
+                    frames.append({"action": "seen", "reply_id": reply_id})
+
+            for label, batching in (("per-frame", False), ("batched", True)):
+                with override_settings(CHAT_RECEIPT_BATCHING=batching):
+                    with count_statements() as result:
+                        broadcasts = async_to_sync(self._run)(mentor, mentee, conv, frames, options["interval_ms"])
+                statements = result["statements"]
+                writes = statements["INSERT"] + statements["UPDATE"]
+                self.stdout.write(
+                    f"{label:>9}: {writes} DB writes ({writes / result['seconds']:.0f}/s), "
+                    f"{sum(statements.values())} queries, {broadcasts} frames received by the other side, "
+                    f"{result['seconds']:.2f} s"
+                )
+
+    async def _run(self, mentor, mentee, conv, frames, interval_ms):
+        app = URLRouter(websocket_urlpatterns)
+        sockets = []
+        for user in (mentor, mentee):
+            ws = WebsocketCommunicator(app, f"/ws/chat/{conv.pk}/")
+            ws.scope["user"] = user
+            connected, _ = await ws.connect()
+            if not connected:
+                raise RuntimeError(f"{user.username} could not connect")
+            sockets.append(ws)
+        receiver, client = sockets
+
+        for frame in frames:
+            await client.send_json_to(frame)
+            await asyncio.sleep(interval_ms / 1000)
+        await client.disconnect()
+
+        received = 0
+        while not await receiver.receive_nothing(timeout=0.3):
+            frame = await receiver.receive_json_from()
+            if not frame["action"].startswith("presence"):
+                received += 1
+        await receiver.disconnect()
+        return received
@@ -0,0 +1,82 @@
+import statistics
+import time
+
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+from django.urls import reverse
+
+from ...benchmarking import PROCESS_LOCAL_CHAT_CACHES, count_statements, throwaway_database
+from ...models import Conversation, Reply, User
+from ...routing import websocket_urlpatterns
+from ...views.mentee import upload_reply
+
+IN_MEMORY_LAYER = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure sender -> receiver latency of a text message sent through the upload view (HTTP) "
+        "and through the socket's send action. Runs in a throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=200, help="Messages sent per path")
+
+    def handle(self, *args, **options):
+        with throwaway_database(), override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYER, **PROCESS_LOCAL_CHAT_CACHES):
+            mentor = User.objects.create_user(username="bench_mentor", password="x", is_mentor=True)
+            mentee = User.objects.create_user(username="bench_mentee", password="x", is_mentee=True)
+            conv = Conversation.objects.create(sender=mentor, receipient=mentee, conversation="benchmark")
+            Reply.objects.create(conversation=conv, sender=mentee, reply="hello")
+            Reply.objects.create(conversation=conv, sender=mentor, reply="hello")
+
+            for via in ("http", "websocket"):
+                with count_statements() as result:
+                    latencies = async_to_sync(self._run)(mentor, mentee, conv, options["messages"], via)
+                latencies.sort()
+                per_message = sum(result["statements"].values()) / len(latencies)
+                self.stdout.write(
+                    f"{via:>9}: p50 {latencies[len(latencies) // 2] * 1000:.2f} ms, "
+                    f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.2f} ms, "
+                    f"mean {statistics.mean(latencies) * 1000:.2f} ms, {per_message:.1f} queries/message"
+                )
+            self.stdout.write("(the HTTP figures call the view directly; a real request adds its own round-trip)")
+
+    async def _run(self, mentor, mentee, conv, count, via):
+        app = URLRouter(websocket_urlpatterns)
+        sockets = []
+        for user in (mentor, mentee):
+            ws = WebsocketCommunicator(app, f"/ws/chat/{conv.pk}/")
+            ws.scope["user"] = user
+            connected, _ = await ws.connect()
+            if not connected:
+                raise RuntimeError(f"{user.username} could not connect")
+            sockets.append(ws)
+        sender, receiver = sockets
+
+        factory = RequestFactory()
+        url = reverse("upload_reply", args=[conv.pk])
+
+        def post(text):
+            request = factory.post(url, {"reply": text})
+            request.user = mentor
+            upload_reply(request, pk=conv.pk)
+
+        latencies = []
+        for i in range(count):
+            text = f"{via} message {i}"
+            start = time.perf_counter()
+            if via == "http":
+                await sync_to_async(post)(text)
+            else:
+                await sender.send_json_to({"action": "send", "text": text, "client_id": f"bench-{i}"})
+            while (await receiver.receive_json_from(timeout=5))["action"] != "new_message":
+                pass
+            latencies.append(time.perf_counter() - start)
+
+        for ws in sockets:
+            await ws.disconnect()
+        return latencies
@@ -0,0 +1,94 @@
+import asyncio
+import random
+import time
+
+from asgiref.sync import async_to_sync
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from ...benchmarking import PROCESS_LOCAL_CHAT_CACHES, throwaway_database
+from ...chat_membership import remember
+from ...models import Conversation, User
+from ...routing import websocket_urlpatterns
+
+IN_MEMORY_LAYER = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulate N users typing in one conversation (a typing frame per keystroke, pauses in between) "
+        "with per-frame typing broadcasts and with the tick aggregator, and report typing frames delivered "
+        "per second. Runs in a throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--typers", type=int, default=20)
+        parser.add_argument("--seconds", type=float, default=5.0)
+        parser.add_argument("--keystroke-ms", type=float, default=150.0)
+
+    def handle(self, *args, **options):
+        with throwaway_database(), override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYER, **PROCESS_LOCAL_CHAT_CACHES):
+            users = [
+                User.objects.create_user(username=f"bench_typer_{i}", password=None, is_mentee=True)
+                for i in range(options["typers"])
+            ]
+            conv = Conversation.objects.create(sender=users[0], receipient=users[1], conversation="benchmark")
+            # conversations have two participants; the benchmark stands in for a group-sized one
+            remember(conv.pk, [u.pk for u in users])
+
+            for label, aggregation in (("per-frame", False), ("aggregated", True)):
+                with override_settings(CHAT_TYPING_AGGREGATION=aggregation):
+                    sent, delivered = async_to_sync(self._run)(
+                        conv, users, options["seconds"], options["keystroke_ms"] / 1000
+                    )
+                self.stdout.write(
+                    f"{label:>10}: {sent} typing frames sent, {delivered} delivered "
+                    f"({delivered / options['seconds']:.0f}/s, "
+                    f"{delivered / options['seconds'] / len(users):.1f}/s per socket)"
+                )
+
+    async def _run(self, conv, users, seconds, keystroke):
+        app = URLRouter(websocket_urlpatterns)
+        sockets = []
+        for user in users:
+            ws = WebsocketCommunicator(app, f"/ws/chat/{conv.pk}/")
+            ws.scope["user"] = user
+            connected, _ = await ws.connect()
+            if not connected:
+                raise RuntimeError(f"{user.username} could not connect")
+            sockets.append(ws)
+        await asyncio.sleep(1)  # let the presence diffs go out before counting
+
+        stop = time.monotonic() + seconds
+        sent = [0]
+        delivered = [0]
+
+        async def typer(ws, rng):
+            while time.monotonic() < stop:
+                session_end = time.monotonic() + rng.uniform(1, 3)
+                while time.monotonic() < min(session_end, stop):
+                    await ws.send_json_to({"action": "typing", "typing": True})
+                    sent[0] += 1
+                    await asyncio.sleep(keystroke * rng.uniform(0.5, 1.5))
+                await ws.send_json_to({"action": "typing", "typing": False})
+                sent[0] += 1
+                await asyncio.sleep(rng.uniform(0.5, 2))
+
+        async def reader(ws):
+            while time.monotonic() < stop:
+                if await ws.receive_nothing(timeout=0.05):
+                    continue
+                frame = await ws.receive_json_from()
+                if frame["action"] in ("typing", "typing_state"):
+                    delivered[0] += 1
+
+        await asyncio.gather(
+            *(typer(ws, random.Random(i)) for i, ws in enumerate(sockets)),
+            *(reader(ws) for ws in sockets),
+        )
+        for ws in sockets:
+            await ws.disconnect()
+        await asyncio.sleep(0.5)
+        return sent[0], delivered[0]
@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, models
+from django.utils import timezone
+
+from ...benchmarking import throwaway_database, count_statements
+from ...models import Conversation, ReadWatermark, Reply, User
+from ...read_receipts import mark_seen
+
+
+def _legacy_seen_model():
+    """The removed one-row-per-(reply, user) ReplySeen model, rebuilt for comparison only."""
+
+    class LegacyReplySeen(models.Model):
+        reply = models.ForeignKey(Reply, on_delete=models.CASCADE, related_name="+")
+        user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+        seen_at = models.DateTimeField(auto_now_add=True)
+
+        class Meta:
+            app_label = "mentee"
+            db_table = "benchmark_legacy_replyseen"
+            unique_together = ("reply", "user")
+
+    return LegacyReplySeen
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare read-receipt writes for a long conversation: one row per (reply, user), as before, "
+        "against the per-(conversation, user) watermark. Runs in a throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=10000, help="Replies in the conversation")
+
+    def handle(self, *args, **options):
+        n = options["messages"]
+
+        with throwaway_database():
+            mentor = User.objects.create_user(username="bench_mentor", password="x", is_mentor=True)
+            mentee = User.objects.create_user(username="bench_mentee", password="x", is_mentee=True)
+            conv = Conversation.objects.create(sender=mentor, receipient=mentee, conversation="benchmark")
+            Reply.objects.bulk_create([
+                Reply(conversation=conv, sender=mentor, reply=f"message {i}", replied_at=timezone.now())
+                for i in range(n)
+            ], batch_size=1000)
+            reply_ids = list(conv.replies.order_by("id").values_list("id", flat=True))
+
+            LegacyReplySeen = _legacy_seen_model()
+            with connection.schema_editor() as editor:
+                editor.create_model(LegacyReplySeen)
+
+            # the old consumer path: get reply, get user, get_or_create one row per reply
+            with count_statements() as per_row:
+                for reply_id in reply_ids:
+                    reply = Reply.objects.get(pk=reply_id)
+                    user = User.objects.get(pk=mentee.pk)
+                    LegacyReplySeen.objects.get_or_create(reply=reply, user=user)
+            per_row_rows = LegacyReplySeen.objects.count()
+
+            with count_statements() as watermark:
+                for reply_id in reply_ids:
+                    mark_seen(conv.pk, mentee.pk, reply_id)
+            watermark_rows = ReadWatermark.objects.count()
+
+            for label, result, rows in (("per-reply", per_row, per_row_rows), ("watermark", watermark, watermark_rows)):
+                statements = result["statements"]
+                writes = statements["INSERT"] + statements["UPDATE"]
+                self.stdout.write(
+                    f"{label:>9}: {n / result['seconds']:.0f} seen events/s, "
+                    f"{sum(statements.values()) / n:.2f} queries/event, {writes / n:.2f} writes/event, "
+                    f"{rows} rows stored"
+                )
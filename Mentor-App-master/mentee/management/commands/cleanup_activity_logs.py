@@ -2,23 +2,45 @@ from django.core.management.base import BaseCommand
 from django.utils import timezone
 from datetime import timedelta
 from ...models import ActivityLog
+from ...log_archive import archive_logs, archive_dir, hot_days
 
 class Command(BaseCommand):
-    help = "Delete old activity logs"
+    help = (
+        "Move old activity logs into the compressed archive (ACTIVITY_LOG_ARCHIVE_DIR). "
+        "Resumable: an interrupted run is completed or rolled back by the next one."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=None, help="Keep this many days in the table (default ACTIVITY_LOG_HOT_DAYS)")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--max-batches", type=int, default=None, help="Stop after this many batches (run again to continue)")
+        parser.add_argument("--no-archive", action="store_true", help="Delete old rows without archiving them")
 
     def handle(self, *args, **options):
-        cutoff = timezone.now() - timedelta(days=90)
-        batch_size = 5000
+        days = options["days"] if options["days"] is not None else hot_days()
+        batch_size = options["batch_size"]
+
+        if options["no_archive"]:
+            cutoff = timezone.now() - timedelta(days=days)
+            total_deleted = 0
+            while True:
+                ids = list(ActivityLog.objects.filter(timestamp__lt=cutoff).values_list("id", flat=True)[:batch_size])
+                if not ids:
+                    break
+                deleted, _ = ActivityLog.objects.filter(id__in=ids).delete()
+                total_deleted += deleted
 
-        total_deleted = 0
-        while True:
-            qs = ActivityLog.objects.filter(timestamp__lt=cutoff)[:batch_size]
-            if not qs.exists():
-                break
-            count = qs.count()
-            qs.delete()
-            total_deleted += count
+            self.stdout.write(self.style.SUCCESS(
+                f"Deleted {total_deleted} old activity logs"
+            ))
+            return
 
+        moved = archive_logs(
+            older_than_days=days,
+            batch_size=batch_size,
+            max_batches=options["max_batches"],
+            stdout=self.stdout if options["verbosity"] > 1 else None,
+        )
         self.stdout.write(self.style.SUCCESS(
-            f"Deleted {total_deleted} old activity logs"
+            f"Archived {moved} old activity logs to {archive_dir()}"
         ))
@@ -0,0 +1,83 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from ...benchmarking import PROCESS_LOCAL_CHAT_CACHES, throwaway_database
+from ...chat_loadtest import create_conversations, run_load_test
+
+IN_MEMORY_LAYER = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test ChatConsumer fan-out: N conversations x M sockets sending messages, typing, seen and "
+        "reaction frames. Reports connect / fan-out latency percentiles, queries per frame and memory per "
+        "connection. Runs in a throwaway test database; exits non-zero when a --max-* gate is exceeded."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--conversations", type=int, default=20)
+        parser.add_argument("--participants", type=int, default=4, help="Sockets per conversation (>= 2)")
+        parser.add_argument("--messages", type=int, default=20, help="Messages sent per conversation")
+        parser.add_argument("--layer", choices=["memory", "redis"], default="memory",
+                            help="In-memory channel layer, or channels_redis against --redis-url")
+        parser.add_argument("--redis-url", default="redis://127.0.0.1:6379/0")
+        parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+        parser.add_argument("--max-fanout-p95-ms", type=float, default=None)
+        parser.add_argument("--max-connect-p95-ms", type=float, default=None)
+        parser.add_argument("--max-queries-per-message", type=float, default=None)
+
+    def handle(self, *args, **options):
+        if options["layer"] == "redis":
+            layers = {"default": {
+                "BACKEND": "channels_redis.core.RedisChannelLayer",
+                "CONFIG": {"hosts": [options["redis_url"]]},
+            }}
+            local_caches = {}
+        else:
+            layers, local_caches = IN_MEMORY_LAYER, PROCESS_LOCAL_CHAT_CACHES
+
+        with throwaway_database(), override_settings(CHANNEL_LAYERS=layers, **local_caches):
+            conversations = create_conversations(options["conversations"])
+            try:
+                report = run_load_test(conversations, options["participants"], options["messages"])
+            except ValueError as exc:
+                raise CommandError(str(exc))
+        report["layer"] = options["layer"]
+
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self._print(report)
+
+        failures = []
+        gates = (
+            ("max_fanout_p95_ms", report["fanout_ms"]["p95"], "fan-out p95 (ms)"),
+            ("max_connect_p95_ms", report["connect_ms"]["p95"], "connect p95 (ms)"),
+            ("max_queries_per_message", report["frames"]["send"]["queries_per_frame"], "queries per message"),
+        )
+        for option, value, label in gates:
+            if options[option] is not None and value > options[option]:
+                failures.append(f"{label} {value} > {options[option]}")
+        if failures:
+            raise CommandError("Load test gate failed: " + "; ".join(failures))
+
+    def _print(self, report):
+        self.stdout.write(
+            f"{report['conversations']} conversations, {report['sockets']} sockets, {report['layer']} channel layer"
+        )
+        self.stdout.write(
+            f"connect : {self._ms(report['connect_ms'])}, {report['connect_queries']} queries/connect, "
+            f"{report['memory_per_connection_kb']} KiB/connection"
+        )
+        self.stdout.write(f"fan-out : {self._ms(report['fanout_ms'])}")
+        for phase, stats in report["frames"].items():
+            self.stdout.write(
+                f"{phase:<8}: {stats['sent']} sent, {stats['delivered']} delivered, "
+                f"{stats['queries_per_frame']} queries/frame"
+            )
+
+    @staticmethod
+    def _ms(p):
+        return f"p50 {p['p50']} ms, p95 {p['p95']} ms, p99 {p['p99']} ms, max {p['max']} ms"
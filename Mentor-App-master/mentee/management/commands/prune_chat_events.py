@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from ...chat_changes import prune
+from ...models import ChatEvent
+
+
+class Command(BaseCommand):
+    help = (
+        "Apply the chat change-log retention (CHAT_CHANGELOG_MAX_EVENTS / CHAT_CHANGELOG_RETENTION_HOURS) "
+        "to every conversation. Busy conversations are also pruned as they are written."
+    )
+
+    def handle(self, *args, **options):
+        conversation_ids = ChatEvent.objects.values_list("conversation_id", flat=True).distinct().order_by()
+        deleted = sum(prune(conversation_id) for conversation_id in list(conversation_ids))
+        self.stdout.write(self.style.SUCCESS(f"Pruned {deleted} chat change-log events"))
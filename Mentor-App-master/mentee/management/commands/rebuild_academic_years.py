@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from ...models import User
+from ...academic_years import rebuild_student_years
+
+
+class Command(BaseCommand):
+    help = "Rebuild the StudentAcademicYear catalogue from the achievement and result tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", action="append", dest="usernames", help="Only rebuild these usernames (repeatable)")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        user_ids = None
+        if options["usernames"]:
+            user_ids = list(User.objects.filter(username__in=options["usernames"]).values_list("pk", flat=True))
+
+        rows = rebuild_student_years(user_ids, batch_size=options["batch_size"])
+
+        self.stdout.write(self.style.SUCCESS(f"StudentAcademicYear rebuilt: {rows} rows"))
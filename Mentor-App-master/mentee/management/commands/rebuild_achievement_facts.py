@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from ...models import User
+from ...achievements import rebuild_achievement_facts
+
+
+class Command(BaseCommand):
+    help = "Rebuild the AchievementFact table from the achievement tables (backfill / repairs drift)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", action="append", dest="usernames", help="Only rebuild these usernames (repeatable)")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        user_ids = None
+        if options["usernames"]:
+            user_ids = list(User.objects.filter(username__in=options["usernames"]).values_list("pk", flat=True))
+
+        facts = rebuild_achievement_facts(user_ids, batch_size=options["batch_size"])
+
+        self.stdout.write(self.style.SUCCESS(f"AchievementFact rebuilt: {facts} rows"))
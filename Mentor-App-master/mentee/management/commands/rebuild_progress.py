@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from ...models import User
+from ...utils import rebuild_document_progress
+
+
+class Command(BaseCommand):
+    help = "Rebuild the MenteeProgress table from the document tables (repairs drift)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", action="append", dest="usernames", help="Only rebuild these usernames (repeatable)")
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        user_ids = None
+        if options["usernames"]:
+            user_ids = list(User.objects.filter(username__in=options["usernames"]).values_list("pk", flat=True))
+
+        created, updated = rebuild_document_progress(user_ids, batch_size=options["batch_size"])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"MenteeProgress rebuilt: {created} created, {updated} updated"
+        ))
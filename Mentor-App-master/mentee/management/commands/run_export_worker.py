@@ -0,0 +1,108 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Pool processes are started with "spawn", so they import this module before Django is set up:
+# keep model imports inside functions.
+
+
+def _init_worker(settings_module):
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", settings_module)
+    import django
+    django.setup()
+
+
+def _run_job(job_id):
+    from django.db import close_old_connections
+    from ...export_jobs import run_export_job
+    try:
+        return run_export_job(job_id)
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = "Build queued export jobs (Excel/PDF/ZIP) in a local process pool and clean up expired artifacts"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=None,
+                            help="Pool size (default settings.EXPORT_WORKER_PROCESSES); 0 runs jobs in this process")
+        parser.add_argument("--poll", type=float, default=1.0, help="Seconds between queue polls")
+        parser.add_argument("--cleanup-every", type=float, default=60.0, help="Seconds between expired-artifact cleanups")
+        parser.add_argument("--once", action="store_true", help="Exit when the queue is empty")
+
+    def handle(self, *args, **options):
+        from django.db import close_old_connections
+        from django.utils import timezone
+        from ...models import ExportJob
+        from ...export_jobs import cleanup_expired_jobs, run_export_job
+
+        workers = options["workers"]
+        if workers is None:
+            workers = getattr(settings, "EXPORT_WORKER_PROCESSES", 2)
+
+        # jobs left "running" by a worker that died are picked up again
+        requeued = ExportJob.objects.filter(status="running").update(status="queued", progress=0)
+        if requeued:
+            self.stdout.write(f"Re-queued {requeued} interrupted export job(s)")
+
+        def claim(limit):
+            claimed = []
+            for job_id in ExportJob.objects.filter(status="queued").order_by("created_at").values_list("pk", flat=True)[:limit]:
+                if ExportJob.objects.filter(pk=job_id, status="queued").update(status="running", started_at=timezone.now()):
+                    claimed.append(job_id)
+            return claimed
+
+        def report(job_id, status):
+            style = self.style.SUCCESS if status == "done" else self.style.ERROR
+            self.stdout.write(style(f"Export job {job_id}: {status}"))
+
+        pool = None
+        if workers > 0:
+            pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(os.environ.get("DJANGO_SETTINGS_MODULE", "mentorship.settings"),),
+            )
+
+        running = {}
+        last_cleanup = 0.0
+        try:
+            while True:
+                for future in [f for f in running if f.done()]:
+                    job_id = running.pop(future)
+                    try:
+                        report(job_id, future.result())
+                    except Exception as exc:
+                        ExportJob.objects.filter(pk=job_id).update(
+                            status="failed", error=f"Worker crashed: {exc}"[:2000], finished_at=timezone.now(),
+                        )
+                        report(job_id, "failed")
+
+                if time.monotonic() - last_cleanup >= options["cleanup_every"]:
+                    removed = cleanup_expired_jobs()
+                    if removed:
+                        self.stdout.write(f"Removed {removed} expired export(s)")
+                    last_cleanup = time.monotonic()
+
+                if pool is None:
+                    for job_id in claim(1):
+                        report(job_id, run_export_job(job_id))
+                else:
+                    for job_id in claim(workers - len(running)):
+                        running[pool.submit(_run_job, job_id)] = job_id
+
+                if options["once"] and not running and not ExportJob.objects.filter(status="queued").exists():
+                    break
+
+                close_old_connections()
+                time.sleep(options["poll"])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=True)
@@ -2,7 +2,7 @@ from django.core.management.base import BaseCommand
 from django.utils import timezone
 from datetime import timedelta
 from ...models import Mentor, MentorMentee, ReminderLog, Notification
-from ...utils import get_document_progress
+from ...utils import get_document_progress_bulk
 from django.core.mail import send_mail
 from django.conf import settings
 
@@ -14,12 +14,15 @@ class Command(BaseCommand):
         now = timezone.now()
         seven_days_ago = now - timedelta(days=7)
 
-        for mapping in MentorMentee.objects.select_related("mentor__user", "mentee__user"):
+        mappings = MentorMentee.objects.select_related("mentor__user", "mentee__user")
+        progress_by_user = get_document_progress_bulk(mappings.values_list("mentee__user_id", flat=True))
+
+        for mapping in mappings:
             mentor = mapping.mentor
             mentee = mapping.mentee
             user = mentee.user
 
-            completed_count, total_required, has_pending = get_document_progress(user)
+            completed_count, total_required, has_pending = progress_by_user[user.pk]
 
             if not has_pending:
                 continue  # no pending docs, skip
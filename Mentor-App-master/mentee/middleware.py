@@ -1,8 +1,15 @@
+import time
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.utils import timezone
 from .request_local import set_current_request, clear_current_request
+from . import audit, profiling
 
 class RequestCaptureMiddleware:
     """
     Stores the current request in thread-local storage so signals can read IP/user/UA/path.
+    Also opens an ActivityLog batch, so all log rows of one request are written in one INSERT.
     Add 'mentee.middleware.RequestCaptureMiddleware' early in MIDDLEWARE.
     """
     def __init__(self, get_response):
@@ -11,7 +18,39 @@ class RequestCaptureMiddleware:
     def __call__(self, request):
         set_current_request(request)
         try:
-            response = self.get_response(request)
+            with audit.batch():
+                response = self.get_response(request)
             return response
         finally:
             clear_current_request()
+
+
+class ViewProfilingMiddleware:
+    """
+    Opt-in per-view profiler (settings.VIEW_PROFILING): wall time, query count, SQL time and
+    repeated statements, aggregated by mentee.profiling. When disabled Django drops it entirely.
+    Add 'mentee.middleware.ViewProfilingMiddleware' first in MIDDLEWARE so the whole stack is measured.
+    """
+    def __init__(self, get_response):
+        if not getattr(settings, "VIEW_PROFILING", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = profiling.QueryRecorder()
+        start = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        match = getattr(request, "resolver_match", None)
+        if match is not None:
+            profiling.get_buffer().add({
+                "view": match.view_name or match._func_path,
+                "at": timezone.now(),
+                "ms": elapsed_ms,
+                "queries": recorder.count,
+                "sql_ms": recorder.sql_ms,
+                "duplicates": recorder.duplicates(),
+            })
+        return response
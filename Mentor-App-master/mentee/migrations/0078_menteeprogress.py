@@ -0,0 +1,40 @@
+# Generated by Django 6.0.3 on 2026-10-18 10:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mentee', '0077_internshippbl_domain_mentormenteeinteraction_week_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MenteeProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('has_internship', models.BooleanField(default=False)),
+                ('has_marksheet', models.BooleanField(default=False)),
+                ('has_project', models.BooleanField(default=False)),
+                ('has_certification', models.BooleanField(default=False)),
+                ('has_publication', models.BooleanField(default=False)),
+                ('has_sports', models.BooleanField(default=False)),
+                ('has_other', models.BooleanField(default=False)),
+                ('internship_count', models.PositiveIntegerField(default=0)),
+                ('marksheet_count', models.PositiveIntegerField(default=0)),
+                ('project_count', models.PositiveIntegerField(default=0)),
+                ('certification_count', models.PositiveIntegerField(default=0)),
+                ('publication_count', models.PositiveIntegerField(default=0)),
+                ('sports_count', models.PositiveIntegerField(default=0)),
+                ('other_count', models.PositiveIntegerField(default=0)),
+                ('completed', models.PositiveSmallIntegerField(default=0)),
+                ('total', models.PositiveSmallIntegerField(default=7)),
+                ('has_pending', models.BooleanField(default=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='document_progress', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 6.0.3 on 2026-10-18 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mentee', '0079_exportjob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['timestamp', 'id'], name='activitylog_ts_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['module', 'timestamp'], name='activitylog_module_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['user', 'timestamp'], name='activitylog_user_ts_idx'),
+        ),
+    ]
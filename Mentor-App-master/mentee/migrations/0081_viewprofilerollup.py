@@ -0,0 +1,33 @@
+# Generated by Django 6.0.3 on 2026-10-18 12:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mentee', '0080_activitylog_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ViewProfileRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('view_name', models.CharField(max_length=255)),
+                ('period_start', models.DateTimeField(db_index=True)),
+                ('requests', models.PositiveIntegerField(default=0)),
+                ('total_ms', models.FloatField(default=0)),
+                ('max_ms', models.FloatField(default=0)),
+                ('latency_histogram', models.JSONField(default=list)),
+                ('total_queries', models.PositiveIntegerField(default=0)),
+                ('max_queries', models.PositiveIntegerField(default=0)),
+                ('total_sql_ms', models.FloatField(default=0)),
+                ('duplicate_sql', models.JSONField(default=dict)),
+            ],
+            options={
+                'ordering': ['-period_start', 'view_name'],
+                'unique_together': {('view_name', 'period_start')},
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 6.0.3 on 2026-10-18 12:40
+
+from datetime import datetime, timedelta
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_ends_at(apps, schema_editor):
+    Meeting = apps.get_model("mentee", "Meeting")
+    tz = timezone.get_current_timezone()
+    batch = []
+    for meeting in Meeting.objects.only("appointment_date", "time_slot", "duration_minutes").iterator(chunk_size=1000):
+        start = timezone.make_aware(datetime.combine(meeting.appointment_date, meeting.time_slot), tz)
+        meeting.ends_at = start + timedelta(minutes=meeting.duration_minutes)
+        batch.append(meeting)
+        if len(batch) >= 1000:
+            Meeting.objects.bulk_update(batch, ["ends_at"])
+            batch = []
+    if batch:
+        Meeting.objects.bulk_update(batch, ["ends_at"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mentee', '0081_viewprofilerollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='meeting',
+            name='ends_at',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(fill_ends_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 6.0.3 on 2026-10-18 13:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Value
+from django.db.models.functions import Coalesce
+
+# same categories as mentee.achievements.ACHIEVEMENT_CATEGORIES: category -> (model, level field, prize field)
+FACT_SOURCES = {
+    "internship": ("InternshipPBL", None, None),
+    "project": ("Project", None, None),
+    "sports": ("SportsCulturalEvent", "level", "prize_won"),
+    "course": ("CertificationCourse", "level", None),
+    "other": ("OtherEvent", "level", "prize_won"),
+    "paper": ("PaperPublication", "level", None),
+}
+
+
+def fill_facts(apps, schema_editor):
+    AchievementFact = apps.get_model("mentee", "AchievementFact")
+    for category, (name, level_field, prize_field) in FACT_SOURCES.items():
+        rows = (
+            apps.get_model("mentee", name).objects.filter(user__isnull=False)
+            .values("user_id")
+            .annotate(
+                f_academic_year=Coalesce("academic_year", Value("")),
+                f_semester=Coalesce("semester", Value("")),
+                f_level=Coalesce(level_field, Value("")) if level_field else Value(""),
+                f_prize=Coalesce(prize_field, Value("")) if prize_field else Value(""),
+                f_branch=Coalesce("user__profile__branch", Value("")),
+            )
+            .values("user_id", "f_academic_year", "f_semester", "f_level", "f_prize", "f_branch")
+            .annotate(n=Count("id"))
+            .order_by()
+        )
+        AchievementFact.objects.bulk_create(
+            [
+                AchievementFact(
+                    user_id=r["user_id"], category=category, academic_year=r["f_academic_year"],
+                    semester=r["f_semester"], level=r["f_level"], prize=r["f_prize"], branch=r["f_branch"],
+                    count=r["n"],
+                )
+                for r in rows
+            ],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mentee', '0082_meeting_ends_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AchievementFact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(max_length=20)),
+                ('academic_year', models.CharField(blank=True, default='', max_length=20)),
+                ('semester', models.CharField(blank=True, default='', max_length=10)),
+                ('branch', models.CharField(blank=True, default='', max_length=100)),
+                ('level', models.CharField(blank=True, default='', max_length=50)),
+                ('prize', models.CharField(blank=True, default='', max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='achievement_facts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['category', 'academic_year'], name='achfact_category_year_idx'), models.Index(fields=['category', 'branch'], name='achfact_category_branch_idx')],
+                'unique_together': {('user', 'category', 'academic_year', 'semester', 'level', 'prize')},
+            },
+        ),
+        migrations.RunPython(fill_facts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 6.0.3 on 2026-10-18 14:10
+
+import django.db.models.deletion
+from django.conf import settings
+from collections import Counter
+
+from django.db import migrations, models
+from django.db.models import Count
+
+YEAR_SOURCES = ["InternshipPBL", "Project", "SportsCulturalEvent", "OtherEvent", "CertificationCourse",
+                "PaperPublication", "SemesterResult"]
+
+
+def fill_catalogue(apps, schema_editor):
+    StudentAcademicYear = apps.get_model("mentee", "StudentAcademicYear")
+    counts = Counter()
+    for name in YEAR_SOURCES:
+        model = apps.get_model("mentee", name)
+        rows = (
+            model.objects.filter(user__isnull=False).exclude(academic_year__isnull=True).exclude(academic_year="")
+            .values("user_id", "academic_year").annotate(n=Count("id")).order_by()
+        )
+        for r in rows:
+            counts[(r["user_id"], r["academic_year"])] += r["n"]
+    StudentAcademicYear.objects.bulk_create(
+        [StudentAcademicYear(user_id=uid, academic_year=year, records=n) for (uid, year), n in counts.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mentee', '0083_achievementfact'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentAcademicYear',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('academic_year', models.CharField(max_length=20)),
+                ('records', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='academic_years', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'academic_year')},
+            },
+        ),
+        migrations.RunPython(fill_catalogue, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 6.0.3 on 2026-10-18 14:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def fill_watermarks(apps, schema_editor):
+    """One watermark per (conversation, user) at the highest reply the user had marked seen."""
+    ReplySeen = apps.get_model("mentee", "ReplySeen")
+    ReadWatermark = apps.get_model("mentee", "ReadWatermark")
+    rows = (
+        ReplySeen.objects.values("reply__conversation_id", "user_id")
+        .annotate(last_reply=Max("reply_id"), last_at=Max("seen_at"))
+        .order_by()
+    )
+    ReadWatermark.objects.bulk_create(
+        [
+            ReadWatermark(
+                conversation_id=r["reply__conversation_id"], user_id=r["user_id"],
+                last_seen_reply_id=r["last_reply"], last_seen_at=r["last_at"],
+            )
+            for r in rows
+        ],
+        batch_size=1000,
+    )
+
+
+def fill_replyseen(apps, schema_editor):
+    """Reverse: a ReplySeen row for every reply of the others up to each watermark."""
+    ReplySeen = apps.get_model("mentee", "ReplySeen")
+    ReadWatermark = apps.get_model("mentee", "ReadWatermark")
+    Reply = apps.get_model("mentee", "Reply")
+    for mark in ReadWatermark.objects.filter(last_seen_reply_id__gt=0).iterator():
+        reply_ids = (
+            Reply.objects.filter(conversation_id=mark.conversation_id, pk__lte=mark.last_seen_reply_id)
+            .exclude(sender_id=mark.user_id)
+            .values_list("pk", flat=True)
+        )
+        ReplySeen.objects.bulk_create(
+            [ReplySeen(reply_id=reply_id, user_id=mark.user_id) for reply_id in reply_ids],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mentee', '0084_studentacademicyear'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReadWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_seen_reply_id', models.PositiveBigIntegerField(default=0)),
+                ('last_seen_at', models.DateTimeField(blank=True, null=True)),
+                ('conversation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='watermarks', to='mentee.conversation')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('conversation', 'user')},
+            },
+        ),
+        migrations.RunPython(fill_watermarks, fill_replyseen),
+        migrations.DeleteModel(
+            name='ReplySeen',
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0.3 on 2026-10-18 11:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mentee', '0085_readwatermark'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reply',
+            index=models.Index(fields=['conversation', 'replied_at', 'id'], name='reply_conv_time_idx'),
+        ),
+    ]
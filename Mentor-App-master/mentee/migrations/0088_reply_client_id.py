@@ -0,0 +1,22 @@
+# Generated by Django 6.0.3 on 2026-10-18 13:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mentee', '0087_chat_changelog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reply',
+            name='client_id',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='reply',
+            constraint=models.UniqueConstraint(fields=('conversation', 'sender', 'client_id'), name='reply_conv_sender_client_uniq'),
+        ),
+    ]
@@ -610,6 +610,17 @@ class Reply(models.Model):
     conversation = models.ForeignKey('Conversation', related_name='replies', on_delete=models.CASCADE)
     edited = models.BooleanField(default=False)
     edited_at = models.DateTimeField(null=True, blank=True)
+    # idempotency key of a reply sent over the chat socket, so a retried send is stored once
+    client_id = models.CharField(max_length=64, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # keyset paging of a conversation's history (see mentee/chat_history.py)
+            models.Index(fields=["conversation", "replied_at", "id"], name="reply_conv_time_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=["conversation", "sender", "client_id"], name="reply_conv_sender_client_uniq"),
+        ]
 
     def __str__(self):
         sender_name = self.sender.username if self.sender else "Unknown"
@@ -624,7 +635,13 @@ class Reply(models.Model):
         return self.file.url if self.file else None
 
     def seen_count(self):
-        return self.seen_by.count()
+        """Participants other than the sender whose watermark has reached this reply."""
+        return (
+            ReadWatermark.objects
+            .filter(conversation_id=self.conversation_id, last_seen_reply_id__gte=self.pk)
+            .exclude(user_id=self.sender_id)
+            .count()
+        )
 
 
 class Reaction(models.Model):
@@ -640,16 +657,38 @@ class Reaction(models.Model):
         return f"{self.user} → {self.emoji} on {self.reply_id}"
 
 
-class ReplySeen(models.Model):
-    reply = models.ForeignKey('Reply', related_name='seen_by', on_delete=models.CASCADE)
+class ReadWatermark(models.Model):
+    """
+    Read receipt of one user in one conversation: every reply with an id up to
+    last_seen_reply_id counts as seen by that user (see mentee/read_receipts.py).
+    """
+    conversation = models.ForeignKey('Conversation', related_name='watermarks', on_delete=models.CASCADE)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
-    seen_at = models.DateTimeField(auto_now_add=True)
+    last_seen_reply_id = models.PositiveBigIntegerField(default=0)
+    last_seen_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
-        unique_together = ('reply', 'user')
+        unique_together = ('conversation', 'user')
 
     def __str__(self):
-        return f"{self.user} saw reply {self.reply_id} at {self.seen_at}"
+        return f"{self.user} saw conversation {self.conversation_id} up to reply {self.last_seen_reply_id}"
+
+
+class ChatEvent(models.Model):
+    """
+    Change-log entry of a conversation: one broadcast group event (new / edited / deleted message,
+    receipts). The id is the seq clients resume from after a reconnect (see mentee/chat_changes.py).
+    """
+    conversation = models.ForeignKey('Conversation', related_name='events', on_delete=models.CASCADE)
+    type = models.CharField(max_length=32)
+    payload = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["conversation", "id"], name="chatevent_conv_seq_idx")]
+
+    def __str__(self):
+        return f"{self.type} #{self.pk} in conversation {self.conversation_id}"
 
 
 class Conversation(models.Model):
@@ -660,6 +699,8 @@ class Conversation(models.Model):
     conversation = models.TextField(max_length=100)
     file = models.FileField(upload_to='chat_files/', blank=True, null=True)
     sent_at = models.DateTimeField(null=True, blank=True)
+    # highest change-log seq pruned from this conversation; a client behind it has to reload
+    changelog_floor = models.PositiveBigIntegerField(default=0)
 
     class Meta:
         ordering = ['-sent_at']
@@ -745,12 +786,19 @@ class Meeting(models.Model):
         ('cancelled', 'Cancelled'),
     )
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='scheduled')
+    # stored copy of meeting_end_datetime so "still upcoming" can be filtered in SQL
+    ends_at = models.DateTimeField(null=True, blank=True, editable=False, db_index=True)
 
 
 
     def save(self, *args, **kwargs):
         if not self.video_room_name:
             self.video_room_name = str(uuid.uuid4())  # auto-generate unique room
+        if self.appointment_date and self.time_slot:
+            self.ends_at = self.meeting_end_datetime
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None and {"appointment_date", "time_slot", "duration_minutes"} & set(update_fields):
+                kwargs["update_fields"] = set(update_fields) | {"ends_at"}
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -848,10 +896,17 @@ class ActivityLog(models.Model):
     old_data = models.JSONField(null=True, blank=True)
     new_data = models.JSONField(null=True, blank=True)
     changes = models.JSONField(null=True, blank=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # when the event happened (set on record), not when a batch reached the database
+    timestamp = models.DateTimeField(default=timezone.now)
 
     class Meta:
         ordering = ["-timestamp"]
+        indexes = [
+            # keyset pagination and the common filters of the activity-log API
+            models.Index(fields=["timestamp", "id"], name="activitylog_ts_id_idx"),
+            models.Index(fields=["module", "timestamp"], name="activitylog_module_ts_idx"),
+            models.Index(fields=["user", "timestamp"], name="activitylog_user_ts_idx"),
+        ]
 
     def __str__(self):
         return f"{self.user} - {self.action} @ {self.timestamp.strftime('%d-%m-%Y %H:%M')}"
@@ -873,3 +928,136 @@ class WeeklyAgenda(models.Model):
 
     def __str__(self):
         return f"Week {self.week} - {self.year} - Sem {self.sem}"
+
+
+class MenteeProgress(models.Model):
+    """
+    Denormalized document progress, one row per user.
+    Kept current by signals on the document models (see signals.py);
+    `python manage.py rebuild_progress` repairs any drift.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="document_progress")
+
+    has_internship = models.BooleanField(default=False)
+    has_marksheet = models.BooleanField(default=False)
+    has_project = models.BooleanField(default=False)
+    has_certification = models.BooleanField(default=False)
+    has_publication = models.BooleanField(default=False)
+    has_sports = models.BooleanField(default=False)
+    has_other = models.BooleanField(default=False)
+
+    internship_count = models.PositiveIntegerField(default=0)
+    marksheet_count = models.PositiveIntegerField(default=0)
+    project_count = models.PositiveIntegerField(default=0)
+    certification_count = models.PositiveIntegerField(default=0)
+    publication_count = models.PositiveIntegerField(default=0)
+    sports_count = models.PositiveIntegerField(default=0)
+    other_count = models.PositiveIntegerField(default=0)
+
+    completed = models.PositiveSmallIntegerField(default=0)
+    total = models.PositiveSmallIntegerField(default=7)
+    has_pending = models.BooleanField(default=True)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user.username} - {self.completed}/{self.total}"
+
+
+class ExportJob(models.Model):
+    """
+    A bulk export (Excel/PDF/ZIP) queued from a view and built by `manage.py run_export_worker`.
+    Finished artifacts live under MEDIA_ROOT/exports/ until `expires_at`.
+    """
+    STATUS_CHOICES = [
+        ("queued", "Queued"),
+        ("running", "Running"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    ]
+
+    kind = models.CharField(max_length=100)
+    params = models.JSONField(default=dict)
+    params_hash = models.CharField(max_length=64, db_index=True)
+    requested_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name="export_jobs")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="queued", db_index=True)
+    progress = models.PositiveSmallIntegerField(default=0)
+    file = models.FileField(upload_to="exports/", blank=True, null=True)
+    filename = models.CharField(max_length=255, blank=True)
+    content_type = models.CharField(max_length=100, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+
+class ViewProfileRollup(models.Model):
+    """
+    Per-view, per-hour request statistics flushed by ViewProfilingMiddleware (settings.VIEW_PROFILING).
+    Latencies are kept as a bucket histogram (profiling.LATENCY_BUCKETS_MS) so hours can be merged.
+    """
+    view_name = models.CharField(max_length=255)
+    period_start = models.DateTimeField(db_index=True)
+    requests = models.PositiveIntegerField(default=0)
+    total_ms = models.FloatField(default=0)
+    max_ms = models.FloatField(default=0)
+    latency_histogram = models.JSONField(default=list)
+    total_queries = models.PositiveIntegerField(default=0)
+    max_queries = models.PositiveIntegerField(default=0)
+    total_sql_ms = models.FloatField(default=0)
+    duplicate_sql = models.JSONField(default=dict)  # SQL template -> repeated executions
+
+    class Meta:
+        unique_together = ("view_name", "period_start")
+        ordering = ["-period_start", "view_name"]
+
+    def __str__(self):
+        return f"{self.view_name} @ {self.period_start:%d-%m-%Y %H:00} ({self.requests} req)"
+
+
+class AchievementFact(models.Model):
+    """
+    Count of achievement records per (user, category, academic year, semester, branch, level, prize),
+    maintained by signals from the six achievement tables (see mentee/achievements.py).
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="achievement_facts")
+    category = models.CharField(max_length=20)
+    academic_year = models.CharField(max_length=20, blank=True, default="")
+    semester = models.CharField(max_length=10, blank=True, default="")
+    branch = models.CharField(max_length=100, blank=True, default="")
+    level = models.CharField(max_length=50, blank=True, default="")
+    prize = models.CharField(max_length=20, blank=True, default="")
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("user", "category", "academic_year", "semester", "level", "prize")
+        indexes = [
+            models.Index(fields=["category", "academic_year"], name="achfact_category_year_idx"),
+            models.Index(fields=["category", "branch"], name="achfact_category_branch_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.category} {self.academic_year or '-'}: {self.count}"
+
+
+class StudentAcademicYear(models.Model):
+    """
+    Academic years in which a student has at least one achievement or semester result, maintained by
+    signals (see mentee/academic_years.py). Year dropdowns read this instead of scanning the record tables.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="academic_years")
+    academic_year = models.CharField(max_length=20)
+    records = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("user", "academic_year")
+
+    def __str__(self):
+        return f"{self.user_id} {self.academic_year}: {self.records}"
@@ -0,0 +1,98 @@
+"""
+Cohort pivot: counts of one achievement category per (student, academic year), for the mentor charts.
+
+Everything comes from a single GROUP BY (user_id, academic_year) query over the AchievementFact
+rollup (see achievements.py); the matrix is assembled in NumPy, so heatmaps, per-year series,
+totals and year-over-year trends no longer cost a COUNT per cell.
+"""
+import numpy as np
+from django.db.models import Sum
+
+from .achievements import ACHIEVEMENT_CATEGORIES
+from .models import AchievementFact, MentorMentee
+
+CHART_MODELS = {category: model for category, (model, _, _) in ACHIEVEMENT_CATEGORIES.items()}
+
+
+def mentor_user_ids(mentor):
+    """Subquery of the user ids of `mentor`'s mentees."""
+    return MentorMentee.objects.filter(mentor=mentor).values_list("mentee__user_id", flat=True)
+
+
+class CohortPivot:
+    """
+    students: [(user_id, label)] ordered by label
+    years:    sorted academic years that have at least one record
+    matrix:   int array, shape (len(years), len(students))
+    totals:   int array, records per student (including rows without an academic year)
+    """
+
+    def __init__(self, rows):
+        labels = {}
+        for r in rows:
+            labels.setdefault(r["user_id"], r["user__profile__student_name"] or r["user__username"])
+
+        self.students = sorted(labels.items(), key=lambda s: (s[1] or "", s[0]))
+        self.years = sorted({r["academic_year"] for r in rows if r["academic_year"]})
+
+        col = {uid: i for i, (uid, _) in enumerate(self.students)}
+        row = {year: i for i, year in enumerate(self.years)}
+
+        self.totals = np.zeros(len(self.students), dtype=np.int64)
+        self.matrix = np.zeros((len(self.years), len(self.students)), dtype=np.int64)
+        if rows:
+            cols = np.fromiter((col[r["user_id"]] for r in rows), dtype=np.intp, count=len(rows))
+            counts = np.fromiter((r["count"] for r in rows), dtype=np.int64, count=len(rows))
+            np.add.at(self.totals, cols, counts)
+
+            dated = [i for i, r in enumerate(rows) if r["academic_year"]]
+            if dated:
+                year_rows = np.fromiter((row[rows[i]["academic_year"]] for i in dated), dtype=np.intp, count=len(dated))
+                np.add.at(self.matrix, (year_rows, cols[dated]), counts[dated])
+
+    @classmethod
+    def for_category(cls, category, user_ids, year=None):
+        """One GROUP BY query over the `category` facts of `user_ids` (optionally one academic year)."""
+        qs = AchievementFact.objects.filter(category=category, user_id__in=user_ids)
+        if year:
+            qs = qs.filter(academic_year=year)
+        rows = list(
+            qs.values("user_id", "academic_year", "user__profile__student_name", "user__username")
+            .annotate(count=Sum("count"))
+            .order_by()
+        )
+        return cls(rows)
+
+    @property
+    def labels(self):
+        return [label for _, label in self.students]
+
+    def student_totals(self):
+        """(labels, counts) over all years."""
+        return self.labels, self.totals.tolist()
+
+    def series(self):
+        """One {"label", "data"} dataset per student, data aligned with self.years."""
+        return [
+            {"label": label, "data": self.matrix[:, i].tolist()}
+            for i, (_, label) in enumerate(self.students)
+        ]
+
+    def heatmap(self):
+        """Rows = years, columns = students."""
+        return self.matrix.tolist()
+
+    def trends(self):
+        """Change between the two latest years per student, or None if fewer than two years."""
+        if len(self.years) < 2:
+            return None
+        current, previous = self.matrix[-1], self.matrix[-2]
+        pct = np.round((current - previous) / np.maximum(previous, 1) * 100, 1)
+        direction = np.sign(current - previous)
+        names = {1: "up", -1: "down", 0: "same"}
+        return {
+            "current": self.years[-1],
+            "previous": self.years[-2],
+            "trends": {label: names[int(direction[i])] for i, label in enumerate(self.labels)},
+            "percentages": {label: float(pct[i]) for i, label in enumerate(self.labels)},
+        }
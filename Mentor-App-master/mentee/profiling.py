@@ -0,0 +1,227 @@
+"""
+Per-view request profiling (opt-in, settings.VIEW_PROFILING).
+
+ViewProfilingMiddleware times each request and counts its SQL through connection.execute_wrapper,
+so it works with DEBUG off. Samples go into an in-process ring buffer. They are folded into
+ViewProfileRollup rows (one per view per hour) every VIEW_PROFILING_FLUSH_SECONDS, or when the
+buffer fills, from a background thread so no user request waits for it (a failed flush is logged
+and its samples dropped). The staff report (views/profiling.py) ranks views by p95 latency and query count.
+
+Settings:
+  VIEW_PROFILING                 False = the middleware removes itself (MiddlewareNotUsed)
+  VIEW_PROFILING_BUFFER_SIZE     ring buffer capacity (oldest samples are dropped when full)
+  VIEW_PROFILING_FLUSH_SECONDS   how often samples are written to the rollup table
+"""
+import bisect
+import logging
+import re
+import threading
+import time
+from collections import Counter, deque
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import ViewProfileRollup
+
+logger = logging.getLogger(__name__)
+
+# upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+TOP_DUPLICATES = 10
+SQL_PREVIEW_CHARS = 300
+
+_in_clause_re = re.compile(r"IN \((?:%s, )*%s\)")
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def normalize_sql(sql):
+    """Collapses variable-length IN lists so the same query shape is counted together."""
+    return _in_clause_re.sub("IN (...)", sql)[:SQL_PREVIEW_CHARS]
+
+
+class QueryRecorder:
+    """execute_wrapper that counts queries, SQL time and repeated statements of one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.sql_ms = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_ms += (time.perf_counter() - start) * 1000
+            self.count += 1
+            self.statements[normalize_sql(sql)] += 1
+
+    def duplicates(self):
+        return {sql: n for sql, n in self.statements.most_common(TOP_DUPLICATES) if n > 1}
+
+
+class ProfileBuffer:
+    """Thread-safe ring buffer of request samples with periodic flush to ViewProfileRollup."""
+
+    def __init__(self, maxsize, flush_seconds):
+        self.samples = deque(maxlen=maxsize)
+        self.flush_seconds = flush_seconds
+        self.last_flush = time.monotonic()
+        self.lock = threading.Lock()
+        self.flushing = False
+
+    def add(self, sample):
+        with self.lock:
+            self.samples.append(sample)
+            due = not self.flushing and (
+                len(self.samples) == self.samples.maxlen
+                or time.monotonic() - self.last_flush >= self.flush_seconds
+            )
+            if due:
+                self.flushing = True
+        if due:
+            # off the response path: the request that fills the buffer does not wait for the upserts
+            threading.Thread(target=self._flush_in_background, name="view-profiling-flush", daemon=True).start()
+
+    def _flush_in_background(self):
+        try:
+            self.flush()
+        finally:
+            with self.lock:
+                self.flushing = False
+            connection.close()  # this thread's own connection
+
+    def drain(self):
+        with self.lock:
+            samples = list(self.samples)
+            self.samples.clear()
+            self.last_flush = time.monotonic()
+        return samples
+
+    def flush(self):
+        """Writes buffered samples into the hourly rollups. Returns the number of samples written."""
+        samples = self.drain()
+        if not samples:
+            return 0
+
+        groups = {}
+        for s in samples:
+            period = s["at"].replace(minute=0, second=0, microsecond=0)
+            groups.setdefault((s["view"], period), []).append(s)
+
+        try:
+            self._write(groups)
+        except Exception:
+            # profiling must never turn a request (or the report) into an error
+            logger.exception("Could not write %d view profiling sample(s)", len(samples))
+            return 0
+        return len(samples)
+
+    def _write(self, groups):
+        with transaction.atomic():
+            for (view, period), group in groups.items():
+                rollup, _ = ViewProfileRollup.objects.select_for_update().get_or_create(
+                    view_name=view[:255], period_start=period,
+                )
+                histogram = list(rollup.latency_histogram) or [0] * (len(LATENCY_BUCKETS_MS) + 1)
+                duplicates = Counter(rollup.duplicate_sql)
+                for s in group:
+                    histogram[bisect.bisect_left(LATENCY_BUCKETS_MS, s["ms"])] += 1
+                    duplicates.update(s["duplicates"])
+                rollup.requests += len(group)
+                rollup.total_ms += sum(s["ms"] for s in group)
+                rollup.max_ms = max([rollup.max_ms] + [s["ms"] for s in group])
+                rollup.total_queries += sum(s["queries"] for s in group)
+                rollup.max_queries = max([rollup.max_queries] + [s["queries"] for s in group])
+                rollup.total_sql_ms += sum(s["sql_ms"] for s in group)
+                rollup.latency_histogram = histogram
+                rollup.duplicate_sql = dict(duplicates.most_common(TOP_DUPLICATES))
+                rollup.save()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = ProfileBuffer(
+                _setting("VIEW_PROFILING_BUFFER_SIZE", 1000),
+                _setting("VIEW_PROFILING_FLUSH_SECONDS", 60),
+            )
+        return _buffer
+
+
+def histogram_percentile(histogram, pct):
+    """
+    (bound ms, over) of the bucket holding the pct-th percentile: `over` means the open-ended top
+    bucket, i.e. more than the last bound. (None, False) if empty.
+    """
+    total = sum(histogram)
+    if not total:
+        return None, False
+    rank = total * pct / 100.0
+    seen = 0
+    for i, n in enumerate(histogram):
+        seen += n
+        if seen >= rank and i < len(LATENCY_BUCKETS_MS):
+            return LATENCY_BUCKETS_MS[i], False
+    return LATENCY_BUCKETS_MS[-1], True
+
+
+def build_report(hours=24, sort="p95"):
+    """Per-view totals over the last `hours`, ranked by `sort` (p95, queries, avg, requests)."""
+    since = timezone.now() - timedelta(hours=hours)
+    views = {}
+    for r in ViewProfileRollup.objects.filter(period_start__gte=since - timedelta(hours=1)):
+        v = views.setdefault(r.view_name, {
+            "view": r.view_name, "requests": 0, "total_ms": 0.0, "max_ms": 0.0,
+            "queries": 0, "max_queries": 0, "sql_ms": 0.0,
+            "histogram": [0] * (len(LATENCY_BUCKETS_MS) + 1), "duplicates": Counter(),
+        })
+        v["requests"] += r.requests
+        v["total_ms"] += r.total_ms
+        v["max_ms"] = max(v["max_ms"], r.max_ms)
+        v["queries"] += r.total_queries
+        v["max_queries"] = max(v["max_queries"], r.max_queries)
+        v["sql_ms"] += r.total_sql_ms
+        for i, n in enumerate(r.latency_histogram or []):
+            v["histogram"][i] += n
+        v["duplicates"].update(r.duplicate_sql or {})
+
+    rows = []
+    for v in views.values():
+        n = v["requests"] or 1
+        p50, p50_over = histogram_percentile(v["histogram"], 50)
+        p95, p95_over = histogram_percentile(v["histogram"], 95)
+        rows.append({
+            "view": v["view"],
+            "requests": v["requests"],
+            "avg_ms": round(v["total_ms"] / n, 1),
+            "p50_ms": p50,
+            "p50_over": p50_over,
+            "p95_ms": p95,
+            "p95_over": p95_over,
+            "max_ms": round(v["max_ms"], 1),
+            "avg_queries": round(v["queries"] / n, 1),
+            "max_queries": v["max_queries"],
+            "avg_sql_ms": round(v["sql_ms"] / n, 1),
+            "top_duplicates": [{"sql": sql, "count": c} for sql, c in v["duplicates"].most_common(5)],
+        })
+
+    keys = {
+        "p95": lambda r: (r["p95_ms"] or 0, r["p95_over"], r["avg_ms"]),
+        "queries": lambda r: (r["avg_queries"], r["max_queries"]),
+        "avg": lambda r: r["avg_ms"],
+        "requests": lambda r: r["requests"],
+    }
+    rows.sort(key=keys.get(sort, keys["p95"]), reverse=True)
+    return rows
@@ -0,0 +1,51 @@
+"""
+Read receipts as per-(conversation, user) watermarks.
+
+A seen event moves ReadWatermark.last_seen_reply_id forward with one conditional UPDATE; it never
+moves back, and replies at or below the watermark count as seen. Storage is one row per participant
+instead of one row per (reply, participant), and seen counts / ticks are derived by comparing ids.
+"""
+from django.db.models import Exists
+from django.utils import timezone
+
+from .models import ReadWatermark, Reply
+
+
+def mark_seen(conversation_id, user_id, reply_id):
+    """
+    Advances the user's watermark to `reply_id` (a reply of this conversation).
+    Returns True if it moved. The usual case is a single UPDATE; the first receipt in a
+    conversation also checks the reply and inserts the row.
+    """
+    reply = Reply.objects.filter(pk=reply_id, conversation_id=conversation_id)
+    now = timezone.now()
+
+    def advance():
+        return bool(
+            ReadWatermark.objects
+            .filter(conversation_id=conversation_id, user_id=user_id, last_seen_reply_id__lt=reply_id)
+            .filter(Exists(reply))
+            .update(last_seen_reply_id=reply_id, last_seen_at=now)
+        )
+
+    if advance():
+        return True
+    if ReadWatermark.objects.filter(conversation_id=conversation_id, user_id=user_id).exists():
+        return False  # already at or past reply_id
+    if not reply.exists():
+        return False
+    _, created = ReadWatermark.objects.get_or_create(
+        conversation_id=conversation_id, user_id=user_id,
+        defaults={"last_seen_reply_id": reply_id, "last_seen_at": now},
+    )
+    # lost the race with a concurrent first receipt (another tab, a batch flush): move that row instead
+    return created or advance()
+
+
+def watermark(conversation_id, user_id):
+    """Current watermark of the user (0 if they have not seen anything)."""
+    return (
+        ReadWatermark.objects.filter(conversation_id=conversation_id, user_id=user_id)
+        .values_list("last_seen_reply_id", flat=True).first()
+        or 0
+    )
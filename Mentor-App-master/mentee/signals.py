@@ -5,15 +5,21 @@ from django.utils import timezone
 from datetime import timedelta
 from .models import (Profile, Mentor, Mentee, MentorMentee, InternshipPBL, StudentProfileOverview, PaperPublication,
                      SemesterResult, SportsCulturalEvent, CertificationCourse, OtherEvent, MentorMenteeInteraction,
-                     Notification, ReminderLog, ActivityLog)
+                     Notification, ReminderLog, ActivityLog, Project, MenteeProgress, Conversation)
 from .ai_utils import generate_ai_summary
+from .utils import DOCUMENT_CATEGORIES, refresh_document_progress
+from .achievements import ACHIEVEMENT_CATEGORIES, refresh_achievement_facts, update_fact_branch
+from .academic_years import refresh_student_years
+from . import analytics_cache, chat_membership
 from django.core.mail import send_mail
 from django.conf import settings
 from django.contrib.auth.signals import user_logged_in, user_logged_out
-from django.db.models.signals import post_save, pre_delete, pre_save
+from django.db.models.signals import post_save, pre_delete, pre_save, post_delete, post_init
 from .request_local import get_current_request
+from . import audit
 import json
 from django.forms.models import model_to_dict
+from django.core.exceptions import FieldDoesNotExist
 from django.db.models.fields.files import FieldFile
 
 
@@ -124,12 +130,176 @@ def other_uploaded(sender, instance, created, **kwargs):
         notify_mentors_on_upload(instance.user)
 
 
-# small cache to store old instance snapshots before save
-_old_instance_cache = {}
+# ---------- keep MenteeProgress in sync with document uploads ----------
+_PROGRESS_CATEGORY_BY_MODEL = {model: category for category, (model, _) in DOCUMENT_CATEGORIES.items()}
+
+
+@receiver(post_save, sender=InternshipPBL)
+@receiver(post_save, sender=Project)
+@receiver(post_save, sender=SportsCulturalEvent)
+@receiver(post_save, sender=OtherEvent)
+@receiver(post_save, sender=CertificationCourse)
+@receiver(post_save, sender=PaperPublication)
+@receiver(post_save, sender=SemesterResult)
+def document_saved_update_progress(sender, instance, **kwargs):
+    if instance.user_id:
+        refresh_document_progress(instance.user_id, [_PROGRESS_CATEGORY_BY_MODEL[sender]])
+
+
+@receiver(post_delete, sender=InternshipPBL)
+@receiver(post_delete, sender=Project)
+@receiver(post_delete, sender=SportsCulturalEvent)
+@receiver(post_delete, sender=OtherEvent)
+@receiver(post_delete, sender=CertificationCourse)
+@receiver(post_delete, sender=PaperPublication)
+@receiver(post_delete, sender=SemesterResult)
+def document_deleted_update_progress(sender, instance, **kwargs):
+    # never create rows here: this also runs while a whole user is being cascade-deleted
+    if instance.user_id:
+        refresh_document_progress(instance.user_id, [_PROGRESS_CATEGORY_BY_MODEL[sender]], create=False)
+
+
+@receiver(post_save, sender=Profile)
+def profile_saved_ensure_progress(sender, instance, **kwargs):
+    if instance.user.is_mentee and not MenteeProgress.objects.filter(user_id=instance.user_id).exists():
+        refresh_document_progress(instance.user_id)
+
+
+# ---------- keep AchievementFact in sync with the achievement tables ----------
+_FACT_CATEGORY_BY_MODEL = {model: category for category, (model, _, _) in ACHIEVEMENT_CATEGORIES.items()}
+
+
+@receiver(post_save, sender=InternshipPBL)
+@receiver(post_save, sender=Project)
+@receiver(post_save, sender=SportsCulturalEvent)
+@receiver(post_save, sender=OtherEvent)
+@receiver(post_save, sender=CertificationCourse)
+@receiver(post_save, sender=PaperPublication)
+@receiver(post_delete, sender=InternshipPBL)
+@receiver(post_delete, sender=Project)
+@receiver(post_delete, sender=SportsCulturalEvent)
+@receiver(post_delete, sender=OtherEvent)
+@receiver(post_delete, sender=CertificationCourse)
+@receiver(post_delete, sender=PaperPublication)
+def achievement_changed_update_facts(sender, instance, **kwargs):
+    if instance.user_id:
+        refresh_achievement_facts(instance.user_id, _FACT_CATEGORY_BY_MODEL[sender])
+
+
+@receiver(post_save, sender=Profile)
+def profile_saved_update_fact_branch(sender, instance, **kwargs):
+    update_fact_branch(instance.user_id, instance.branch)
+
+
+# ---------- keep the academic-year catalogue in sync ----------
+@receiver(post_save, sender=InternshipPBL)
+@receiver(post_save, sender=Project)
+@receiver(post_save, sender=SportsCulturalEvent)
+@receiver(post_save, sender=OtherEvent)
+@receiver(post_save, sender=CertificationCourse)
+@receiver(post_save, sender=PaperPublication)
+@receiver(post_save, sender=SemesterResult)
+@receiver(post_delete, sender=InternshipPBL)
+@receiver(post_delete, sender=Project)
+@receiver(post_delete, sender=SportsCulturalEvent)
+@receiver(post_delete, sender=OtherEvent)
+@receiver(post_delete, sender=CertificationCourse)
+@receiver(post_delete, sender=PaperPublication)
+@receiver(post_delete, sender=SemesterResult)
+def record_changed_update_year_catalogue(sender, instance, **kwargs):
+    if instance.user_id:
+        refresh_student_years(instance.user_id)
+
+
+# ---------- invalidate cached analytics ----------
+# Profile fields the mentor / HOD analytics show; saving a profile without changing them
+# (e.g. the save on every login) keeps the cache
+_ANALYTICS_PROFILE_FIELDS = ("student_name", "moodle_id", "branch", "year", "div", "semester", "contact_number",
+                             "email")
+
+
+def _analytics_profile_state(profile):
+    # loaded values only: reading a deferred field would refresh the instance, and the refreshed
+    # Profile runs post_init again (endless recursion with .only() / .defer())
+    return tuple(profile.__dict__.get(f) for f in _ANALYTICS_PROFILE_FIELDS)
+
+
+def _bump_user_analytics(user_id, branches=()):
+    mentor_user_ids = MentorMentee.objects.filter(mentee__user_id=user_id).values_list("mentor_id", flat=True)
+    if not branches:
+        branches = Profile.objects.filter(user_id=user_id).values_list("branch", flat=True)
+    analytics_cache.bump(
+        analytics_cache.ALL_SCOPE,
+        *(analytics_cache.mentor_scope(uid) for uid in mentor_user_ids),
+        *(analytics_cache.department_scope(b) for b in set(branches) if b),
+    )
+
+
+@receiver(post_save, sender=InternshipPBL)
+@receiver(post_save, sender=Project)
+@receiver(post_save, sender=SportsCulturalEvent)
+@receiver(post_save, sender=OtherEvent)
+@receiver(post_save, sender=CertificationCourse)
+@receiver(post_save, sender=PaperPublication)
+@receiver(post_save, sender=SemesterResult)
+@receiver(post_delete, sender=InternshipPBL)
+@receiver(post_delete, sender=Project)
+@receiver(post_delete, sender=SportsCulturalEvent)
+@receiver(post_delete, sender=OtherEvent)
+@receiver(post_delete, sender=CertificationCourse)
+@receiver(post_delete, sender=PaperPublication)
+@receiver(post_delete, sender=SemesterResult)
+def record_changed_bump_analytics(sender, instance, **kwargs):
+    if instance.user_id:
+        _bump_user_analytics(instance.user_id)
+
+
+@receiver(post_init, sender=Profile)
+def profile_loaded_remember_analytics_state(sender, instance, **kwargs):
+    instance._analytics_state = _analytics_profile_state(instance)
+
+
+@receiver(post_save, sender=Profile)
+def profile_saved_bump_analytics(sender, instance, created, **kwargs):
+    old = instance._analytics_state
+    new = _analytics_profile_state(instance)
+    if created or old != new:
+        old_branch = old[_ANALYTICS_PROFILE_FIELDS.index("branch")]
+        _bump_user_analytics(instance.user_id, branches=[old_branch, instance.branch])
+    instance._analytics_state = new
+
+
+@receiver(post_save, sender=MentorMentee)
+@receiver(post_delete, sender=MentorMentee)
+def mapping_changed_bump_analytics(sender, instance, **kwargs):
+    # Mentor and Mentee are keyed by their user id
+    analytics_cache.bump(analytics_cache.mentor_scope(instance.mentor_id))
+    _bump_user_analytics(instance.mentee_id)
+
+
+@receiver(post_save, sender=Mentor)
+@receiver(post_delete, sender=Mentor)
+def mentor_changed_bump_analytics(sender, instance, **kwargs):
+    analytics_cache.bump(analytics_cache.ALL_SCOPE, analytics_cache.mentor_scope(instance.pk))
+
+
+@receiver(post_save, sender=Conversation)
+@receiver(post_delete, sender=Conversation)
+def conversation_changed_forget_members(sender, instance, **kwargs):
+    chat_membership.forget(instance.pk)
+
+
+# derived tables that are rewritten by other signals; logging them would only add noise
+_NOT_LOGGED_MODELS = {"ActivityLog", "MenteeProgress", "ExportJob", "ViewProfileRollup", "AchievementFact",
+                      "StudentAcademicYear", "ReadWatermark", "ChatEvent"}
 
 def _in_mentee_app(sender):
     # only log models defined in the mentee app (avoid recursion)
-    return sender.__module__.startswith("mentee.")
+    return (
+        sender.__module__.startswith("mentee.")
+        and sender.__name__ not in _NOT_LOGGED_MODELS
+        and audit.module_enabled(sender.__name__)
+    )
 
 def _get_request_info():
     req = get_current_request()
@@ -187,7 +357,7 @@ def _create_log(user, action, module, instance, details=None, old_data=None, new
     # avoid logging ActivityLog itself
     if instance.__class__.__name__ == "ActivityLog":
         return
-    ActivityLog.objects.create(
+    audit.record(ActivityLog(
         user=user if getattr(user, "is_authenticated", False) else None,
         action=action,
         module=module,
@@ -198,24 +368,42 @@ def _create_log(user, action, module, instance, details=None, old_data=None, new
         browser=ua,
         request_path=path,
         timestamp=timezone.now(),
-    )
+    ))
 
 # ---------- cache old instance before saving so we can diff on post_save ----------
+def _snapshot_key(sender, pk):
+    return (sender._meta.label, pk)
+
+
+def _update_field_names(sender, update_fields):
+    """update_fields may use attnames (mentor_id); model_to_dict keys use field names (mentor)."""
+    names = set()
+    for name in update_fields:
+        try:
+            names.add(sender._meta.get_field(name).name)
+        except FieldDoesNotExist:
+            names.add(name)
+    return names
+
+
 @receiver(pre_save)
-def cache_old_instance(sender, instance, **kwargs):
+def cache_old_instance(sender, instance, update_fields=None, **kwargs):
     if not _in_mentee_app(sender):
         return
     if not getattr(instance, "pk", None):
         return
+    if update_fields is not None:
+        # the caller already says what changed; no need to re-read the row
+        return
     try:
         old = sender.objects.get(pk=instance.pk)
-        _old_instance_cache[(sender.__name__, instance.pk)] = safe_dict(old)
+        audit.snapshots().put(_snapshot_key(sender, instance.pk), safe_dict(old))
     except sender.DoesNotExist:
         pass
 
 # ---------- post_save: created or updated ----------
 @receiver(post_save)
-def log_post_save(sender, instance, created, **kwargs):
+def log_post_save(sender, instance, created, update_fields=None, **kwargs):
     if not _in_mentee_app(sender):
         return
 
@@ -235,9 +423,15 @@ def log_post_save(sender, instance, created, **kwargs):
             path=req_info.get("path"),
         )
     else:
-        old_data = _old_instance_cache.pop((sender.__name__, instance.pk), None)
+        old_data = audit.snapshots().pop(_snapshot_key(sender, instance.pk))
         new_data = safe_dict(instance)
-        changes = get_diff(old_data, new_data)
+        if update_fields is not None:
+            # partial save: only the listed fields were written, and their old values were not read
+            fields = _update_field_names(sender, update_fields)
+            new_data = {k: v for k, v in new_data.items() if k in fields}
+            changes = dict.fromkeys(sorted(fields))
+        else:
+            changes = get_diff(old_data, new_data)
 
         # Special-case: Msg approval detection
         if sender.__name__ == "Msg":
@@ -294,7 +488,7 @@ def log_pre_delete(sender, instance, **kwargs):
 # ---------- login / logout ----------
 @receiver(user_logged_in)
 def log_user_login(sender, user, request, **kwargs):
-    ActivityLog.objects.create(
+    audit.record(ActivityLog(
         user=user,
         action="User Logged In",
         module="Authentication",
@@ -305,11 +499,11 @@ def log_user_login(sender, user, request, **kwargs):
         browser=request.META.get("HTTP_USER_AGENT", "")[:255],
         request_path=getattr(request, "path", None),
         timestamp=timezone.now()
-    )
+    ))
 
 @receiver(user_logged_out)
 def log_user_logout(sender, user, request, **kwargs):
-    ActivityLog.objects.create(
+    audit.record(ActivityLog(
         user=user,
         action="User Logged Out",
         module="Authentication",
@@ -320,4 +514,4 @@ def log_user_logout(sender, user, request, **kwargs):
         browser=request.META.get("HTTP_USER_AGENT", "")[:255],
         request_path=getattr(request, "path", None),
         timestamp=timezone.now()
-    )
+    ))
@@ -1,6 +1,14 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import os
+import re
+from django.test import TestCase, override_settings
 from django.test import TestCase, SimpleTestCase
 from django.shortcuts import reverse
+from django.utils import timezone
+
+from . import analytics_cache
 from .models import User
 
 # Create your tests here.
@@ -19,4 +27,1593 @@ class HomePageTests(SimpleTestCase):
     def test_correct_template(self):
         response = self.client.get(reverse('home'))
         self.assertEquals(response.status_code, 200)
-        self.assertTemplateUsed(response, 'home.html')
\ No newline at end of file
+        self.assertTemplateUsed(response, 'home.html')
+
+
+def _add_mentees(mentor, start, count):
+    """Bulk-creates `count` mentees of `mentor` (no signals); every other one has a project."""
+    from .models import Mentee, MentorMentee, Profile, Project
+
+    users = User.objects.bulk_create([
+        User(username=f"mentee{i}", is_mentee=True) for i in range(start, start + count)
+    ])
+    Mentee.objects.bulk_create([Mentee(user=u) for u in users])
+    Profile.objects.bulk_create([
+        Profile(user=u, moodle_id=u.username, student_name=u.username, branch="IT") for u in users
+    ])
+    MentorMentee.objects.bulk_create([MentorMentee(mentor=mentor, mentee_id=u.pk) for u in users])
+    Project.objects.bulk_create([Project(user=u, title="p") for u in users[::2]])
+
+
+class HODDashboardQueryCountTests(TestCase):
+    """_build_hod_dashboard_data must not issue queries per mentee."""
+
+    def _count_queries(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .views.hod import _build_hod_dashboard_data
+
+        with CaptureQueriesContext(connection) as ctx:
+            data = _build_hod_dashboard_data()
+        return len(ctx.captured_queries), data
+
+    def test_query_count_is_constant(self):
+        from .models import Mentor
+
+        mentors = []
+        for i in range(2):
+            user = User.objects.create(username=f"mentor{i}", is_mentor=True)
+            mentors.append(Mentor.objects.create(user=user, name=f"Mentor {i}"))
+
+        _add_mentees(mentors[0], 0, 10)
+        small_count, small = self._count_queries()
+        self.assertEqual(small["total_mentees"], 10)
+
+        _add_mentees(mentors[0], 10, 2490)
+        _add_mentees(mentors[1], 2500, 2500)
+        large_count, large = self._count_queries()
+
+        self.assertEqual(large["total_mentees"], 5000)
+        self.assertEqual(small_count, large_count)
+        self.assertEqual(large["partial_count"], 2500)
+        self.assertEqual(large["not_started_count"], 2500)
+
+    def test_progress_matches_get_document_progress(self):
+        from .models import Mentor, Project
+        from .utils import get_document_progress
+
+        user = User.objects.create(username="mentor-x", is_mentor=True)
+        mentor = Mentor.objects.create(user=user, name="Mentor X")
+        _add_mentees(mentor, 0, 3)
+        Project.objects.create(user=User.objects.get(username="mentee1"), title="p")
+
+        _, data = self._count_queries()
+        for row in data["mentees_list"]:
+            completed, total, _ = get_document_progress(User.objects.get(pk=row["user_id"]))
+            self.assertEqual(row["progress"], f"{completed}/{total}")
+
+
+class MenteeProgressSignalTests(TestCase):
+    """MenteeProgress rows follow uploads and deletes and agree with a full rebuild."""
+
+    def setUp(self):
+        self.user = User.objects.create(username="progress-mentee", is_mentee=True)
+
+    def _progress(self):
+        from .models import MenteeProgress
+        return MenteeProgress.objects.get(user=self.user)
+
+    def test_row_created_and_updated_incrementally(self):
+        from .models import Project, InternshipPBL
+
+        self.assertEqual(self._progress().completed, 0)
+
+        project = Project.objects.create(user=self.user, title="p")
+        InternshipPBL.objects.create(user=self.user, title="no certificate")
+        progress = self._progress()
+        self.assertTrue(progress.has_project)
+        self.assertEqual(progress.internship_count, 1)
+        self.assertFalse(progress.has_internship)
+        self.assertEqual((progress.completed, progress.total, progress.has_pending), (1, 7, True))
+
+        project.delete()
+        progress = self._progress()
+        self.assertFalse(progress.has_project)
+        self.assertEqual(progress.completed, 0)
+
+    def test_concurrent_first_save_updates_instead_of_failing(self):
+        from unittest import mock
+        from .models import MenteeProgress, Project
+        from .utils import refresh_document_progress
+
+        Project.objects.create(user=self.user, title="p")
+        # another request inserted the row after this one looked for it
+        missing = mock.Mock(**{"first.return_value": None})
+        with mock.patch.object(MenteeProgress.objects, "filter", return_value=missing):
+            progress = refresh_document_progress(self.user.pk)
+        self.assertEqual(MenteeProgress.objects.filter(user=self.user).count(), 1)
+        self.assertTrue(progress.has_project)
+        self.assertEqual(progress.completed, 1)
+
+    def test_rebuild_repairs_drift(self):
+        from django.core.management import call_command
+        from .models import MenteeProgress, Project
+        from .utils import get_document_progress
+
+        Project.objects.create(user=self.user, title="p")
+        MenteeProgress.objects.filter(user=self.user).update(has_project=False, project_count=0, completed=0)
+        self.assertEqual(get_document_progress(self.user)[0], 0)
+
+        call_command("rebuild_progress", stdout=io.StringIO())
+        self.assertEqual(get_document_progress(self.user)[0], 1)
+        self.assertEqual(self._progress().project_count, 1)
+
+    def test_delete_does_not_create_missing_row(self):
+        from .models import MenteeProgress, Project
+
+        project = Project.objects.create(user=self.user, title="p")
+        MenteeProgress.objects.filter(user=self.user).delete()
+        project.delete()
+        self.assertFalse(MenteeProgress.objects.filter(user=self.user).exists())
+
+
+class StreamingZipTests(SimpleTestCase):
+    """iter_zip yields a valid archive in bounded pieces."""
+
+    def test_archive_is_valid_and_chunked(self):
+        import os
+        import tempfile
+        import zipfile
+        from .zip_stream import iter_zip
+
+        with tempfile.TemporaryDirectory() as tmp:
+            pdf_path = os.path.join(tmp, "cert.pdf")
+            txt_path = os.path.join(tmp, "notes.txt")
+            with open(pdf_path, "wb") as f:
+                f.write(os.urandom(300 * 1024))
+            with open(txt_path, "wb") as f:
+                f.write(b"a" * 200 * 1024)
+
+            entries = [
+                (pdf_path, "A/cert.pdf"),
+                (txt_path, "A/notes.txt"),
+                (pdf_path, "A/cert.pdf"),
+                (os.path.join(tmp, "missing.pdf"), "A/missing.pdf"),
+            ]
+            pieces = list(iter_zip(entries, chunk_size=16 * 1024))
+
+        self.assertGreater(len(pieces), 10)
+        self.assertLess(max(len(p) for p in pieces), 64 * 1024)
+
+        with zipfile.ZipFile(io.BytesIO(b"".join(pieces))) as zf:
+            self.assertIsNone(zf.testzip())
+            self.assertEqual(zf.namelist(), ["A/cert.pdf", "A/notes.txt", "A/cert_1.pdf"])
+            self.assertEqual(zf.getinfo("A/cert.pdf").compress_type, zipfile.ZIP_STORED)
+            self.assertEqual(zf.getinfo("A/notes.txt").compress_type, zipfile.ZIP_DEFLATED)
+            self.assertEqual(len(zf.read("A/notes.txt")), 200 * 1024)
+
+
+class ExportJobTests(TestCase):
+    """Exports are queued, built by run_export_job, reused while cached and cleaned up after the TTL."""
+
+    def setUp(self):
+        import shutil
+        import tempfile
+        from django.conf import settings
+        from django.test import override_settings
+
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        shutil.copy(settings.MEDIA_ROOT / "default.png", media.name)
+
+        overrides = override_settings(MEDIA_ROOT=media.name, EXPORT_JOBS_ASYNC=True)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        self.hod = User.objects.create_superuser(username="hod", password="x", email="hod@example.com")
+        self.client.force_login(self.hod)
+
+    def test_queue_build_reuse_and_cleanup(self):
+        from django.utils import timezone
+        from .export_jobs import run_export_job, cleanup_expired_jobs
+        from .models import ExportJob
+
+        url = reverse("hod_export_excel")
+        first = self.client.get(url, HTTP_ACCEPT="application/json")
+        self.assertEqual(first.status_code, 202)
+        job_id = first.json()["job_id"]
+        self.assertEqual(self.client.get(url, HTTP_ACCEPT="application/json").json()["job_id"], job_id)
+
+        self.assertEqual(run_export_job(job_id), "done")
+        status = self.client.get(reverse("export_job_status", args=[job_id])).json()
+        self.assertEqual((status["status"], status["progress"]), ("done", 100))
+
+        download = self.client.get(status["download_url"])
+        self.assertEqual(download.status_code, 200)
+        self.assertTrue(b"".join(download.streaming_content).startswith(b"PK"))
+
+        cached = self.client.get(url, HTTP_ACCEPT="application/json")
+        self.assertEqual((cached.status_code, cached.json()["job_id"]), (200, job_id))
+
+        job = ExportJob.objects.get(pk=job_id)
+        path = job.file.path
+        ExportJob.objects.filter(pk=job_id).update(expires_at=timezone.now())
+        self.assertEqual(cleanup_expired_jobs(), 1)
+        self.assertFalse(ExportJob.objects.exists())
+        self.assertFalse(__import__("os").path.exists(path))
+
+    def test_browser_request_redirects_to_job_page(self):
+        response = self.client.get(reverse("hod_export_pdf"))
+        self.assertEqual(response.status_code, 302)
+        self.assertIn("/exports/", response["Location"])
+
+    def test_other_users_cannot_see_job(self):
+        response = self.client.get(reverse("hod_export_excel"), HTTP_ACCEPT="application/json")
+        other = User.objects.create(username="someone")
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(reverse("export_job_status", args=[response.json()["job_id"]])).status_code, 404)
+
+
+class ActivityLogBatchingTests(TestCase):
+    """Log rows of one request are written with a single INSERT, and only for committed work."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="logger", password="x", is_mentor=True)
+
+    def _log_inserts(self, queries):
+        return [q["sql"] for q in queries if q["sql"].startswith('INSERT INTO "mentee_activitylog"')]
+
+    def test_batch_writes_one_insert(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from . import audit
+        from .models import ActivityLog, Notification
+
+        with CaptureQueriesContext(connection) as ctx:
+            with audit.batch():
+                with self.captureOnCommitCallbacks(execute=True):
+                    for i in range(5):
+                        Notification.objects.create(user=self.user, message=f"n{i}")
+
+        self.assertEqual(len(self._log_inserts(ctx.captured_queries)), 1)
+        self.assertEqual(ActivityLog.objects.filter(module="Notification", action="Created").count(), 5)
+
+    def test_rows_keep_the_time_they_were_recorded(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from . import audit
+        from .models import ActivityLog
+
+        happened = timezone.now() - timedelta(minutes=5)
+        with audit.batch():
+            with self.captureOnCommitCallbacks(execute=True):
+                audit.record(ActivityLog(user=self.user, action="Created", module="Notification", timestamp=happened))
+                audit.record(ActivityLog(user=self.user, action="Updated", module="Notification"))
+
+        first, second = ActivityLog.objects.filter(module="Notification").order_by("id")
+        self.assertEqual(first.timestamp, happened)
+        self.assertLess(first.timestamp, second.timestamp)
+
+    def test_rolled_back_work_is_not_logged(self):
+        from django.db import transaction
+        from . import audit
+        from .models import ActivityLog, Notification
+
+        with audit.batch():
+            with self.captureOnCommitCallbacks(execute=True):
+                try:
+                    with transaction.atomic():
+                        Notification.objects.create(user=self.user, message="lost")
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+                Notification.objects.create(user=self.user, message="kept")
+
+        self.assertEqual(
+            list(ActivityLog.objects.filter(module="Notification").values_list("details", flat=True)),
+            [f"{self.user.username} - kept"],
+        )
+
+    def test_module_deny_list(self):
+        from django.test import override_settings
+        from . import audit
+        from .models import ActivityLog, Notification
+
+        with override_settings(ACTIVITY_LOG_EXCLUDE_MODULES=["Notification"]):
+            with audit.batch():
+                with self.captureOnCommitCallbacks(execute=True):
+                    Notification.objects.create(user=self.user, message="quiet")
+
+        self.assertFalse(ActivityLog.objects.filter(module="Notification").exists())
+
+
+class SnapshotCacheTests(TestCase):
+    """Pre-save snapshots are bounded and request-scoped, and update_fields saves skip the SELECT."""
+
+    def setUp(self):
+        from .models import Notification
+
+        self.user = User.objects.create_user(username="snap", password="x", is_mentor=True)
+        self.notes = Notification.objects.bulk_create([
+            Notification(user=self.user, message=f"n{i}") for i in range(300)
+        ])
+
+    def test_orphaned_snapshots_are_evicted(self):
+        import tracemalloc
+        from django.test import override_settings
+        from . import audit
+        from .models import Notification
+        from .signals import cache_old_instance
+
+        with override_settings(ACTIVITY_LOG_SNAPSHOT_CACHE=64), audit.batch():
+            # pre_save without a matching post_save, as when the save itself raises
+            tracemalloc.start()
+            for i in range(1000):
+                cache_old_instance(Notification, self.notes[i % 300])
+            warm, _ = tracemalloc.get_traced_memory()
+            for i in range(4000):
+                cache_old_instance(Notification, self.notes[i % 300])
+            after, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            self.assertEqual(len(audit.snapshots()), 64)
+            self.assertLess(after - warm, 256 * 1024)
+
+        self.assertEqual(len(audit.snapshots()), 0)
+
+    def test_thousands_of_saves_leave_nothing_behind(self):
+        from . import audit
+        from .models import ActivityLog
+
+        with audit.batch():
+            with self.captureOnCommitCallbacks(execute=True):
+                for i in range(2000):
+                    note = self.notes[i % 300]
+                    note.message = f"edit {i}"
+                    note.save()
+                self.assertEqual(len(audit.snapshots()), 0)
+
+        last = ActivityLog.objects.filter(module="Notification", action="Updated").latest("id")
+        self.assertEqual(last.details, "Changed fields: message")
+
+    def test_update_fields_skips_select(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from . import audit
+        from .models import ActivityLog
+
+        note = self.notes[0]
+        note.is_read = True
+        with audit.batch():
+            with self.captureOnCommitCallbacks(execute=True):
+                with CaptureQueriesContext(connection) as ctx:
+                    note.save(update_fields=["is_read"])
+
+        self.assertFalse([q for q in ctx.captured_queries if q["sql"].startswith("SELECT")])
+        log = ActivityLog.objects.get(module="Notification", action="Updated")
+        self.assertEqual(log.new_data, {"is_read": True})
+        self.assertEqual(log.details, "Changed fields: is_read")
+
+
+class ActivityLogFixture:
+    """23 logs by three authors; Msg on odd rows, Project on even ones."""
+
+    def setUp(self):
+        from .models import ActivityLog
+
+        self.staff = User.objects.create_user(username="staff", password="x", is_staff=True)
+        self.authors = [User.objects.create_user(username=f"author{i}", password="x") for i in range(3)]
+        ActivityLog.objects.all().delete()
+        # bulk_create stamps every row with the same timestamp, so ordering relies on the id tiebreaker
+        ActivityLog.objects.bulk_create([
+            ActivityLog(user=self.authors[i % 3], action="Created", module="Msg" if i % 2 else "Project",
+                        details=f"row {i}")
+            for i in range(23)
+        ])
+        self.client.force_login(self.staff)
+
+
+class ActivityLogApiTests(ActivityLogFixture, TestCase):
+    """Keyset pagination of the activity-log API."""
+
+    def _get(self, **params):
+        return self.client.get(reverse("activity_logs_api"), params)
+
+    def test_cursor_walk_matches_offset_order(self):
+        from .models import ActivityLog
+
+        seen, cursor = [], ""
+        while True:
+            data = self._get(cursor=cursor, per=5).json()
+            seen += [r["id"] for r in data["results"]]
+            cursor = data["next_cursor"]
+            if not cursor:
+                break
+
+        expected = list(ActivityLog.objects.order_by("-timestamp", "-id").values_list("id", flat=True))
+        self.assertEqual(seen, expected)
+
+        offset = self._get(page=2, per=5).json()
+        self.assertEqual([r["id"] for r in offset["results"]], expected[5:10])
+        self.assertEqual(offset["total"], 23)
+        self.assertFalse(offset["count_is_approximate"])
+
+    def test_filters_and_query_count(self):
+        with self.assertNumQueries(4):  # session, user, page, capped count
+            data = self._get(cursor="", module="Msg", exact="1", per=50).json()
+        self.assertEqual(len(data["results"]), 11)
+        self.assertEqual(data["count"], 11)
+        self.assertTrue(all(r["module"] == "Msg" and r["user"] for r in data["results"]))
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self._get(cursor="not-a-cursor").status_code, 400)
+
+
+class ActivityLogExportTests(ActivityLogFixture, TestCase):
+    """Exports stream their rows and honour the API filters."""
+
+    def test_csv_streams_filtered_rows(self):
+        response = self.client.get(reverse("activity_logs_export_csv"), {"module": "Msg", "exact": "1"})
+        self.assertTrue(response.streaming)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(",")[:4], ["id", "user", "action", "module"])
+        self.assertEqual(len(lines), 1 + 11)
+
+    def test_excel_write_only_workbook(self):
+        import openpyxl
+
+        response = self.client.get(reverse("activity_logs_export_excel"), {"user": "author1", "exact": "1"})
+        wb = openpyxl.load_workbook(io.BytesIO(b"".join(response.streaming_content)))
+        rows = list(wb["Activity Logs"].values)
+        self.assertEqual(len(rows), 1 + 8)
+        self.assertTrue(all(r[1] == "author1" for r in rows[1:]))
+
+    def test_pdf_is_paged(self):
+        from . import models
+        from .views import admin_logs
+
+        models.ActivityLog.objects.bulk_create([models.ActivityLog(action="Created", module="Msg") for _ in range(60)])
+        response = self.client.get(reverse("logs_export_pdf"))
+        content = b"".join(response.streaming_content)
+        self.assertTrue(content.startswith(b"%PDF"))
+        expected_pages = -(-83 // admin_logs.PDF_ROWS_PER_PAGE)
+        self.assertEqual(len(re.findall(rb"/Type /Page\b(?!s)", content)), expected_pages)
+
+
+class ActivityLogArchiveTests(TestCase):
+    """Old logs move to compressed day partitions, resumably, and stay queryable through the API."""
+
+    def setUp(self):
+        import shutil
+        import tempfile
+        from datetime import timedelta
+        from django.test import override_settings
+        from django.utils import timezone
+        from .models import ActivityLog
+
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        override = override_settings(ACTIVITY_LOG_ARCHIVE_DIR=tmp, ACTIVITY_LOG_HOT_DAYS=90)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.staff = User.objects.create_user(username="auditor", password="x", is_staff=True)
+        ActivityLog.objects.all().delete()
+        self.old_day = (timezone.now() - timedelta(days=200)).replace(hour=10)
+        logs = ActivityLog.objects.bulk_create([
+            ActivityLog(user=self.staff, action="Updated", module="Msg" if i % 2 else "Project", details=f"old {i}")
+            for i in range(25)
+        ])
+        ActivityLog.objects.filter(pk__in=[lo.pk for lo in logs]).update(timestamp=self.old_day)
+        ActivityLog.objects.create(user=self.staff, action="Created", module="Msg", details="recent")
+
+    def _archived_ids(self):
+        from . import log_archive
+
+        ids = []
+        for part in log_archive.load_manifest()["partitions"].values():
+            with gzip.open(os.path.join(log_archive.archive_dir(), part["file"]), "rt") as fh:
+                ids += [json.loads(line)["id"] for line in fh]
+        return ids
+
+    def test_archive_and_query(self):
+        from . import log_archive
+        from .models import ActivityLog
+
+        moved = log_archive.archive_logs(batch_size=10)
+        self.assertEqual(moved, 25)
+        self.assertEqual(list(ActivityLog.objects.values_list("details", flat=True)), ["recent"])
+        self.assertEqual(len(self._archived_ids()), 25)
+        manifest = log_archive.load_manifest()
+        self.assertEqual(sum(p["rows"] for p in manifest["partitions"].values()), 25)
+
+        self.client.force_login(self.staff)
+        date = self.old_day.astimezone(timezone.get_current_timezone()).date().isoformat()
+        data = self.client.get(reverse("activity_logs_api"), {"date": date, "module": "Msg", "cursor": "", "per": 5}).json()
+        self.assertEqual(data["count"], 12)
+        self.assertTrue(all(r["archived"] and r["module"] == "Msg" for r in data["results"]))
+        self.assertIsNotNone(data["next_cursor"])
+
+    def test_interrupted_runs_resume_without_duplicates(self):
+        from unittest import mock
+        from . import log_archive
+        from .models import ActivityLog
+
+        # crash while appending: the partial gzip member is truncated away on the next run
+        real_write = gzip.GzipFile.write
+        calls = {"n": 0}
+
+        def flaky_write(gz, data):
+            calls["n"] += 1
+            if calls["n"] == 3:
+                raise OSError("disk full")
+            return real_write(gz, data)
+
+        with mock.patch.object(gzip.GzipFile, "write", flaky_write):
+            with self.assertRaises(OSError):
+                log_archive.archive_logs(batch_size=10)
+
+        # crash after the files were written but before the rows were deleted
+        real_recover = log_archive._recover
+
+        def crash_in_loop(manifest):
+            if manifest["pending"] and manifest["pending"]["written"]:
+                raise RuntimeError("killed")
+            return real_recover(manifest)
+
+        with mock.patch.object(log_archive, "_recover", crash_in_loop):
+            with self.assertRaises(RuntimeError):
+                log_archive.archive_logs(batch_size=10)
+
+        log_archive.archive_logs(batch_size=10)
+        ids = self._archived_ids()
+        self.assertEqual(len(ids), 25)
+        self.assertEqual(len(set(ids)), 25)
+        self.assertEqual(ActivityLog.objects.count(), 1)
+
+
+class ViewProfilingTests(TestCase):
+    """Opt-in per-view profiling and its staff report."""
+
+    def setUp(self):
+        from django.test import override_settings
+        from . import profiling
+
+        override = override_settings(VIEW_PROFILING=True, VIEW_PROFILING_FLUSH_SECONDS=3600)
+        override.enable()
+        self.addCleanup(override.disable)
+        profiling._buffer = None
+        self.addCleanup(setattr, profiling, "_buffer", None)
+
+        self.staff = User.objects.create_user(username="perf", password="x", is_staff=True)
+
+    def test_disabled_middleware_removes_itself(self):
+        from django.core.exceptions import MiddlewareNotUsed
+        from django.test import override_settings
+        from .middleware import ViewProfilingMiddleware
+
+        with override_settings(VIEW_PROFILING=False):
+            with self.assertRaises(MiddlewareNotUsed):
+                ViewProfilingMiddleware(lambda request: None)
+
+    def test_report_ranks_views_with_query_stats(self):
+        from .models import ActivityLog, ViewProfileRollup
+
+        ActivityLog.objects.bulk_create([ActivityLog(user=self.staff, action="Created", module="Msg") for _ in range(3)])
+        self.client.force_login(self.staff)
+        for _ in range(3):
+            self.client.get(reverse("activity_logs_api"), {"page": 1})
+        self.client.get(reverse("home"))
+
+        data = self.client.get(reverse("view_profile_report"), {"format": "json", "sort": "queries"}).json()
+        views = {v["view"]: v for v in data["views"]}
+        api = views["activity_logs_api"]
+        self.assertEqual(api["requests"], 3)
+        self.assertGreaterEqual(api["avg_queries"], 3)
+        self.assertIsNotNone(api["p95_ms"])
+        self.assertIn("home", views)
+        self.assertEqual(data["views"][0]["view"], "activity_logs_api")
+        self.assertTrue(ViewProfileRollup.objects.filter(view_name="activity_logs_api").exists())
+
+    def test_repeated_statements_are_reported(self):
+        from django.db import connection
+        from . import profiling
+        from .models import Notification
+
+        recorder = profiling.QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            for _ in range(4):
+                list(Notification.objects.filter(user=self.staff))
+            list(User.objects.filter(pk__in=[1, 2, 3]))
+            list(User.objects.filter(pk__in=[4, 5]))
+
+        self.assertEqual(recorder.count, 6)
+        self.assertEqual(sorted(recorder.duplicates().values()), [2, 4])
+
+    def test_slow_views_report_as_valid_json(self):
+        import json
+        from django.utils import timezone
+        from . import profiling
+
+        buffer = profiling.get_buffer()
+        buffer.add({"view": "slow", "at": timezone.now(), "ms": 60000.0, "queries": 1, "sql_ms": 1.0, "duplicates": {}})
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse("view_profile_report"), {"format": "json"})
+        # strict parsing: a bare Infinity token would be rejected
+        data = json.loads(response.content, parse_constant=lambda name: self.fail(f"{name} in report"))
+        slow = next(v for v in data["views"] if v["view"] == "slow")
+        self.assertEqual((slow["p95_ms"], slow["p95_over"]), (profiling.LATENCY_BUCKETS_MS[-1], True))
+        html = self.client.get(reverse("view_profile_report")).content.decode()
+        self.assertIn(f"&gt; {profiling.LATENCY_BUCKETS_MS[-1]}", html)
+
+    def test_full_buffer_flushes_off_the_request_thread(self):
+        import threading
+        from . import profiling
+
+        buffer = profiling.ProfileBuffer(maxsize=2, flush_seconds=3600)
+        flushed, threads = threading.Event(), []
+
+        def flush():
+            threads.append(threading.current_thread())
+            flushed.set()
+
+        buffer.flush = flush
+        buffer.add({})
+        buffer.add({})
+        self.assertTrue(flushed.wait(2))
+        self.assertIsNot(threads[0], threading.current_thread())
+
+    def test_failed_flush_is_logged_not_raised(self):
+        from unittest import mock
+        from django.db import DatabaseError
+        from django.utils import timezone
+        from . import profiling
+
+        buffer = profiling.ProfileBuffer(maxsize=10, flush_seconds=3600)
+        buffer.add({"view": "home", "at": timezone.now(), "ms": 1.0, "queries": 1, "sql_ms": 0.1, "duplicates": {}})
+        with mock.patch.object(profiling.ViewProfileRollup.objects, "select_for_update", side_effect=DatabaseError):
+            with self.assertLogs("mentee.profiling", "ERROR"):
+                self.assertEqual(buffer.flush(), 0)
+
+
+class MentorCohortTests(TestCase):
+    """The mentor home page and document views do not query per mentee."""
+
+    def setUp(self):
+        from .models import Mentor
+
+        self.mentor_user = User.objects.create_user(username="cohort-mentor", password="x", is_mentor=True)
+        self.mentor = Mentor.objects.create(user=self.mentor_user, name="Cohort Mentor")
+        self.client.force_login(self.mentor_user)
+
+    def _account_queries(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("account1"))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_account_page_query_count_is_constant(self):
+        _add_mentees(self.mentor, 0, 5)
+        small, _ = self._account_queries()
+        _add_mentees(self.mentor, 5, 75)
+        large, response = self._account_queries()
+
+        self.assertEqual(small, large)
+        self.assertEqual(len(response.context["mentees"]), 80)
+        self.assertEqual(response.context["pending_reminder_count"], 80)
+
+    def test_pending_meetings_use_stored_end(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .models import Meeting
+
+        _add_mentees(self.mentor, 0, 1)
+        now = timezone.localtime()
+        later = now + timedelta(hours=2)
+        earlier = now - timedelta(hours=2)
+        Meeting.objects.create(mentor=self.mentor, mentee_id=User.objects.get(username="mentee0").pk,
+                               appointment_date=later.date(), time_slot=later.time(), duration_minutes=30)
+        past = Meeting.objects.create(mentor=self.mentor, mentee_id=User.objects.get(username="mentee0").pk,
+                                      appointment_date=earlier.date(), time_slot=earlier.time(), duration_minutes=30)
+        self.assertEqual(past.ends_at, past.meeting_end_datetime)
+
+        _, response = self._account_queries()
+        self.assertEqual(response.context["pending_meetings"], 1)
+
+    def test_document_views_batch_per_category(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .models import CertificationCourse
+
+        _add_mentees(self.mentor, 0, 30)
+        for i in range(30):
+            CertificationCourse.objects.create(user=User.objects.get(username=f"mentee{i}"), title=f"c{i}")
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse("mentee_documents"), {"moodle_ids": [f"mentee{i}" for i in range(30)]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["selected_mentees_info"]), 30)
+        self.assertLess(len(ctx.captured_queries), 20)
+
+
+class CohortPivotChartTests(TestCase):
+    """Chart endpoints answer from one GROUP BY, whatever the cohort size."""
+
+    ENDPOINTS = ["get_chart_data", "get_chart_data_compare", "get_heatmap_data", "get_department_trends"]
+
+    def setUp(self):
+        from .models import Mentor
+
+        self.mentor_user = User.objects.create_user(username="chart-mentor", password="x", is_mentor=True)
+        self.mentor = Mentor.objects.create(user=self.mentor_user, name="Chart Mentor")
+        self.client.force_login(self.mentor_user)
+        analytics_cache.get_cache().clear()
+
+    def _add_projects(self, start, count):
+        from .achievements import rebuild_achievement_facts
+        from .models import Project
+
+        _add_mentees(self.mentor, start, count)
+        projects = []
+        for i in range(start, start + count):
+            user = User.objects.get(username=f"mentee{i}")
+            projects += [Project(user=user, title="a", academic_year="2023-24")] * (i % 3)
+            projects += [Project(user=user, title="b", academic_year="2024-25")] * (i % 2 + 1)
+        Project.objects.bulk_create([Project(user=p.user, title=p.title, academic_year=p.academic_year) for p in projects])
+        rebuild_achievement_facts()  # bulk_create skips the signals that maintain the facts
+
+    def _query_counts(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        counts = {}
+        for name in self.ENDPOINTS:
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(reverse(name), {"category": "project"})
+            self.assertEqual(response.status_code, 200)
+            counts[name] = len(ctx.captured_queries)
+        return counts
+
+    def test_query_count_is_constant(self):
+        self._add_projects(0, 8)
+        small = self._query_counts()
+        self._add_projects(8, 72)
+        large = self._query_counts()
+
+        self.assertEqual(small, large)
+        self.assertEqual(set(large.values()), {4})  # session, user, mentor, pivot
+
+    def test_matrix_matches_per_cell_counts(self):
+        from .models import Project
+
+        self._add_projects(0, 6)
+        data = self.client.get(reverse("get_heatmap_data"), {"category": "project"}).json()
+        self.assertEqual(data["years"], ["2023-24", "2024-25"])
+        for y, year in enumerate(data["years"]):
+            for s, label in enumerate(data["students"]):
+                expected = Project.objects.filter(user__username=label, academic_year=year).count()
+                self.assertEqual(data["matrix"][y][s], expected)
+
+        trends = self.client.get(reverse("get_department_trends"), {"category": "project"}).json()
+        self.assertEqual(trends["trends"]["mentee0"], "up")      # 0 -> 1
+        self.assertEqual(trends["percentages"]["mentee2"], -50.0)  # 2 -> 1
+        totals = self.client.get(reverse("get_chart_data"), {"category": "project", "year": "2024-25"}).json()
+        self.assertEqual(dict(zip(totals["labels"], totals["data"]))["mentee1"], 2)
+
+
+
+class AchievementFactTests(TestCase):
+    """AchievementFact follows the achievement tables through signals and matches a full rebuild."""
+
+    def setUp(self):
+        from .models import Mentor
+
+        self.mentor_user = User.objects.create_user(username="fact-mentor", password="x", is_mentor=True)
+        self.mentor = Mentor.objects.create(user=self.mentor_user, name="Fact Mentor")
+        _add_mentees(self.mentor, 0, 2)
+        self.user = User.objects.get(username="mentee0")
+
+    def _facts(self):
+        from .models import AchievementFact
+
+        return sorted(AchievementFact.objects.values_list(
+            "user_id", "category", "academic_year", "semester", "branch", "level", "prize", "count",
+        ))
+
+    def test_signals_keep_facts_in_step_with_rebuild(self):
+        from .achievements import rebuild_achievement_facts
+        from .models import Profile, SportsCulturalEvent
+
+        rebuild_achievement_facts()  # pick up the project bulk-created by _add_mentees
+        first = SportsCulturalEvent.objects.create(
+            user=self.user, name_of_event="a", academic_year="2024-25", semester="3", level="State", prize_won="1st",
+        )
+        SportsCulturalEvent.objects.create(
+            user=self.user, name_of_event="b", academic_year="2024-25", semester="3", level="State", prize_won="1st",
+        )
+        self.assertIn((self.user.pk, "sports", "2024-25", "3", "IT", "State", "1st", 2), self._facts())
+
+        first.delete()
+        profile = Profile.objects.get(user=self.user)
+        profile.branch = "COMP"
+        profile.save()
+        self.assertIn((self.user.pk, "sports", "2024-25", "3", "COMP", "State", "1st", 1), self._facts())
+
+        incremental = self._facts()
+        rebuild_achievement_facts()
+        self.assertEqual(self._facts(), incremental)
+
+    def test_visualization_reads_branch_totals_from_facts(self):
+        from .achievements import rebuild_achievement_facts
+        from .models import AchievementFact, Project
+
+        # the refresh recounts mentee0's projects, including the one bulk-created by _add_mentees
+        Project.objects.create(user=self.user, title="x", academic_year="2023-24")
+        self.client.force_login(self.mentor_user)
+        response = self.client.get(reverse("student_visualization"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["project_data"], [{"user__profile__branch": "IT", "total": 2}])
+        self.assertEqual(response.context["academic_years"], ["2023-24"])
+
+        AchievementFact.objects.all().delete()
+        response = self.client.get(reverse("student_visualization"))
+        self.assertEqual(response.context["project_data"], [])
+
+        rebuild_achievement_facts()
+        response = self.client.get(reverse("student_visualization"))
+        self.assertEqual(response.context["project_data"], [{"user__profile__branch": "IT", "total": 2}])
+
+
+
+class AcademicYearCatalogueTests(TestCase):
+    """Year dropdowns come from the maintained catalogue, scoped per mentor and per department."""
+
+    def setUp(self):
+        from .models import Mentor
+
+        self.mentors = []
+        for i in range(2):
+            user = User.objects.create_user(username=f"year-mentor{i}", password="x", is_mentor=True)
+            self.mentors.append(Mentor.objects.create(user=user, name=f"Year Mentor {i}"))
+        _add_mentees(self.mentors[0], 0, 2)
+        _add_mentees(self.mentors[1], 2, 1)
+
+    def test_catalogue_follows_writes_and_scopes(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .academic_years import catalogue_years, rebuild_student_years
+        from .models import CertificationCourse, Profile, SemesterResult
+
+        mentee0, mentee2 = User.objects.get(username="mentee0"), User.objects.get(username="mentee2")
+        course = CertificationCourse.objects.create(user=mentee0, title="c", academic_year="2022-23")
+        SemesterResult.objects.create(user=mentee0, academic_year="2023-24", semester="III")
+        CertificationCourse.objects.create(user=mentee2, title="c", academic_year="2025-26")
+        Profile.objects.filter(user=mentee2).update(branch="COMP")
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(catalogue_years(mentor=self.mentors[0]), ["2022-23", "2023-24"])
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(catalogue_years(mentor=self.mentors[1], newest_first=True), ["2025-26"])
+        self.assertEqual(catalogue_years(branch="COMP"), ["2025-26"])
+        self.assertEqual(catalogue_years(), ["2022-23", "2023-24", "2025-26"])
+
+        course.delete()
+        self.assertEqual(catalogue_years(mentor=self.mentors[0]), ["2023-24"])
+
+        incremental = catalogue_years()
+        rebuild_student_years()
+        self.assertEqual(catalogue_years(), incremental)
+
+    def test_download_page_offers_catalogue_and_configured_years(self):
+        from .models import AY, Project
+
+        Project.objects.create(user=User.objects.get(username="mentee1"), title="p", academic_year="2016-17")
+        self.client.force_login(self.mentors[0].user)
+        response = self.client.get(reverse("download_student_data"))
+        self.assertEqual(response.status_code, 200)
+        # a year outside the choices still shows up, and configured years without records stay selectable
+        self.assertEqual(response.context["years"], ["2016-17"] + [value for value, _ in AY])
+
+
+class AnalyticsCacheTests(TestCase):
+    """Chart JSON and the HOD dashboard are cached per version; writes through signals invalidate them."""
+
+    def setUp(self):
+        from .models import Mentor
+
+        analytics_cache.get_cache().clear()
+        analytics_cache.reset_stats()
+        self.mentor_user = User.objects.create_user(username="cache-mentor", password="x", is_mentor=True)
+        self.mentor = Mentor.objects.create(user=self.mentor_user, name="Cache Mentor")
+        _add_mentees(self.mentor, 0, 2)
+        self.mentee = User.objects.get(username="mentee0")
+
+    def _get(self, name, **headers):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse(name), {"category": "project"}, headers=headers)
+        return response, len(ctx.captured_queries)
+
+    def test_chart_json_hits_etag_and_invalidation(self):
+        from .models import Project
+
+        self.client.force_login(self.mentor_user)
+        first, _ = self._get("get_heatmap_data")
+        second, queries = self._get("get_heatmap_data")
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(queries, 2)  # session + user, nothing for the chart itself
+        self.assertEqual(first["ETag"], second["ETag"])
+        self.assertEqual(analytics_cache.stats()["hits"], 1)
+
+        not_modified, _ = self._get("get_heatmap_data", if_none_match=first["ETag"])
+        self.assertEqual(not_modified.status_code, 304)
+
+        Project.objects.create(user=self.mentee, title="new", academic_year="2024-25")
+        third, _ = self._get("get_heatmap_data", if_none_match=first["ETag"])
+        self.assertEqual(third.status_code, 200)
+        self.assertNotEqual(third["ETag"], first["ETag"])
+        self.assertEqual(third.json()["years"], ["2024-25"])
+
+    def test_profile_saves_only_bump_on_relevant_changes(self):
+        from .models import Profile
+
+        before = analytics_cache.versions([analytics_cache.department_scope("IT")])
+        profile = Profile.objects.get(user=self.mentee)
+        profile.save()
+        self.assertEqual(analytics_cache.versions([analytics_cache.department_scope("IT")]), before)
+
+        profile.branch = "COMP"
+        profile.save()
+        self.assertNotEqual(analytics_cache.versions([analytics_cache.department_scope("IT")]), before)
+
+    def test_keys_differ_per_scope_with_equal_versions(self):
+        scope_a, scope_b = analytics_cache.mentor_scope(1), analytics_cache.mentor_scope(2)
+        for scope in (scope_a, scope_b):
+            analytics_cache.get_cache().set(analytics_cache._version_key(scope), 7, timeout=None)
+        self.assertEqual(analytics_cache.versions([scope_a]), analytics_cache.versions([scope_b]))
+        self.assertNotEqual(
+            analytics_cache.make_key("get_chart_data", {}, [scope_a]),
+            analytics_cache.make_key("get_chart_data", {}, [scope_b]),
+        )
+
+    def test_deferred_profile_queries_load(self):
+        from .models import Profile
+
+        # post_init must not read deferred fields (each read would refresh and re-run post_init)
+        profile = Profile.objects.filter(user=self.mentee).only("id").get()
+        self.assertEqual(profile.branch, "IT")
+        self.assertEqual(len(Profile.objects.defer("branch", "student_name")), Profile.objects.count())
+
+    def test_hod_dashboard_context_is_cached(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        staff = User.objects.create_user(username="cache-hod", password="x", is_staff=True)
+        self.client.force_login(staff)
+        counts = []
+        for _ in range(2):
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(reverse("hod_dashboard"), {"branch": "IT"})
+            self.assertEqual(response.status_code, 200)
+            counts.append(len(ctx.captured_queries))
+        self.assertLess(counts[1], counts[0])
+        self.assertEqual(response.context["total_mentees"], 2)
+
+        stats = self.client.get(reverse("analytics_cache_stats")).json()
+        self.assertEqual(stats["stats"]["hits"], 2)
+        self.assertEqual(stats["stats"]["misses"], 2)
+
+
+CHAT_TEST_SETTINGS = {
+    "CHANNEL_LAYERS": {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+    # tests run in one process; production shares these through the "chat" Redis cache
+    "CHAT_MEMBERSHIP_CACHE_ALIAS": "default",
+    "CHAT_PRESENCE_CACHE_ALIAS": "default",
+}
+
+
+def _chat_communicator(user, conv, subprotocols=None):
+    from channels.routing import URLRouter
+    from channels.testing import WebsocketCommunicator
+    from .routing import websocket_urlpatterns
+
+    communicator = WebsocketCommunicator(
+        URLRouter(websocket_urlpatterns), f"/ws/chat/{conv.pk}/", subprotocols=subprotocols
+    )
+    communicator.scope["user"] = user
+    return communicator
+
+
+async def _next_frame(communicator, timeout=2):
+    """Next frame that is not a presence notice."""
+    while True:
+        frame = await communicator.receive_json_from(timeout=timeout)
+        if not frame["action"].startswith("presence"):
+            return frame
+
+
+class ChatFixture:
+    """A mentor-mentee conversation in which both sides have written."""
+
+    def setUp(self):
+        from django.core.cache import cache
+        from .models import Conversation, Reply
+
+        cache.clear()  # presence / membership entries of a previous test's conversation ids
+        self.mentor = User.objects.create_user(username="chat-mentor", password="x", is_mentor=True)
+        self.mentee = User.objects.create_user(username="chat-mentee", password="x", is_mentee=True)
+        self.conv = Conversation.objects.create(sender=self.mentor, receipient=self.mentee, conversation="hi")
+        self.replies = [
+            Reply.objects.create(conversation=self.conv, sender=sender, reply=f"r{i}")
+            for i, sender in enumerate([self.mentee, self.mentor, self.mentor, self.mentor])
+        ]
+
+
+@override_settings(**CHAT_TEST_SETTINGS)
+class ReadWatermarkTests(ChatFixture, TestCase):
+    """Seen receipts move one watermark row forward; counts are derived from it."""
+
+    def test_watermark_is_monotonic_single_update(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .models import ReadWatermark
+        from .read_receipts import mark_seen
+
+        r0, r1, r2, r3 = self.replies
+        self.assertTrue(mark_seen(self.conv.pk, self.mentee.pk, r1.pk))
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertTrue(mark_seen(self.conv.pk, self.mentee.pk, r3.pk))
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertFalse(mark_seen(self.conv.pk, self.mentee.pk, r2.pk))  # never moves back
+        self.assertEqual(ReadWatermark.objects.get().last_seen_reply_id, r3.pk)
+
+        other = self.conv.__class__.objects.create(sender=self.mentor, receipient=self.mentee, conversation="x")
+        self.assertFalse(mark_seen(other.pk, self.mentee.pk, r3.pk))  # reply of another conversation
+
+        self.assertEqual([r.seen_count() for r in self.replies], [0, 1, 1, 1])
+        from .chat_history import history_page
+        self.assertEqual([r.seen_total for r in history_page(self.conv.pk)[0]], [0, 1, 1, 1])
+
+    def test_seen_frame_over_websocket(self):
+        from asgiref.sync import async_to_sync
+        from .models import ReadWatermark
+
+        async def run():
+            mentor_ws, mentee_ws = _chat_communicator(self.mentor, self.conv), _chat_communicator(self.mentee, self.conv)
+            self.assertTrue((await mentor_ws.connect())[0])
+            self.assertTrue((await mentee_ws.connect())[0])
+            await mentee_ws.send_json_to({"action": "seen", "reply_id": self.replies[2].pk})
+            frame = await _next_frame(mentor_ws)
+            await mentor_ws.disconnect()
+            await mentee_ws.disconnect()
+            return frame
+
+        frame = async_to_sync(run)()
+        self.assertEqual(frame["action"], "batch")
+        self.assertEqual(frame["events"], [{"action": "seen_event", "reply_id": self.replies[2].pk, "user_id": self.mentee.pk}])
+        self.assertEqual(ReadWatermark.objects.get(user=self.mentee).last_seen_reply_id, self.replies[2].pk)
+
+    def test_first_receipt_that_loses_the_insert_race_still_moves(self):
+        from unittest import mock
+        from .models import ReadWatermark
+        from .read_receipts import mark_seen
+
+        r0, r1, r2, r3 = self.replies
+        real_get_or_create = ReadWatermark.objects.get_or_create
+
+        def concurrent_first_receipt(**kwargs):
+            # another tab inserted the row (at an older reply) between our check and our insert
+            real_get_or_create(conversation_id=self.conv.pk, user_id=self.mentee.pk,
+                               defaults={"last_seen_reply_id": r1.pk})
+            return real_get_or_create(**kwargs)[0], False
+
+        with mock.patch.object(ReadWatermark.objects, "get_or_create", side_effect=concurrent_first_receipt):
+            self.assertTrue(mark_seen(self.conv.pk, self.mentee.pk, r3.pk))
+        self.assertEqual(ReadWatermark.objects.get().last_seen_reply_id, r3.pk)
+
+    @override_settings(CHAT_RECEIPT_BATCHING=False)
+    def test_unknown_reply_id_does_not_block_later_receipts(self):
+        from asgiref.sync import async_to_sync
+        from .models import ReadWatermark
+
+        async def run():
+            mentee_ws = _chat_communicator(self.mentee, self.conv)
+            await mentee_ws.connect()
+            await mentee_ws.send_json_to({"action": "seen", "reply_id": 10 ** 9})  # not a reply of this chat
+            await mentee_ws.send_json_to({"action": "seen", "reply_id": self.replies[2].pk})
+            frame = await _next_frame(mentee_ws)
+            await mentee_ws.disconnect()
+            return frame
+
+        frame = async_to_sync(run)()
+        self.assertEqual(frame["action"], "seen_event")
+        self.assertEqual(ReadWatermark.objects.get(user=self.mentee).last_seen_reply_id, self.replies[2].pk)
+
+
+@override_settings(CHAT_BATCH_WINDOW_MS=50, **CHAT_TEST_SETTINGS)
+class ReceiptBatchingTests(ChatFixture, TestCase):
+    """A burst of seen / reaction frames is written and broadcast once per window."""
+
+    def _burst(self, frames, disconnect_early=False):
+        from asgiref.sync import async_to_sync
+        from .benchmarking import count_statements
+
+        async def run():
+            mentor_ws, mentee_ws = _chat_communicator(self.mentor, self.conv), _chat_communicator(self.mentee, self.conv)
+            await mentor_ws.connect()
+            await mentee_ws.connect()
+            for frame in frames:
+                await mentee_ws.send_json_to(frame)
+            if disconnect_early:
+                await mentee_ws.disconnect()
+            received = [await _next_frame(mentor_ws)]
+            while not await mentor_ws.receive_nothing(timeout=0.2):
+                frame = await mentor_ws.receive_json_from()
+                if not frame["action"].startswith("presence"):
+                    received.append(frame)
+            await mentor_ws.disconnect()
+            if not disconnect_early:
+                await mentee_ws.disconnect()
+            return received
+
+        with count_statements() as stats:
+            received = async_to_sync(run)()
+        return received, stats["statements"]
+
+    def test_chatty_client_is_coalesced(self):
+        from .models import Reaction, ReadWatermark
+        from .read_receipts import mark_seen
+
+        ids = [r.pk for r in self.replies]
+        mark_seen(self.conv.pk, self.mentee.pk, ids[0])  # steady state: the watermark row exists
+        frames = [{"action": "seen", "reply_id": rid} for rid in ids for _ in range(5)]
+        frames += [{"action": "reaction", "reply_id": ids[1], "emoji": e} for e in ["👍", "❤️", "😂"]]
+        frames += [{"action": "reaction", "reply_id": ids[2], "emoji": "👍"}]
+        received, statements = self._burst(frames)
+
+        self.assertEqual(len(received), 1)
+        self.assertEqual(received[0]["action"], "batch")
+        self.assertEqual(len(received[0]["events"]), 3)  # newest seen + one reaction per reply
+        # watermark UPDATE + reaction upsert + one change-log row for the broadcast
+        self.assertEqual(statements["UPDATE"] + statements["INSERT"], 3)
+        self.assertEqual(ReadWatermark.objects.get(user=self.mentee).last_seen_reply_id, ids[-1])
+        self.assertEqual(dict(Reaction.objects.values_list("reply_id", "emoji")), {ids[1]: "😂", ids[2]: "👍"})
+
+    def test_batched_reactions_are_logged(self):
+        from .chat_batching import save_receipts
+        from .models import ActivityLog
+
+        ids = [r.pk for r in self.replies]
+        save_receipts(self.conv.pk, self.mentee.pk, 0, {ids[1]: "👍"})
+        with self.captureOnCommitCallbacks(execute=True):
+            save_receipts(self.conv.pk, self.mentee.pk, 0, {ids[1]: "😂", ids[2]: "👍"})
+        logged = ActivityLog.objects.filter(module="Reaction", user=self.mentee)
+        self.assertEqual(sorted(logged.values_list("action", flat=True)), ["Created", "Updated"])
+
+    def test_failed_flush_keeps_the_receipts(self):
+        from asgiref.sync import async_to_sync
+        from .chat_batching import ReceiptBatcher
+
+        calls = []
+
+        async def flaky(seen_reply_id, reactions):
+            calls.append((seen_reply_id, dict(reactions)))
+            if len(calls) == 1:
+                raise RuntimeError("database went away")
+
+        async def run():
+            batcher = ReceiptBatcher(flaky, window=0.01)
+            await batcher.add_seen(5)
+            await batcher.add_reaction(5, "👍")
+            with self.assertLogs("mentee.chat_batching", "ERROR"):
+                await batcher.flush()
+            await batcher.add_seen(6)
+            await batcher.flush()
+
+        async_to_sync(run)()
+        self.assertEqual(calls, [(5, {5: "👍"}), (6, {5: "👍"})])
+
+    def test_final_flush_failure_is_not_retried(self):
+        import asyncio
+        from asgiref.sync import async_to_sync
+        from .chat_batching import ReceiptBatcher
+
+        calls = []
+
+        async def down(seen_reply_id, reactions):
+            calls.append(seen_reply_id)
+            raise RuntimeError("database went away")
+
+        async def run():
+            batcher = ReceiptBatcher(down, window=0.01)
+            await batcher.add_seen(5)
+            with self.assertLogs("mentee.chat_batching", "ERROR"):
+                await batcher.flush(final=True)
+            await batcher.add_seen(6)  # a late frame after the close schedules nothing
+            await asyncio.sleep(0.05)
+            return batcher
+
+        batcher = async_to_sync(run)()
+        self.assertEqual(calls, [5])
+        self.assertIsNone(batcher._timer)
+
+    def test_pending_receipts_flush_on_disconnect(self):
+        from .models import ReadWatermark
+
+        with self.settings(CHAT_BATCH_WINDOW_MS=10000):
+            received, _ = self._burst([{"action": "seen", "reply_id": self.replies[3].pk}], disconnect_early=True)
+        self.assertEqual(received[0]["events"][0]["reply_id"], self.replies[3].pk)
+        self.assertEqual(ReadWatermark.objects.get(user=self.mentee).last_seen_reply_id, self.replies[3].pk)
+
+@override_settings(**CHAT_TEST_SETTINGS)
+class ChatHistoryTests(ChatFixture, TestCase):
+    """The chat pages render the latest window; older messages are keyset-paged."""
+
+    def setUp(self):
+        from .models import Reaction, Reply
+
+        super().setUp()
+        stamp = timezone.now()
+        # identical timestamps, so paging has to fall back to the id tie-breaker
+        Reply.objects.bulk_create([
+            Reply(conversation=self.conv, sender=self.mentor, reply=f"bulk{i}", replied_at=stamp) for i in range(116)
+        ])
+        self.all_ids = list(Reply.objects.filter(conversation=self.conv).order_by("replied_at", "id").values_list("pk", flat=True))
+        Reaction.objects.create(reply_id=self.all_ids[0], user=self.mentor, emoji="👍")
+
+    def test_pages_walk_back_without_gaps(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        from .chat_membership import participants
+
+        self.client.force_login(self.mentee)
+        url = reverse("chat_history", args=[self.conv.pk])
+        participants(self.conv.pk)  # membership is cached after the first request
+        seen, cursor, queries = [], None, []
+        while True:
+            with CaptureQueriesContext(connection) as ctx:
+                data = self.client.get(url, {"before": cursor} if cursor else {}).json()
+            queries.append(len(ctx.captured_queries))
+            seen = [m["id"] for m in data["messages"]] + seen
+            cursor = data["next_cursor"]
+            if not data["has_more"]:
+                break
+
+        self.assertEqual(seen, self.all_ids)
+        self.assertEqual(len(queries), 3)  # 120 messages in pages of 50
+        self.assertEqual(len(set(queries)), 1)  # constant per page
+        self.assertEqual(data["messages"][0]["reactions"], [{"user_id": self.mentor.pk, "emoji": "👍"}])
+
+    def test_page_renders_latest_window_only(self):
+        self.client.force_login(self.mentor)
+        response = self.client.get(reverse("conv-reply", args=[self.conv.pk]))
+        self.assertEqual([r.pk for r in response.context["replies"]], self.all_ids[-50:])
+        self.assertTrue(response.context["history_cursor"])
+
+    def test_outsider_and_bad_cursor(self):
+        outsider = User.objects.create_user(username="chat-outsider", password="x", is_mentee=True)
+        url = reverse("chat_history", args=[self.conv.pk])
+        self.client.force_login(outsider)
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_login(self.mentee)
+        self.assertEqual(self.client.get(url, {"before": "%%%"}).status_code, 400)
+
+
+@override_settings(**CHAT_TEST_SETTINGS)
+class ChatCatchUpTests(ChatFixture, TestCase):
+    """A reconnecting socket receives only the changes it missed."""
+
+    def _reconnect(self, since, **settings):
+        from asgiref.sync import async_to_sync
+
+        async def run():
+            ws = _chat_communicator(self.mentee, self.conv)
+            ws.scope["query_string"] = f"since={since}".encode()
+            await ws.connect()
+            frames = []
+            while not await ws.receive_nothing(timeout=0.2):
+                frame = await ws.receive_json_from()
+                if not frame["action"].startswith("presence"):
+                    frames.append(frame)
+            await ws.disconnect()
+            return frames
+
+        with self.settings(**settings):
+            return async_to_sync(run)()
+
+    def _post_changes(self):
+        self.client.force_login(self.mentor)
+        self.client.post(reverse("upload_reply", args=[self.conv.pk]), {"reply": "while you were away"})
+        self.client.post(reverse("edit_reply", args=[self.replies[1].pk]), {"reply": "edited"})
+        self.client.post(reverse("delete_reply", args=[self.replies[2].pk]))
+
+    def test_replays_missed_changes_in_order(self):
+        from .chat_changes import latest_seq
+
+        since = latest_seq(self.conv.pk)
+        self._post_changes()
+        frames = self._reconnect(since)
+
+        self.assertEqual([f["action"] for f in frames], ["new_message", "edited_message", "deleted_message"])
+        self.assertEqual(frames[1]["message"]["text"], "edited")
+        self.assertEqual(frames[2]["message"]["id"], self.replies[2].pk)
+        self.assertEqual([f["seq"] for f in frames], sorted(f["seq"] for f in frames))
+        self.assertEqual(self._reconnect(frames[-1]["seq"]), [])  # up to date: nothing to replay
+
+    def test_pruned_or_too_far_behind_requires_reload(self):
+        from .chat_changes import latest_seq, prune
+        from .models import ChatEvent
+
+        since = latest_seq(self.conv.pk)
+        self._post_changes()
+        self.assertEqual(self._reconnect(since, CHAT_CHANGELOG_MAX_REPLAY=2), [{"action": "resync_required"}])
+
+        with self.settings(CHAT_CHANGELOG_MAX_EVENTS=1):
+            self.assertEqual(prune(self.conv.pk), 2)
+        self.assertEqual(ChatEvent.objects.filter(conversation=self.conv).count(), 1)
+        self.assertEqual(self._reconnect(since), [{"action": "resync_required"}])
+        self.assertEqual([f["action"] for f in self._reconnect(latest_seq(self.conv.pk) - 1)], ["deleted_message"])
+
+
+@override_settings(**CHAT_TEST_SETTINGS)
+class ChatSendTests(ChatFixture, TestCase):
+    """Text replies sent over the socket are stored once per client_id and broadcast."""
+
+    def test_send_is_broadcast_and_idempotent(self):
+        from asgiref.sync import async_to_sync
+        from .models import Reply
+
+        frame = {"action": "send", "text": "over the socket", "client_id": "c-1"}
+
+        async def run():
+            mentor_ws, mentee_ws = _chat_communicator(self.mentor, self.conv), _chat_communicator(self.mentee, self.conv)
+            await mentor_ws.connect()
+            await mentee_ws.connect()
+            await mentor_ws.send_json_to(frame)
+            received = await _next_frame(mentee_ws)
+            confirmed = await _next_frame(mentor_ws)
+            await mentor_ws.send_json_to(frame)  # retried after a lost confirmation
+            retried = await _next_frame(mentor_ws)
+            await mentor_ws.send_json_to({"action": "send", "text": "   ", "client_id": "c-2"})
+            rejected = await _next_frame(mentor_ws)
+            nothing_else = await mentee_ws.receive_nothing(timeout=0.2)
+            await mentor_ws.disconnect()
+            await mentee_ws.disconnect()
+            return received, confirmed, retried, rejected, nothing_else
+
+        received, confirmed, retried, rejected, nothing_else = async_to_sync(run)()
+
+        reply = Reply.objects.get(client_id="c-1")
+        self.assertEqual((reply.sender, reply.reply), (self.mentor, "over the socket"))
+        self.assertEqual(received["action"], "new_message")
+        self.assertEqual(received["message"]["id"], reply.pk)
+        self.assertEqual(confirmed["message"]["client_id"], "c-1")
+        self.assertEqual(retried["message"]["id"], reply.pk)
+        self.assertEqual(rejected, {"action": "send_error", "client_id": "c-2", "error": "Message is empty"})
+        self.assertTrue(nothing_else)  # the retry was not broadcast again
+        self.assertEqual(Reply.objects.filter(conversation=self.conv).count(), 5)
+
+    def test_client_id_is_scoped_to_the_conversation(self):
+        from .chat_messages import send_text_reply
+        from .models import Conversation
+
+        other = Conversation.objects.create(sender=self.mentor, receipient=self.mentee, conversation="other")
+        first, created_first = send_text_reply(self.conv.pk, self.mentor, "hi", "same")
+        second, created_second = send_text_reply(other.pk, self.mentor, "hi", "same")
+        self.assertTrue(created_first and created_second)
+        self.assertNotEqual(first["message"]["id"], second["message"]["id"])
+
+
+@override_settings(**CHAT_TEST_SETTINGS)
+class ChatLoadTestHarnessTests(TestCase):
+    """loadtest_chat's harness on a tiny configuration."""
+
+    def test_report_covers_every_phase(self):
+        from .chat_loadtest import create_conversations, run_load_test
+
+        report = run_load_test(create_conversations(2), participants=3, messages=2)
+
+        self.assertEqual(report["sockets"], 6)
+        self.assertEqual(report["frames"]["send"]["delivered"], 2 * 2 * 2)  # every message reaches the 2 others
+        self.assertEqual(report["frames"]["typing"]["delivered"], 2 * 3)  # one aggregated typing_state per socket
+        self.assertGreater(report["frames"]["send"]["queries_per_frame"], 0)
+        self.assertLessEqual(report["fanout_ms"]["p50"], report["fanout_ms"]["max"])
+        self.assertGreater(report["memory_per_connection_kb"], 0)
+
+
+@override_settings(**CHAT_TEST_SETTINGS)
+class ChatMembershipTests(ChatFixture, TestCase):
+    """Socket and HTTP authorisation share a cached participant set."""
+
+    def _connect(self, user):
+        from asgiref.sync import async_to_sync
+        from .benchmarking import count_statements
+
+        async def run():
+            ws = _chat_communicator(user, self.conv)
+            connected, code = await ws.connect()
+            if connected:
+                await ws.disconnect()
+            return connected
+
+        with count_statements() as stats:
+            connected = async_to_sync(run)()
+        return connected, sum(stats["statements"].values())
+
+    def test_warm_connect_runs_no_queries(self):
+        self.assertEqual(self._connect(self.mentee), (True, 1))  # cold: one lookup
+        self.assertEqual(self._connect(self.mentee), (True, 0))
+        self.assertEqual(self._connect(self.mentor), (True, 0))
+
+        outsider = User.objects.create_user(username="chat-outsider", password="x", is_mentee=True)
+        self.assertEqual(self._connect(outsider), (False, 0))
+
+    def test_membership_follows_conversation_changes(self):
+        from .chat_membership import is_member
+
+        other = User.objects.create_user(username="chat-new-mentee", password="x", is_mentee=True)
+        self.assertFalse(is_member(self.conv.pk, other.pk))
+        self.conv.receipient = other
+        self.conv.save()
+        self.assertTrue(is_member(self.conv.pk, other.pk))
+        self.assertFalse(is_member(self.conv.pk, self.mentee.pk))
+
+        conv_id = self.conv.pk
+        self.conv.delete()
+        self.assertFalse(is_member(conv_id, other.pk))
+
+        self.client.force_login(other)
+        self.assertEqual(self.client.post(reverse("upload_reply", args=[conv_id]), {"reply": "x"}).status_code, 404)
+
+
+@override_settings(**CHAT_TEST_SETTINGS, CHAT_PRESENCE_DIFF_MS=100)
+class ChatPresenceTests(ChatFixture, TestCase):
+    """Snapshot on connect, coalesced diffs, expiry of entries that stop beating."""
+
+    async def _frames(self, ws, action, quiet=0.4):
+        frames = []
+        while not await ws.receive_nothing(timeout=quiet):
+            frame = await ws.receive_json_from()
+            if frame["action"] == action:
+                frames.append(frame)
+        return frames
+
+    def test_late_joiner_gets_snapshot_and_storm_is_coalesced(self):
+        from asgiref.sync import async_to_sync
+
+        async def run():
+            first = _chat_communicator(self.mentor, self.conv)
+            await first.connect()
+            await self._frames(first, "presence_diff")
+            storm = [_chat_communicator(u, self.conv) for u in [self.mentee, self.mentor] * 3]
+            for ws in storm:
+                await ws.connect()
+            snapshot = (await storm[0].receive_json_from())
+            diffs = await self._frames(first, "presence_diff")
+            for ws in [first] + storm:
+                await ws.disconnect()
+            return snapshot, diffs
+
+        snapshot, diffs = async_to_sync(run)()
+        self.assertEqual(snapshot["action"], "presence_snapshot")
+        self.assertEqual({u["user_id"] for u in snapshot["online"]}, {self.mentor.pk, self.mentee.pk})
+        self.assertEqual(len(diffs), 1)  # six joins, one frame
+        self.assertEqual(diffs[0]["joined"], [{"user_id": self.mentee.pk, "username": self.mentee.username}])
+
+    @override_settings(CHAT_PRESENCE_TTL=0.3, CHAT_PRESENCE_HEARTBEAT=0.1)
+    def test_entries_without_heartbeat_expire(self):
+        import asyncio
+        from asgiref.sync import async_to_sync
+        from . import chat_presence
+
+        async def run():
+            # a socket of a worker that died without disconnecting
+            await chat_presence.register(self.conv.pk, "crashed-worker!channel", self.mentee.pk, self.mentee.username)
+            ws = _chat_communicator(self.mentor, self.conv)
+            await ws.connect()
+            snapshot = await ws.receive_json_from()
+            await asyncio.sleep(0.6)
+            diffs = await self._frames(ws, "presence_diff")
+            online = await chat_presence.online_users(self.conv.pk)
+            await ws.disconnect()
+            return snapshot, diffs, online
+
+        snapshot, diffs, online = async_to_sync(run)()
+        self.assertIn(self.mentee.pk, {u["user_id"] for u in snapshot["online"]})
+        self.assertIn(self.mentee.pk, [uid for d in diffs for uid in d["left"]])
+        self.assertEqual(online, {self.mentor.pk: self.mentor.username})
+
+
+@override_settings(**CHAT_TEST_SETTINGS, CHAT_TYPING_TICK_MS=100, CHAT_TYPING_EXPIRE_MS=400)
+class TypingAggregationTests(ChatFixture, TestCase):
+    """Typing frames become one typing_state per tick, only when the set of typists changes."""
+
+    def test_burst_is_one_frame_and_typists_expire(self):
+        import asyncio
+        from asgiref.sync import async_to_sync
+
+        async def run():
+            mentor_ws, mentee_ws = _chat_communicator(self.mentor, self.conv), _chat_communicator(self.mentee, self.conv)
+            await mentor_ws.connect()
+            await mentee_ws.connect()
+            for _ in range(10):
+                await mentee_ws.send_json_to({"action": "typing", "typing": True})
+            first = await _next_frame(mentor_ws)
+            quiet_while_unchanged = await mentor_ws.receive_nothing(timeout=0.2)
+            await asyncio.sleep(0.3)  # no fresh typing frame: the typist expires
+            second = await _next_frame(mentor_ws)
+            await mentor_ws.disconnect()
+            await mentee_ws.disconnect()
+            return first, quiet_while_unchanged, second
+
+        first, quiet_while_unchanged, second = async_to_sync(run)()
+        self.assertEqual(first["action"], "typing_state")
+        self.assertEqual(first["typing"], [{"user_id": self.mentee.pk, "username": self.mentee.username}])
+        self.assertTrue(quiet_while_unchanged)
+        self.assertEqual(second["typing"], [])
+
+
+@override_settings(**CHAT_TEST_SETTINGS, CHAT_FRAME_BATCH_MS=50)
+class ChatFramingTests(ChatFixture, TestCase):
+    """Compact wire formats are negotiated per socket; JSON stays the default."""
+
+    def test_compact_json_batches_short_key_events(self):
+        import json
+        from asgiref.sync import async_to_sync
+        from .chat_framing import COMPACT_JSON_PROTOCOL, expand
+
+        async def run():
+            mentor_ws = _chat_communicator(self.mentor, self.conv, [COMPACT_JSON_PROTOCOL])
+            mentee_ws = _chat_communicator(self.mentee, self.conv)
+            _, protocol = await mentor_ws.connect()
+            await mentee_ws.connect()
+            for i in range(3):
+                await mentee_ws.send_json_to({"action": "send", "text": f"batched {i}", "client_id": f"b-{i}"})
+            frames, messages = [], 0
+            while messages < 3:
+                frame = json.loads(await mentor_ws.receive_from(timeout=2))
+                frames.append(frame)
+                messages += sum(1 for event in frame if event["a"] == "new_message")
+            plain = await _next_frame(mentee_ws)
+            await mentor_ws.disconnect()
+            await mentee_ws.disconnect()
+            return protocol, frames, plain
+
+        protocol, frames, plain = async_to_sync(run)()
+        self.assertEqual(protocol, COMPACT_JSON_PROTOCOL)
+        carrying = [frame for frame in frames if any(event["a"] == "new_message" for event in frame)]
+        self.assertLess(len(carrying), 3)  # queued together, sent together
+        first = next(event for event in carrying[0] if event["a"] == "new_message")
+        self.assertEqual(first["m"]["su"], self.mentee.username)
+        self.assertNotIn("f", first["m"])  # no file: the null field is left out
+        self.assertEqual(expand(first)["message"]["text"], "batched 0")
+        # the socket that offered no subprotocol still gets one plain JSON event per frame
+        self.assertEqual(plain["action"], "new_message")
+        self.assertEqual(plain["message"]["sender_username"], self.mentee.username)
+
+    def test_msgpack_frames_both_ways(self):
+        import msgpack
+        from asgiref.sync import async_to_sync
+        from .chat_framing import MSGPACK_PROTOCOL, expand
+
+        async def run():
+            ws = _chat_communicator(self.mentor, self.conv, [MSGPACK_PROTOCOL])
+            _, protocol = await ws.connect()
+            await ws.send_to(bytes_data=msgpack.packb({"a": "send", "t": "packed", "k": "p-1"}))
+            while True:
+                events = [expand(e) for e in msgpack.unpackb(await ws.receive_from(timeout=2))]
+                sent = [e for e in events if e["action"] == "new_message"]
+                if sent:
+                    break
+            await ws.disconnect()
+            return protocol, sent[0]
+
+        protocol, event = async_to_sync(run)()
+        self.assertEqual(protocol, MSGPACK_PROTOCOL)
+        self.assertEqual((event["message"]["text"], event["message"]["client_id"]), ("packed", "p-1"))
@@ -1,4 +1,4 @@
-from .views import mentee, mentor, hod, admin_logs
+from .views import mentee, mentor, hod, admin_logs, exports, profiling
 from django.contrib.auth import views as auth_views
 from django.urls import path, re_path
 from django.conf import settings
@@ -18,8 +18,14 @@ urlpatterns = [
     path("admin/activity-logs/export/csv/", admin_logs.export_logs_csv, name="activity_logs_export_csv"),
     path("admin/activity-logs/export/excel/", admin_logs.export_logs_excel, name="activity_logs_export_excel"),
     path("admin/activity-logs/export/pdf/", admin_logs.export_logs_pdf, name="logs_export_pdf"),
+    path("admin/view-profile/", profiling.view_profile_report, name="view_profile_report"),
+    path("admin/analytics-cache/", profiling.analytics_cache_stats, name="analytics_cache_stats"),
+    path("exports/<int:pk>/", exports.export_job_page, name="export_job_page"),
+    path("exports/<int:pk>/status/", exports.export_job_status, name="export_job_status"),
+    path("exports/<int:pk>/download/", exports.export_job_download, name="export_job_download"),
     # add below existing upload-reply/conv routes
     path('chat/<int:pk>/upload/', mentee.upload_reply, name='upload_reply'),
+    path('chat/<int:pk>/history/', mentee.chat_history, name='chat_history'),
     path('chat/reply/<int:pk>/edit/', mentee.edit_reply, name='edit_reply'),
     path('chat/reply/<int:pk>/delete/', mentee.delete_reply, name='delete_reply'),
 
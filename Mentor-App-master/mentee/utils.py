@@ -1,7 +1,12 @@
-from .models import (Profile, InternshipPBL, Project, CertificationCourse, PaperPublication, SportsCulturalEvent,
+from .models import (User, MenteeProgress, Profile, InternshipPBL, Project, CertificationCourse, PaperPublication, SportsCulturalEvent,
     OtherEvent, SemesterResult, EducationalDetail, StudentInterest, StudentProfileOverview)
+from django.db.models import Count, Exists, OuterRef, Q
+from . import analytics_cache
 from django.utils import timezone
 from zoneinfo import ZoneInfo
+from datetime import datetime
+import base64
+import binascii
 from functools import wraps
 from django.shortcuts import redirect
 from django.contrib import messages
@@ -65,51 +70,187 @@ def compute_profile_completeness(user):
     return score, items
 
 
-def get_document_progress(user):
+# category -> (model, file field that must be filled, or None if any record counts)
+DOCUMENT_CATEGORIES = {
+    "internship": (InternshipPBL, "certificate"),
+    "marksheet": (SemesterResult, "marksheet"),
+    "project": (Project, None),
+    "certification": (CertificationCourse, "certificate"),
+    "publication": (PaperPublication, "certificate"),
+    "sports": (SportsCulturalEvent, "certificate"),
+    "other": (OtherEvent, "certificate"),
+}
+
+DOCUMENT_FLAGS = tuple(f"has_{category}" for category in DOCUMENT_CATEGORIES)
+
+
+def _uploaded_q(file_field):
+    if not file_field:
+        return Q()
+    return Q(**{f"{file_field}__isnull": False}) & ~Q(**{file_field: ""})
+
+
+def document_progress_annotations(user_ref="pk"):
     """
-    Returns (completed_count, total_required, has_pending)
+    Returns {flag: Exists(...)} annotations for every document category.
+    `user_ref` is the path (on the outer queryset) to the user's id, e.g. "pk"
+    on User or "mentee__user" on MentorMentee.
     """
+    outer = OuterRef(user_ref)
+    return {
+        f"has_{category}": Exists(model.objects.filter(_uploaded_q(file_field), user_id=outer))
+        for category, (model, file_field) in DOCUMENT_CATEGORIES.items()
+    }
 
-    has_internship = InternshipPBL.objects.filter(
-        user=user, certificate__isnull=False
-    ).exclude(certificate="").exists()
 
-    has_marksheet = SemesterResult.objects.filter(
-        user=user, marksheet__isnull=False
-    ).exclude(marksheet="").exists()
+def progress_from_flags(flags):
+    """
+    Turns a row annotated by document_progress_annotations (object or dict)
+    into (completed_count, total_required, has_pending).
+    """
+    if isinstance(flags, dict):
+        completed_count = sum(bool(flags.get(f)) for f in DOCUMENT_FLAGS)
+    else:
+        completed_count = sum(bool(getattr(flags, f, False)) for f in DOCUMENT_FLAGS)
 
-    has_project = Project.objects.filter(user=user).exists()
+    total_required = len(DOCUMENT_FLAGS)
+    has_pending = completed_count < total_required
 
-    has_certification = CertificationCourse.objects.filter(
-        user=user, certificate__isnull=False
-    ).exclude(certificate="").exists()
+    return completed_count, total_required, has_pending
 
-    has_publication = PaperPublication.objects.filter(
-        user=user, certificate__isnull=False
-    ).exclude(certificate="").exists()
 
-    has_sports = SportsCulturalEvent.objects.filter(
-        user=user, certificate__isnull=False
-    ).exclude(certificate="").exists()
+def compute_progress_fields(user_ids=None, categories=None):
+    """
+    Returns {user_id: {field: value}} with MenteeProgress category fields,
+    using one GROUP BY query per category. `user_ids=None` means every user.
+    """
+    rows = {}
+    for category in categories or DOCUMENT_CATEGORIES:
+        model, file_field = DOCUMENT_CATEGORIES[category]
+        qs = model.objects.filter(user__isnull=False)
+        if user_ids is not None:
+            qs = qs.filter(user_id__in=user_ids)
+        grouped = qs.values("user_id").annotate(
+            n=Count("id"),
+            uploaded=Count("id", filter=_uploaded_q(file_field)) if file_field else Count("id"),
+        )
+        for row in grouped:
+            rows.setdefault(row["user_id"], {}).update({
+                f"{category}_count": row["n"],
+                f"has_{category}": row["uploaded"] > 0,
+            })
+
+    if user_ids is not None:
+        for user_id in user_ids:
+            rows.setdefault(user_id, {})
+
+    for fields in rows.values():
+        for category in categories or DOCUMENT_CATEGORIES:
+            fields.setdefault(f"{category}_count", 0)
+            fields.setdefault(f"has_{category}", False)
+
+    return rows
+
+
+def _apply_totals(progress):
+    completed, total, has_pending = progress_from_flags(progress)
+    progress.completed = completed
+    progress.total = total
+    progress.has_pending = has_pending
+
+
+def refresh_document_progress(user_id, categories=None, create=True):
+    """
+    Recomputes the given categories (default: all) of one user's MenteeProgress row.
+    Called from signals whenever a document record is saved or deleted.
+    With create=False a missing row is left missing (e.g. while the user is being deleted).
+    """
+    progress = MenteeProgress.objects.filter(user_id=user_id).first()
+    if progress is None:
+        if not create:
+            return None
+        # a new row needs every category, not only the one that changed; update_or_create turns a
+        # concurrent first save of the same user (unique user) into an update instead of a 500
+        fields = compute_progress_fields([user_id])[user_id]
+        progress = MenteeProgress(user_id=user_id, **fields)
+        _apply_totals(progress)
+        fields.update(completed=progress.completed, total=progress.total, has_pending=progress.has_pending)
+        progress, _ = MenteeProgress.objects.update_or_create(user_id=user_id, defaults=fields)
+        return progress
+
+    fields = compute_progress_fields([user_id], categories)[user_id]
+    for name, value in fields.items():
+        setattr(progress, name, value)
+    _apply_totals(progress)
+    progress.save()
+    return progress
+
+
+def rebuild_document_progress(user_ids=None, batch_size=500):
+    """
+    Recomputes MenteeProgress for `user_ids` (default: every mentee) in bulk.
+    Returns (created, updated).
+    """
+    if user_ids is None:
+        user_ids = list(User.objects.filter(is_mentee=True).values_list("pk", flat=True))
 
-    has_other = OtherEvent.objects.filter(
-        user=user, certificate__isnull=False
-    ).exclude(certificate="").exists()
+    computed = compute_progress_fields(user_ids)
+    existing = MenteeProgress.objects.in_bulk(computed.keys(), field_name="user_id")
 
-    completed_count = sum([
-        has_internship,
-        has_marksheet,
-        has_project,
-        has_certification,
-        has_publication,
-        has_sports,
-        has_other,
-    ])
+    to_create, to_update = [], []
+    for user_id, fields in computed.items():
+        progress = existing.get(user_id) or MenteeProgress(user_id=user_id)
+        for name, value in fields.items():
+            setattr(progress, name, value)
+        _apply_totals(progress)
+        (to_update if progress.pk else to_create).append(progress)
 
-    total_required = 7
-    has_pending = completed_count < total_required
+    update_fields = [f"{category}_count" for category in DOCUMENT_CATEGORIES] + list(DOCUMENT_FLAGS)
+    update_fields += ["completed", "total", "has_pending", "updated_at"]
+    now = timezone.now()
+    for progress in to_update:
+        progress.updated_at = now
 
-    return completed_count, total_required, has_pending
+    MenteeProgress.objects.bulk_create(to_create, batch_size=batch_size)
+    if to_update:
+        MenteeProgress.objects.bulk_update(to_update, update_fields, batch_size=batch_size)
+
+    analytics_cache.bump_global()
+    return len(to_create), len(to_update)
+
+
+def get_document_progress_bulk(user_ids):
+    """
+    Returns {user_id: (completed_count, total_required, has_pending)} for many users.
+    Reads the MenteeProgress table in one query; users without a row yet are
+    computed with a single annotated query.
+    """
+    user_ids = list(user_ids)
+    result = {
+        row["user_id"]: progress_from_flags(row)
+        for row in MenteeProgress.objects.filter(user_id__in=user_ids).values("user_id", *DOCUMENT_FLAGS)
+    }
+
+    missing = [uid for uid in user_ids if uid not in result]
+    if missing:
+        for row in (
+            User.objects.filter(pk__in=missing)
+            .annotate(**document_progress_annotations("pk"))
+            .values("pk", *DOCUMENT_FLAGS)
+        ):
+            result[row["pk"]] = progress_from_flags(row)
+
+    for uid in missing:
+        result.setdefault(uid, progress_from_flags({}))
+
+    return result
+
+
+def get_document_progress(user):
+    """
+    Returns (completed_count, total_required, has_pending)
+    """
+    return get_document_progress_bulk([user.pk])[user.pk]
 
 
 IST = ZoneInfo("Asia/Kolkata")
@@ -123,6 +264,23 @@ def to_ist(dt):
     return dt.astimezone(IST).strftime("%d-%m-%Y %H:%M:%S")
 
 
+def encode_cursor(timestamp, pk):
+    """Opaque keyset cursor for a (timestamp, id) position."""
+    raw = f"{timestamp.isoformat()}|{pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Returns (timestamp, id); raises ValueError for a malformed cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        ts, pk = raw.rsplit("|", 1)
+        timestamp = datetime.fromisoformat(ts)
+        return timestamp, int(pk)
+    except (ValueError, UnicodeDecodeError, binascii.Error) as exc:
+        raise ValueError("invalid cursor") from exc
+
+
 def mentee_required(view_func):
     @wraps(view_func)
     def _wrapped(request, *args, **kwargs):
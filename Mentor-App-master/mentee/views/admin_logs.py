@@ -1,6 +1,6 @@
 from django.contrib.admin.views.decorators import staff_member_required
 from django.shortcuts import render
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, StreamingHttpResponse, FileResponse
 from django.utils.dateparse import parse_date
 from mentee.models import ActivityLog
 import csv
@@ -10,12 +10,15 @@ from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4, landscape
 from reportlab.lib import colors
 from reportlab.platypus import Table, TableStyle
-import io
+import tempfile
 from django.utils import timezone
 from ..signals import get_diff
-from ..utils import to_ist
-from django.db.models import F
-from django.core.paginator import Paginator
+from ..utils import to_ist, encode_cursor, decode_cursor
+from .. import log_archive
+from django.db import connection
+from django.db.models import F, Q
+from datetime import datetime, time, timedelta
+import math
 
 
 @staff_member_required
@@ -23,178 +26,379 @@ def activity_logs_view(request):
     # Render main page — frontend will call /api/activity-logs/ for data
     return render(request, "admin/activity-logs.html", {})
 
-@staff_member_required
-def activity_logs_api(request):
-    # Live filter endpoint (returns JSON)
-    qs = ActivityLog.objects.all().order_by('-timestamp')
+APPROX_COUNT_CAP = 10000
+
+
+def _day_range(date_q):
+    """(start, end) of a local calendar day given as YYYY-MM-DD, or None."""
+    if not date_q:
+        return None
+    try:
+        d = parse_date(date_q)
+    except ValueError:
+        return None
+    if not d:
+        return None
+    day_start = timezone.make_aware(datetime.combine(d, time.min))
+    return day_start, day_start + timedelta(days=1)
+
 
-    user_q = request.GET.get("user")
-    action_q = request.GET.get("action")
-    module_q = request.GET.get("module")
-    date_q = request.GET.get("date")
-    search_q = request.GET.get("q")
-    only_changed = request.GET.get('only_changed')
+def filter_logs(params, qs=None):
+    """
+    Applies the activity-log filters in `params` (request.GET).
+    Returns (queryset, filtered) — `filtered` tells whether any filter was applied.
+    `exact=1` switches user/action/module to equality so the composite indexes can be used.
+    """
+    if qs is None:
+        qs = ActivityLog.objects.all()
+    exact = params.get("exact") == "1"
+    filtered = False
+
+    user_q = params.get("user")
+    action_q = params.get("action")
+    module_q = params.get("module")
+    date_q = params.get("date")
+    search_q = params.get("q")
+    only_changed = params.get("only_changed")
 
     if user_q:
-        qs = qs.filter(user__username__icontains=user_q)
+        qs = qs.filter(**{"user__username" if exact else "user__username__icontains": user_q})
+        filtered = True
     if action_q:
-        qs = qs.filter(action__icontains=action_q)
+        qs = qs.filter(**{"action" if exact else "action__icontains": action_q})
+        filtered = True
     if module_q:
-        qs = qs.filter(module__icontains=module_q)
-    if date_q:
-        try:
-            d = parse_date(date_q)
-            if d:
-                qs = qs.filter(timestamp__date=d)
-        except:
-            pass
+        qs = qs.filter(**{"module" if exact else "module__icontains": module_q})
+        filtered = True
+    day = _day_range(date_q)
+    if day:
+        # a timestamp range instead of timestamp__date, so the (timestamp, id) index applies
+        qs = qs.filter(timestamp__gte=day[0], timestamp__lt=day[1])
+        filtered = True
     if search_q:
         qs = qs.filter(details__icontains=search_q)
+        filtered = True
 
     # --- NEW: server-side changed-only filter ---
     if only_changed == "1":
         qs = qs.filter(old_data__isnull=False)
         qs = qs.filter(new_data__isnull=False)
         qs = qs.exclude(old_data=F("new_data"))
+        filtered = True
+
+    return qs, filtered
+
+
+def approximate_count(qs, filtered):
+    """
+    Cheap row estimate: table statistics / id span when unfiltered, otherwise a count capped at
+    APPROX_COUNT_CAP. Returns (count, is_exact).
+    """
+    if not filtered:
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT reltuples FROM pg_class WHERE relname = %s", [ActivityLog._meta.db_table])
+                row = cursor.fetchone()
+            if row and row[0] and row[0] > 0:
+                return int(row[0]), False
+        # two separate lookups: SQLite only short-circuits a lone MIN() or MAX() through the index
+        ids = ActivityLog.objects.order_by("id").values_list("id", flat=True)
+        lo, hi = ids.first(), ids.last()
+        if hi is None:
+            return 0, True
+        return hi - lo + 1, False
+
+    capped = qs.order_by()[:APPROX_COUNT_CAP + 1].count()
+    if capped > APPROX_COUNT_CAP:
+        return APPROX_COUNT_CAP, False
+    return capped, True
 
-    # pagination params (simple)
-    page = int(request.GET.get("page", 1))
-    per = int(request.GET.get("per", 50))
-    paginator = Paginator(qs, per)
-    page_obj = paginator.get_page(page)
-    start = (page - 1) * per
-    end = start + per
-
-    items = []
-    for lo in qs.order_by("-timestamp")[start:end]:
-        items.append({
-            "id": lo.id,
-            "user": lo.user.username if lo.user else None,
-            "action": lo.action,
-            "module": lo.module,
-            "details": lo.details,
-            "changes": get_diff(lo.old_data, lo.new_data),
-            "old_data": lo.old_data,
-            "new_data": lo.new_data,
-            "ip": lo.ip_address,
-            "browser": lo.browser,
-            "path": lo.request_path,
-            "timestamp": lo.timestamp.isoformat(),
-        })
+
+def _log_row(lo):
+    return {
+        "id": lo.id,
+        "user": lo.user.username if lo.user else None,
+        "action": lo.action,
+        "module": lo.module,
+        "details": lo.details,
+        "changes": get_diff(lo.old_data, lo.new_data),
+        "old_data": lo.old_data,
+        "new_data": lo.new_data,
+        "ip": lo.ip_address,
+        "browser": lo.browser,
+        "path": lo.request_path,
+        "timestamp": lo.timestamp.isoformat(),
+    }
+
+
+def _archived_row(row):
+    return {
+        "id": row["id"],
+        "user": row["user"],
+        "action": row["action"],
+        "module": row["module"],
+        "details": row["details"],
+        "changes": get_diff(row["old_data"], row["new_data"]),
+        "old_data": row["old_data"],
+        "new_data": row["new_data"],
+        "ip": row["ip_address"],
+        "browser": row["browser"],
+        "path": row["request_path"],
+        "timestamp": row["timestamp"],
+        "archived": True,
+    }
+
+
+def _archive_match(row, params):
+    """Python version of filter_logs() for archived rows."""
+    exact = params.get("exact") == "1"
+    for param, field in (("user", "user"), ("action", "action"), ("module", "module")):
+        needle = params.get(param)
+        if not needle:
+            continue
+        value = row.get(field)
+        if value is None:
+            return False
+        if exact and value != needle:
+            return False
+        if not exact and needle.casefold() not in value.casefold():
+            return False
+    search_q = params.get("q")
+    if search_q and search_q.casefold() not in (row.get("details") or "").casefold():
+        return False
+    if params.get("only_changed") == "1":
+        if row["old_data"] is None or row["new_data"] is None or row["old_data"] == row["new_data"]:
+            return False
+    return True
+
+
+def _rows_with_archive(params, qs, day):
+    """All rows of one day from the hot table and the archive, newest first."""
+    rows = [_log_row(lo) for lo in qs]
+    rows += [_archived_row(r) for r in log_archive.iter_archived(*day) if _archive_match(r, params)]
+    rows.sort(key=lambda r: (datetime.fromisoformat(r["timestamp"]), r["id"]), reverse=True)
+    return rows
+
+
+def _paged_rows_response(rows, params, page, per, cursor_mode):
+    next_cursor = None
+    if cursor_mode:
+        cursor = params.get("cursor")
+        if cursor:
+            try:
+                ts, pk = decode_cursor(cursor)
+            except ValueError:
+                return JsonResponse({"error": "invalid cursor"}, status=400)
+            rows_after = [r for r in rows if (datetime.fromisoformat(r["timestamp"]), r["id"]) < (ts, pk)]
+        else:
+            rows_after = rows
+        items = rows_after[:per]
+        if len(rows_after) > per:
+            next_cursor = encode_cursor(datetime.fromisoformat(items[-1]["timestamp"]), items[-1]["id"])
+    else:
+        total_pages = max(1, math.ceil(len(rows) / per))
+        page = min(page, total_pages)
+        items = rows[(page - 1) * per:page * per]
 
     return JsonResponse({
         "results": items,
-        "count": qs.count(),
-        "page": page_obj.number,
-        "total_pages": paginator.num_pages,
-        "total": paginator.count
+        "count": len(rows),
+        "page": page,
+        "total_pages": max(1, math.ceil(len(rows) / per)),
+        "total": len(rows),
+        "count_is_approximate": False,
+        "next_cursor": next_cursor,
     })
 
+
+@staff_member_required
+def activity_logs_api(request):
+    """
+    Live filter endpoint (returns JSON).
+
+    Two pagination modes:
+      ?page=N           classic OFFSET paging with an exact count (slow on deep pages of big tables)
+      ?cursor=<token>   keyset paging on (timestamp, id); pass an empty cursor for the first page and
+                        `next_cursor` from the response for the following ones.
+    ?count=exact|approx|none picks how the total is computed (defaults: exact for page, approx for cursor).
+    When ?date= falls before the archive cutoff, archived rows of that day are merged in (see log_archive).
+    """
+    qs, filtered = filter_logs(request.GET)
+    qs = qs.select_related("user").order_by("-timestamp", "-id")
+
+    try:
+        page = max(1, int(request.GET.get("page", 1)))
+        per = max(1, min(int(request.GET.get("per", 50)), 500))
+    except ValueError:
+        return JsonResponse({"error": "page and per must be integers"}, status=400)
+
+    cursor_mode = "cursor" in request.GET
+    count_mode = request.GET.get("count", "approx" if cursor_mode else "exact")
+
+    day = _day_range(request.GET.get("date"))
+    through = log_archive.archived_through() if day else None
+    if through and day[0] < through:
+        # the requested day is (partly) in cold storage: merge archived and hot rows in memory
+        return _paged_rows_response(_rows_with_archive(request.GET, qs, day), request.GET, page, per, cursor_mode)
+
+    next_cursor = None
+    if cursor_mode:
+        cursor = request.GET.get("cursor")
+        if cursor:
+            try:
+                ts, pk = decode_cursor(cursor)
+            except ValueError:
+                return JsonResponse({"error": "invalid cursor"}, status=400)
+            qs_page = qs.filter(Q(timestamp__lt=ts) | Q(timestamp=ts, id__lt=pk))
+        else:
+            qs_page = qs
+        logs = list(qs_page[:per + 1])
+        if len(logs) > per:
+            logs = logs[:per]
+            next_cursor = encode_cursor(logs[-1].timestamp, logs[-1].pk)
+    else:
+        start = (page - 1) * per
+        logs = list(qs[start:start + per])
+
+    if count_mode == "none":
+        total, exact_total = None, False
+    elif count_mode == "approx":
+        total, exact_total = approximate_count(qs, filtered)
+    else:
+        total, exact_total = qs.count(), True
+
+    total_pages = max(1, math.ceil(total / per)) if total is not None else None
+    if not cursor_mode and total_pages:
+        page = min(page, total_pages)
+
+    return JsonResponse({
+        "results": [_log_row(lo) for lo in logs],
+        "count": total,
+        "page": page,
+        "total_pages": total_pages,
+        "total": total,
+        "count_is_approximate": not exact_total,
+        "next_cursor": next_cursor,
+    })
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_HEADERS = ["id", "user", "action", "module", "details", "ip", "browser", "path", "timestamp", "old_data", "new_data"]
+# write-only sheets cannot be auto-fitted after the fact, so widths are fixed up front
+EXPORT_COLUMN_WIDTHS = [10, 20, 24, 22, 60, 16, 40, 40, 20, 60, 60]
+PDF_ROWS_PER_PAGE = 32
+
+
+def _export_rows(request):
+    """Filtered logs for an export (same filters as activity_logs_api), fetched in chunks."""
+    qs, _ = filter_logs(request.GET)
+    qs = qs.select_related("user").order_by("-timestamp", "-id")
+    return qs.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def _export_values(lo):
+    return [
+        lo.id,
+        lo.user.username if lo.user else "",
+        lo.action,
+        lo.module,
+        lo.details,
+        lo.ip_address,
+        lo.browser,
+        lo.request_path,
+        to_ist(lo.timestamp),
+        (lo.old_data and str(lo.old_data)) or "",
+        (lo.new_data and str(lo.new_data)) or "",
+    ]
+
+
+class _Echo:
+    """File-like object whose write() just returns the line, so csv.writer can feed a generator."""
+
+    def write(self, value):
+        return value
+
+
 @staff_member_required
 def export_logs_csv(request):
-    qs = ActivityLog.objects.all().order_by("-timestamp")
-    # apply same filters as api if provided
-    user_q = request.GET.get("user")
-    if user_q:
-        qs = qs.filter(user__username__icontains=user_q)
+    writer = csv.writer(_Echo())
+
+    def rows():
+        yield writer.writerow(EXPORT_HEADERS)
+        for lo in _export_rows(request):
+            yield writer.writerow(_export_values(lo))
 
-    response = HttpResponse(content_type="text/csv")
+    response = StreamingHttpResponse(rows(), content_type="text/csv")
     response["Content-Disposition"] = 'attachment; filename="activity_logs.csv"'
-    writer = csv.writer(response)
-    writer.writerow(["id","user","action","module","details","ip","browser","path","timestamp","old_data","new_data"])
-    for lo in qs:
-        writer.writerow([
-            lo.id,
-            lo.user.username if lo.user else "",
-            lo.action,
-            lo.module,
-            lo.details,
-            lo.ip_address,
-            lo.browser,
-            lo.request_path,
-            to_ist(lo.timestamp),
-            (lo.old_data and str(lo.old_data)) or "",
-            (lo.new_data and str(lo.new_data)) or "",
-        ])
     return response
 
+
 @staff_member_required
 def export_logs_excel(request):
-    qs = ActivityLog.objects.all().order_by("-timestamp")
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Activity Logs"
-    headers = ["id","user","action","module","details","ip","browser","path","timestamp","old_data","new_data"]
-    ws.append(headers)
-    for lo in qs:
-        ws.append([
-            lo.id,
-            lo.user.username if lo.user else "",
-            lo.action,
-            lo.module,
-            lo.details,
-            lo.ip_address,
-            lo.browser,
-            lo.request_path,
-            to_ist(lo.timestamp),
-            (lo.old_data and str(lo.old_data)) or "",
-            (lo.new_data and str(lo.new_data)) or "",
-        ])
-    # auto width
-    for i, col in enumerate(ws.columns, 1):
-        max_len = 0
-        for cell in col:
-            try:
-                v = str(cell.value or "")
-                if len(v) > max_len:
-                    max_len = len(v)
-            except:
-                pass
-        ws.column_dimensions[get_column_letter(i)].width = min(max_len + 2, 80)
-
-    response = HttpResponse(content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
-    response["Content-Disposition"] = 'attachment; filename="activity_logs.xlsx"'
-    wb.save(response)
-    return response
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Activity Logs")
+    for i, width in enumerate(EXPORT_COLUMN_WIDTHS, 1):
+        ws.column_dimensions[get_column_letter(i)].width = width
 
-@staff_member_required
-def export_logs_pdf(request):
-    logs = ActivityLog.objects.all().order_by('-timestamp')
-    buffer = io.BytesIO()
-    p = canvas.Canvas(buffer, pagesize=landscape(A4))
-    width, height = landscape(A4)
+    ws.append(EXPORT_HEADERS)
+    for lo in _export_rows(request):
+        ws.append(_export_values(lo))
 
-    p.setFont("Helvetica-Bold", 16)
-    p.drawString(30, height - 40, "Website Activity Logs")
+    # rows are flushed to openpyxl's own temp files; the finished workbook goes to another temp file
+    tmp = tempfile.TemporaryFile()
+    wb.save(tmp)
+    tmp.seek(0)
+    return FileResponse(
+        tmp,
+        as_attachment=True,
+        filename="activity_logs.xlsx",
+        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    )
 
-    y = height - 80
-    data = [["User", "Action", "Module", "IP", "Time"]]
 
-    for log in logs:
-        data.append([
-            log.user.username if log.user else "Anonymous",
-            log.action,
-            log.module,
-            log.ip_address or "-",
-            to_ist(log.timestamp),
-        ])
+def _draw_pdf_page(p, rows, page_no, width, height):
+    p.setFont("Helvetica-Bold", 16)
+    p.drawString(30, height - 40, "Website Activity Logs")
 
-    table = Table(data, colWidths=[120,150,110,100,120])
+    data = [["User", "Action", "Module", "IP", "Time"]] + rows
+    table = Table(data, colWidths=[120, 150, 110, 100, 120])
     table.setStyle(TableStyle([
         ("BACKGROUND", (0,0), (-1,0), colors.grey),
         ("TEXTCOLOR", (0,0), (-1,0), colors.white),
         ("GRID", (0,0), (-1,-1), 0.3, colors.black),
         ("FONT", (0,0), (-1,-1), "Helvetica", 8),
     ]))
-    table.wrapOn(p, width, height)
-    table.drawOn(p, 30, y - 15 * len(data))
+    _, table_height = table.wrapOn(p, width, height)
+    table.drawOn(p, 30, height - 60 - table_height)
 
     # Footer
     p.setFont("Helvetica", 9)
-    p.drawCentredString(width/2, 20, f"Generated on {timezone.now().strftime('%d-%m-%Y %H:%M')}")
-
+    p.drawCentredString(width/2, 20, f"Generated on {timezone.now().strftime('%d-%m-%Y %H:%M')} - page {page_no}")
     p.showPage()
-    p.save()
 
-    buffer.seek(0)
-    return HttpResponse(buffer, content_type="application/pdf")
+
+@staff_member_required
+def export_logs_pdf(request):
+    tmp = tempfile.TemporaryFile()
+    p = canvas.Canvas(tmp, pagesize=landscape(A4))
+    width, height = landscape(A4)
+
+    # one table per page; only the rows of the current page are held as flowables
+    rows, page_no = [], 0
+    for log in _export_rows(request):
+        rows.append([
+            (log.user.username if log.user else "Anonymous")[:30],
+            (log.action or "")[:40],
+            (log.module or "")[:30],
+            log.ip_address or "-",
+            to_ist(log.timestamp),
+        ])
+        if len(rows) == PDF_ROWS_PER_PAGE:
+            page_no += 1
+            _draw_pdf_page(p, rows, page_no, width, height)
+            rows = []
+    if rows or page_no == 0:
+        _draw_pdf_page(p, rows, page_no + 1, width, height)
+
+    p.save()
+    tmp.seek(0)
+    return FileResponse(tmp, filename="activity_logs.pdf", content_type="application/pdf")
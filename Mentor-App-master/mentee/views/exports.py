@@ -0,0 +1,37 @@
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse, FileResponse, Http404
+from django.shortcuts import render, get_object_or_404
+from ..models import ExportJob
+from ..export_jobs import job_payload
+
+
+def _get_job(request, pk):
+    job = get_object_or_404(ExportJob, pk=pk)
+    if job.requested_by_id != request.user.pk and not request.user.is_staff:
+        raise Http404("Export not found")
+    return job
+
+
+@login_required
+def export_job_page(request, pk):
+    # Polls export_job_status and starts the download once the job is done
+    job = _get_job(request, pk)
+    return render(request, "exports/job_status.html", {"job": job, "payload": job_payload(job)})
+
+
+@login_required
+def export_job_status(request, pk):
+    job = _get_job(request, pk)
+    return JsonResponse(job_payload(job))
+
+
+@login_required
+def export_job_download(request, pk):
+    job = _get_job(request, pk)
+    if job.status != "done" or not job.file:
+        raise Http404("Export is not ready")
+    try:
+        handle = job.file.open("rb")
+    except FileNotFoundError:
+        raise Http404("Export has expired")
+    return FileResponse(handle, as_attachment=True, filename=job.filename, content_type=job.content_type or None)
@@ -11,8 +11,11 @@ import openpyxl
 from openpyxl import Workbook
 from django.views.generic import TemplateView
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from ..models import Mentor, Mentee, MentorMentee, Profile, ReminderLog, Notification, InternshipPBL, CertificationCourse, AY, SEM_CHOICES, YEAR_CHOICES, DIVISION
-from ..utils import get_document_progress
+from ..models import Mentor, Mentee, MentorMentee, Profile, ReminderLog, Notification, InternshipPBL, CertificationCourse, SEM_CHOICES, YEAR_CHOICES, DIVISION
+from ..academic_years import filter_years
+from .. import analytics_cache
+from ..utils import get_document_progress, get_document_progress_bulk
+from ..export_jobs import export_job
 from reportlab.lib.pagesizes import A4, landscape
 from reportlab.pdfgen import canvas
 from reportlab.lib import colors
@@ -29,8 +32,23 @@ def _build_hod_dashboard_data():
     """
     Central function: build all analytics used by dashboard + exports.
     Returns a dict with the same structure used by the template.
+
+    Mappings are loaded in one query and document progress is read in bulk from
+    MenteeProgress, so the number of queries does not grow with cohort size.
     """
-    mentors_qs = Mentor.objects.all()
+    mentors_qs = list(Mentor.objects.all())
+
+    mappings_by_mentor = {}
+    mappings = list(
+        MentorMentee.objects
+        .select_related("mentee__user__profile")
+        .order_by("mentor_id", "id")
+    )
+    for mapping in mappings:
+        mappings_by_mentor.setdefault(mapping.mentor_id, []).append(mapping)
+
+    progress_by_user = get_document_progress_bulk(m.mentee.user_id for m in mappings)
+
     mentor_stats = []
     mentees_list = []
 
@@ -40,18 +58,18 @@ def _build_hod_dashboard_data():
     not_started_count = 0
 
     for mentor in mentors_qs:
-        mappings = MentorMentee.objects.filter(mentor=mentor).select_related("mentee__user")
-        mentor_total = mappings.count()
+        mentor_mappings = mappings_by_mentor.get(mentor.pk, [])
+        mentor_total = len(mentor_mappings)
         mentor_ready = 0
         mentor_partial = 0
         mentor_not_started = 0
         mentor_progress_sum = 0
 
-        for mapping in mappings:
+        for mapping in mentor_mappings:
             user = mapping.mentee.user
-            profile = Profile.objects.filter(user=user).first()
+            profile = getattr(user, "profile", None)
 
-            completed, total, has_pending = get_document_progress(user)
+            completed, total, has_pending = progress_by_user[user.id]
             progress_percent = int((completed / total) * 100) if total else 0
 
             total_mentees += 1
@@ -86,7 +104,7 @@ def _build_hod_dashboard_data():
                 "email": getattr(profile, "email", "") if profile else user.email,
                 "phone": profile.contact_number if profile else "",
                 "mentor_name": mentor.name,
-                "department": profile.branch,
+                "department": profile.branch if profile else "",
                 "progress": f"{completed}/{total}",
                 "progress_percent": progress_percent,
                 "readiness": readiness,
@@ -107,7 +125,7 @@ def _build_hod_dashboard_data():
     placement_ready_percent = int((ready_count / total_mentees) * 100) if total_mentees else 0
 
     return {
-        "total_mentors": mentors_qs.count(),
+        "total_mentors": len(mentors_qs),
         "total_mentees": total_mentees,
         "ready_count": ready_count,
         "partial_count": partial_count,
@@ -201,7 +219,8 @@ def hod_remind_all_pending(request):
         return redirect("hod_dashboard")
 
     # Collect ALL mentees that exist in mappings (across all mentors)
-    mappings = MentorMentee.objects.select_related("mentee__user", "mentor").all()
+    mappings = MentorMentee.objects.select_related("mentee__user__profile", "mentor").all()
+    progress_by_user = get_document_progress_bulk(mappings.values_list("mentee__user_id", flat=True))
 
     sent_count = 0
     skipped_completed = 0
@@ -213,9 +232,9 @@ def hod_remind_all_pending(request):
         user = mentee.user
         mentor = mm.mentor
 
-        profile = Profile.objects.filter(user=user).first()
+        profile = getattr(user, "profile", None)
 
-        completed, total, has_pending = get_document_progress(user)
+        completed, total, has_pending = progress_by_user[user.pk]
 
         # Skip if already complete
         if total and completed == total:
@@ -275,259 +294,275 @@ def hod_remind_all_pending(request):
     return redirect("hod_dashboard")
 
 
-class HODDashboardView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
-    template_name = "hod/dashboard.html"
+HOD_FILTER_PARAMS = ("ay", "branch", "year", "div", "semester", "domain", "upload_type")
 
-    def test_func(self):
-        # Admin (HOD) only
-        return self.request.user.is_staff
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
+def _build_hod_filtered_data(params):
+    """Filtered upload analytics of the HOD dashboard (ay, branch, year, div, semester, domain, upload_type)."""
+    data = {}
 
-        data = _build_hod_dashboard_data()
-        context.update(data)
+    # ---------------- FILTER INPUTS ----------------
+    ay = params.get("ay")
+    branch = params.get("branch")
+    year = params.get("year")
+    div = params.get("div")
+    sem = params.get("semester")
+    domain = params.get("domain")
+    upload_type = params.get("upload_type")  # internship | certification | all
 
-        request = self.request
+    # ---------------- PROFILE FILTER ----------------
+    profiles = Profile.objects.select_related("user")
 
-        # ---------------- FILTER INPUTS ----------------
-        ay = request.GET.get("ay")
-        branch = request.GET.get("branch")
-        year = request.GET.get("year")
-        div = request.GET.get("div")
-        sem = request.GET.get("semester")
-        domain = request.GET.get("domain")
-        upload_type = request.GET.get("upload_type")  # internship | certification | all
+    if branch:
+        profiles = profiles.filter(branch=branch)
 
-        # ---------------- PROFILE FILTER ----------------
-        profiles = Profile.objects.select_related("user")
+    if year:
+        profiles = profiles.filter(year=year)
 
-        if branch:
-            profiles = profiles.filter(branch=branch)
+    if div:
+        profiles = profiles.filter(div=div)
 
-        if year:
-            profiles = profiles.filter(year=year)
+    if sem:
+        profiles = profiles.filter(semester=sem)
 
-        if div:
-            profiles = profiles.filter(div=div)
+    # ✅ FORCE evaluation (important)
+    user_ids = list(profiles.values_list("user_id", flat=True))
 
-        if sem:
-            profiles = profiles.filter(semester=sem)
+    # ---------------- INTERNSHIPS ----------------
+    internships = InternshipPBL.objects.filter(user_id__in=user_ids)
 
-        # ✅ FORCE evaluation (important)
-        user_ids = list(profiles.values_list("user_id", flat=True))
+    if ay:
+        internships = internships.filter(academic_year=ay)
 
-        # ---------------- INTERNSHIPS ----------------
-        internships = InternshipPBL.objects.filter(user_id__in=user_ids)
+    if domain:
+        internships = internships.filter(domain__icontains=domain)
 
-        if ay:
-            internships = internships.filter(academic_year=ay)
+    # ---------------- CERTIFICATIONS ----------------
+    certs = CertificationCourse.objects.filter(user_id__in=user_ids)
 
-        if domain:
-            internships = internships.filter(domain__icontains=domain)
+    if ay:
+        certs = certs.filter(academic_year=ay)
 
-        # ---------------- CERTIFICATIONS ----------------
-        certs = CertificationCourse.objects.filter(user_id__in=user_ids)
+    if domain:
+        certs = certs.filter(domain__icontains=domain)
 
-        if ay:
-            certs = certs.filter(academic_year=ay)
+    # ---------------- TOTAL COUNTS ----------------
+    data["internship_count"] = internships.count()
+    data["certification_count"] = certs.count()
 
-        if domain:
-            certs = certs.filter(domain__icontains=domain)
+    # ---------------- INTERNSHIP DOMAIN ----------------
+    data["internship_domain_stats"] = list(
+        internships.values("domain")
+        .annotate(total=Count("id"))
+        .order_by("-total")
+    )
 
-        # ---------------- TOTAL COUNTS ----------------
-        context["internship_count"] = internships.count()
-        context["certification_count"] = certs.count()
+    # ---------------- INTERNSHIP TYPE ----------------
+    data["internship_type_stats"] = list(
+        internships.values("type")
+        .annotate(total=Count("id"))
+        .order_by("-total")
+    )
 
-        # ---------------- INTERNSHIP DOMAIN ----------------
-        context["internship_domain_stats"] = list(
-            internships.values("domain")
-            .annotate(total=Count("id"))
-            .order_by("-total")
-        )
+    # ---------------- CERT DOMAIN ----------------
+    data["cert_domain_stats"] = list(
+        certs.values("domain")
+        .annotate(total=Count("id"))
+        .order_by("-total")
+    )
+    # ---------------- APPLY UPLOAD TYPE FILTER ----------------
 
-        # ---------------- INTERNSHIP TYPE ----------------
-        context["internship_type_stats"] = list(
-            internships.values("type")
-            .annotate(total=Count("id"))
-            .order_by("-total")
-        )
+    if upload_type == "internship":
+        upload_user_ids = list(internships.values_list("user_id", flat=True))
 
-        # ---------------- CERT DOMAIN ----------------
-        context["cert_domain_stats"] = list(
-            certs.values("domain")
-            .annotate(total=Count("id"))
-            .order_by("-total")
+    elif upload_type == "certification":
+        upload_user_ids = list(certs.values_list("user_id", flat=True))
+
+    else:  # all
+        upload_user_ids = (
+                list(internships.values_list("user_id", flat=True)) +
+                list(certs.values_list("user_id", flat=True))
         )
-        # ---------------- APPLY UPLOAD TYPE FILTER ----------------
 
-        if upload_type == "internship":
-            upload_user_ids = list(internships.values_list("user_id", flat=True))
+    upload_profiles = Profile.objects.filter(user_id__in=upload_user_ids)
+    data["upload_compare"] = {
+        "internships": internships.count(),
+        "certifications": certs.count(),
+    }
+    # ---------------- UPLOADS BY BRANCH ----------------
+    data["branch_stats"] = list(
+        upload_profiles.values("branch")
+        .annotate(total=Count("user_id"))
+        .order_by("branch")
+    )
 
-        elif upload_type == "certification":
-            upload_user_ids = list(certs.values_list("user_id", flat=True))
+    # ---------------- UPLOADS BY SEMESTER ----------------
+    data["semester_stats"] = list(
+        upload_profiles.values("semester")
+        .annotate(total=Count("user_id"))
+        .order_by("semester")
+    )
 
-        else:  # all
-            upload_user_ids = (
-                    list(internships.values_list("user_id", flat=True)) +
-                    list(certs.values_list("user_id", flat=True))
-            )
+    # ---------------- UPLOADS BY DIVISION ----------------
+    data["division_stats"] = list(
+        upload_profiles.values("div")
+        .annotate(total=Count("user_id"))
+        .order_by("div")
+    )
 
-        upload_profiles = Profile.objects.filter(user_id__in=upload_user_ids)
-        context["upload_compare"] = {
-            "internships": internships.count(),
-            "certifications": certs.count(),
-        }
-        # ---------------- UPLOADS BY BRANCH ----------------
-        context["branch_stats"] = list(
-            upload_profiles.values("branch")
-            .annotate(total=Count("user_id"))
-            .order_by("branch")
-        )
+    # ---------------- UPLOADS BY CLASS ----------------
+    data["year_stats"] = list(
+        upload_profiles.values("year")
+        .annotate(total=Count("user_id"))
+        .order_by("year")
+    )
 
-        # ---------------- UPLOADS BY SEMESTER ----------------
-        context["semester_stats"] = list(
-            upload_profiles.values("semester")
-            .annotate(total=Count("user_id"))
-            .order_by("semester")
-        )
+    # ---------------- DROPDOWNS ----------------
+    data["AY"] = [(y, y) for y in filter_years(branch=branch)]
+    data["SEM_CHOICES"] = SEM_CHOICES
+    data["YEAR_CHOICES"] = YEAR_CHOICES
+    data["DIVISION"] = DIVISION
 
-        # ---------------- UPLOADS BY DIVISION ----------------
-        context["division_stats"] = list(
-            upload_profiles.values("div")
-            .annotate(total=Count("user_id"))
-            .order_by("div")
-        )
+    internship_branch = internships.values("user__profile__branch").annotate(total=Count("id"))
+    cert_branch = certs.values("user__profile__branch").annotate(total=Count("id"))
 
-        # ---------------- UPLOADS BY CLASS ----------------
-        context["year_stats"] = list(
-            upload_profiles.values("year")
-            .annotate(total=Count("user_id"))
-            .order_by("year")
-        )
+    branch_map = {}
+
+    for i in internship_branch:
+        branch_map[i["user__profile__branch"]] = {
+            "internship": i["total"],
+            "certification": 0
+        }
 
-        # ---------------- DROPDOWNS ----------------
-        context["AY"] = AY
-        context["SEM_CHOICES"] = SEM_CHOICES
-        context["YEAR_CHOICES"] = YEAR_CHOICES
-        context["DIVISION"] = DIVISION
+    for c in cert_branch:
+        branch = c["user__profile__branch"]
+        branch_map.setdefault(branch, {"internship": 0, "certification": 0})
+        branch_map[branch]["certification"] = c["total"]
 
-        internship_branch = internships.values("user__profile__branch").annotate(total=Count("id"))
-        cert_branch = certs.values("user__profile__branch").annotate(total=Count("id"))
+    data["stacked_branch"] = branch_map
+
+    ay_stats = (
+        internships.values("academic_year")
+        .annotate(total=Count("id"))
+        .order_by("academic_year")
+    )
 
-        branch_map = {}
+    data["ay_upload_trends"] = list(ay_stats)
+    ay_cert = certs.values("academic_year").annotate(total=Count("id"))
 
-        for i in internship_branch:
-            branch_map[i["user__profile__branch"]] = {
-                "internship": i["total"],
-                "certification": 0
-            }
+    ay_map = {}
 
-        for c in cert_branch:
-            branch = c["user__profile__branch"]
-            branch_map.setdefault(branch, {"internship": 0, "certification": 0})
-            branch_map[branch]["certification"] = c["total"]
+    for a in ay_stats:
+        ay_map[a["academic_year"]] = {"internship": a["total"], "certification": 0}
 
-        context["stacked_branch"] = branch_map
+    for a in ay_cert:
+        ay_map.setdefault(a["academic_year"], {"internship": 0, "certification": 0})
+        ay_map[a["academic_year"]]["certification"] = a["total"]
 
-        ay_stats = (
-            internships.values("academic_year")
-            .annotate(total=Count("id"))
-            .order_by("academic_year")
+    # Sort academic years ascending (2023-24 → 2024-25 → 2025-26)
+    sorted_ay_map = dict(
+        sorted(
+            ay_map.items(),
+            key=lambda x: int(x[0].split("-")[0])
         )
+    )
 
-        context["ay_upload_trends"] = list(ay_stats)
-        ay_cert = certs.values("academic_year").annotate(total=Count("id"))
+    data["ay_trends"] = sorted_ay_map
 
-        ay_map = {}
+    # =====================================================
+    # BEST DIVISION + TOTAL UPLOADS
+    # =====================================================
 
-        for a in ay_stats:
-            ay_map[a["academic_year"]] = {"internship": a["total"], "certification": 0}
+    best_div = (
+        upload_profiles.values("div", "branch")
+        .annotate(student_count=Count("user_id", distinct=True))
+        .order_by("-student_count")
+        .first()
+    )
 
-        for a in ay_cert:
-            ay_map.setdefault(a["academic_year"], {"internship": 0, "certification": 0})
-            ay_map[a["academic_year"]]["certification"] = a["total"]
+    if best_div:
+        div = best_div["div"]
+        branch = best_div["branch"]
 
-        # Sort academic years ascending (2023-24 → 2024-25 → 2025-26)
-        sorted_ay_map = dict(
-            sorted(
-                ay_map.items(),
-                key=lambda x: int(x[0].split("-")[0])
-            )
-        )
+        # count uploads for that division + branch
+        div_users = upload_profiles.filter(div=div, branch=branch).values_list("user_id", flat=True)
 
-        context["ay_trends"] = sorted_ay_map
+        div_internships = internships.filter(user_id__in=div_users).count()
+        div_certs = certs.filter(user_id__in=div_users).count()
 
-        # =====================================================
-        # BEST DIVISION + TOTAL UPLOADS
-        # =====================================================
+        best_div["uploads"] = div_internships + div_certs
+    else:
+        best_div = {"div": "", "branch": "", "student_count": 0, "uploads": 0}
 
-        best_div = (
-            upload_profiles.values("div", "branch")
-            .annotate(student_count=Count("user_id", distinct=True))
-            .order_by("-student_count")
-            .first()
-        )
+    data["best_division"] = best_div
 
-        if best_div:
-            div = best_div["div"]
-            branch = best_div["branch"]
+    # =====================================================
+    # TOP 5 STUDENTS BY UPLOADS (AY aware)
+    # =====================================================
 
-            # count uploads for that division + branch
-            div_users = upload_profiles.filter(div=div, branch=branch).values_list("user_id", flat=True)
+    from collections import defaultdict
 
-            div_internships = internships.filter(user_id__in=div_users).count()
-            div_certs = certs.filter(user_id__in=div_users).count()
+    student_map = defaultdict(int)
 
-            best_div["uploads"] = div_internships + div_certs
-        else:
-            best_div = {"div": "", "branch": "", "student_count": 0, "uploads": 0}
+    # Count internships
+    for row in internships.values("user_id").annotate(c=Count("id")):
+        student_map[row["user_id"]] += row["c"]
 
-        context["best_division"] = best_div
+    # Count certifications
+    for row in certs.values("user_id").annotate(c=Count("id")):
+        student_map[row["user_id"]] += row["c"]
 
-        # =====================================================
-        # TOP 5 STUDENTS BY UPLOADS (AY aware)
-        # =====================================================
+    # Sort by uploads desc
+    top_user_ids = sorted(student_map, key=lambda k: student_map[k], reverse=True)[:5]
 
-        from collections import defaultdict
+    profiles_top = Profile.objects.filter(user_id__in=top_user_ids)
 
-        student_map = defaultdict(int)
+    top_students = []
 
-        # Count internships
-        for row in internships.values("user_id").annotate(c=Count("id")):
-            student_map[row["user_id"]] += row["c"]
+    for p in profiles_top:
+        top_students.append({
+            "moodle_id": p.moodle_id,
+            "student_name": p.student_name,
+            "branch": p.branch,
+            "year": p.year,
+            "div": p.div,
+            "total": student_map.get(p.user_id, 0)
+        })
 
-        # Count certifications
-        for row in certs.values("user_id").annotate(c=Count("id")):
-            student_map[row["user_id"]] += row["c"]
+    # sort again after profile join
+    top_students = sorted(top_students, key=lambda x: x["total"], reverse=True)
 
-        # Sort by uploads desc
-        top_user_ids = sorted(student_map, key=lambda k: student_map[k], reverse=True)[:5]
+    data["top_students"] = top_students
+    data["max_uploads"] = top_students[0]["total"] if top_students else 1
 
-        profiles_top = Profile.objects.filter(user_id__in=top_user_ids)
+    return data
 
-        top_students = []
 
-        for p in profiles_top:
-            top_students.append({
-                "moodle_id": p.moodle_id,
-                "student_name": p.student_name,
-                "branch": p.branch,
-                "year": p.year,
-                "div": p.div,
-                "total": student_map.get(p.user_id, 0)
-            })
+class HODDashboardView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
+    template_name = "hod/dashboard.html"
 
-        # sort again after profile join
-        top_students = sorted(top_students, key=lambda x: x["total"], reverse=True)
+    def test_func(self):
+        # Admin (HOD) only
+        return self.request.user.is_staff
 
-        context["top_students"] = top_students
-        context["max_uploads"] = top_students[0]["total"] if top_students else 1
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+
+        context.update(analytics_cache.get_or_build(
+            "hod_dashboard", {}, [analytics_cache.ALL_SCOPE], _build_hod_dashboard_data,
+        ))
+
+        params = {k: self.request.GET.get(k) for k in HOD_FILTER_PARAMS}
+        context.update(analytics_cache.get_or_build(
+            "hod_dashboard_filtered", params, [analytics_cache.department_scope(params["branch"])],
+            lambda: _build_hod_filtered_data(params),
+        ))
 
         return context
 
 
 @login_required
+@export_job()
 def hod_export_filtered(request):
     ay = request.GET.get("ay")
     branch = request.GET.get("branch")
@@ -550,8 +585,8 @@ def hod_export_filtered(request):
 
     user_ids = list(profiles.values_list("user_id", flat=True))
 
-    internships = InternshipPBL.objects.filter(user_id__in=user_ids)
-    certs = CertificationCourse.objects.filter(user_id__in=user_ids)
+    internships = InternshipPBL.objects.filter(user_id__in=user_ids).select_related("user__profile")
+    certs = CertificationCourse.objects.filter(user_id__in=user_ids).select_related("user__profile")
 
     if ay:
         internships = internships.filter(academic_year=ay)
@@ -573,7 +608,7 @@ def hod_export_filtered(request):
     ws1.append(headers)
 
     for i in internships:
-        p = Profile.objects.filter(user=i.user).first()
+        p = getattr(i.user, "profile", None) if i.user else None
         ws1.append([
             p.moodle_id if p else "",
             p.student_name if p else "",
@@ -596,7 +631,7 @@ def hod_export_filtered(request):
     ws2.append(headers2)
 
     for c in certs:
-        p = Profile.objects.filter(user=c.user).first()
+        p = getattr(c.user, "profile", None) if c.user else None
         ws2.append([
             p.moodle_id if p else "",
             p.student_name if p else "",
@@ -662,6 +697,7 @@ def hod_export_filtered(request):
 
 @login_required
 @user_passes_test(lambda u: u.is_superuser)
+@export_job()
 def hod_export_excel(request):
     data = _build_hod_dashboard_data()
     mentees = data["mentees_list"]
@@ -723,6 +759,7 @@ def hod_export_excel(request):
 
 @login_required
 @user_passes_test(lambda u: u.is_superuser)
+@export_job()
 def hod_export_pdf(request):
     data = _build_hod_dashboard_data()
     mentees = data["mentees_list"]
@@ -14,7 +14,7 @@ from ..models import (Profile, Msg, Conversation, Reply, InternshipPBL, Project,
                       CertificationCourse, PaperPublication, SelfAssessment, LongTermGoal, SubjectOfInterest,
                       EducationalDetail, SemesterResult, Meeting, Mentor, Mentee, StudentInterest, Query,
                       MentorMenteeInteraction, MentorMentee, StudentProfileOverview, Notification)
-from ..utils import compute_profile_completeness, mentee_required
+from ..utils import compute_profile_completeness, mentee_required, decode_cursor
 from ..auth_otp import (
     REG_MENTEE_OTP_SESSION_KEY,
     OTP_DIGITS,
@@ -42,13 +42,13 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.mixins import UserPassesTestMixin
 from django.db.models import Count, Q
 from ..render import Render
+from ..zip_stream import zip_response
+from .. import chat_changes, chat_framing, chat_membership
+from ..chat_history import HISTORY_PAGE_SIZE, HISTORY_MAX_PAGE_SIZE, history_page, serialize_reply
 from django.http import HttpResponse, Http404, JsonResponse, HttpResponseForbidden, FileResponse
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
 from django.views.decorators.http import require_POST
 from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
-import zipfile
 from collections import defaultdict
 import calendar
 from PIL import Image
@@ -777,21 +777,11 @@ def download_all_certificates(request):
         return HttpResponse("No certificates available.")
 
     zip_filename = f"{request.user.username}_{request.user.profile.student_name}_internship_certificates.zip"
-    zip_path = os.path.join(settings.MEDIA_ROOT, zip_filename)
-
-    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        for item in internships:
-            if item.certificate:
-                file_path = item.certificate.path
-                file_name = os.path.basename(file_path)
-                zipf.write(file_path, file_name)
-
-    with open(zip_path, 'rb') as f:
-        response = HttpResponse(f.read(), content_type='application/zip')
-        response['Content-Disposition'] = f'attachment; filename="{zip_filename}"'
-
-    os.remove(zip_path)
-    return response
+    entries = (
+        (item.certificate.path, os.path.basename(item.certificate.path))
+        for item in internships if item.certificate
+    )
+    return zip_response(entries, zip_filename)
 
 
 @login_required
@@ -898,21 +888,11 @@ def download_all_sports_cultural(request):
         return HttpResponse("No sports & cultural certificates available.")
 
     zip_filename = f"{request.user.username}_{request.user.profile.student_name}_sports_cultural_certificates.zip"
-    zip_path = os.path.join(settings.MEDIA_ROOT, zip_filename)
-
-    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        for item in events:
-            if item.certificate:
-                file_path = item.certificate.path
-                file_name = os.path.basename(file_path)
-                zipf.write(file_path, file_name)
-
-    with open(zip_path, 'rb') as f:
-        response = HttpResponse(f.read(), content_type='application/zip')
-        response['Content-Disposition'] = f'attachment; filename="{zip_filename}"'
-
-    os.remove(zip_path)
-    return response
+    entries = (
+        (item.certificate.path, os.path.basename(item.certificate.path))
+        for item in events if item.certificate
+    )
+    return zip_response(entries, zip_filename)
 
 
 @login_required
@@ -1002,21 +982,11 @@ def download_all_other_events(request):
         return HttpResponse("No other event certificates available.")
 
     zip_filename = f"{request.user.username}_{request.user.profile.student_name}_other-events_certificates.zip"
-    zip_path = os.path.join(settings.MEDIA_ROOT, zip_filename)
-
-    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        for item in events:
-            if item.certificate:
-                file_path = item.certificate.path
-                file_name = os.path.basename(file_path)
-                zipf.write(file_path, file_name)
-
-    with open(zip_path, 'rb') as f:
-        response = HttpResponse(f.read(), content_type='application/zip')
-        response['Content-Disposition'] = f'attachment; filename="{zip_filename}"'
-
-    os.remove(zip_path)
-    return response
+    entries = (
+        (item.certificate.path, os.path.basename(item.certificate.path))
+        for item in events if item.certificate
+    )
+    return zip_response(entries, zip_filename)
 
 
 @login_required
@@ -1089,21 +1059,11 @@ def download_all_certifications(request):
         return HttpResponse("No certification certificates available.")
 
     zip_filename = f"{request.user.username}_{request.user.profile.student_name}_certification-courses_certificates.zip"
-    zip_path = os.path.join(settings.MEDIA_ROOT, zip_filename)
-
-    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        for item in certifications:
-            if item.certificate:
-                file_path = item.certificate.path
-                file_name = os.path.basename(file_path)
-                zipf.write(file_path, file_name)
-
-    with open(zip_path, 'rb') as f:
-        response = HttpResponse(f.read(), content_type='application/zip')
-        response['Content-Disposition'] = f'attachment; filename="{zip_filename}"'
-
-    os.remove(zip_path)
-    return response
+    entries = (
+        (item.certificate.path, os.path.basename(item.certificate.path))
+        for item in certifications if item.certificate
+    )
+    return zip_response(entries, zip_filename)
 
 
 @login_required
@@ -1166,21 +1126,11 @@ def download_all_publications(request):
         return HttpResponse("No publication certificates available.")
 
     zip_filename = f"{request.user.username}_{request.user.profile.student_name}_publications_certificates.zip"
-    zip_path = os.path.join(settings.MEDIA_ROOT, zip_filename)
-
-    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        for item in publications:
-            if item.certificate:
-                file_path = item.certificate.path
-                file_name = os.path.basename(file_path)
-                zipf.write(file_path, file_name)
-
-    with open(zip_path, 'rb') as f:
-        response = HttpResponse(f.read(), content_type='application/zip')
-        response['Content-Disposition'] = f'attachment; filename="{zip_filename}"'
-
-    os.remove(zip_path)
-    return response
+    entries = (
+        (item.certificate.path, os.path.basename(item.certificate.path))
+        for item in publications if item.certificate
+    )
+    return zip_response(entries, zip_filename)
 
 
 @login_required
@@ -1391,22 +1341,12 @@ def download_all_semester_marksheets(request):
         return HttpResponse("No marksheets available.")
 
     zip_filename = f"{request.user.username}_{request.user.profile.student_name}_semester_marksheets.zip"
-    zip_path = os.path.join(settings.MEDIA_ROOT, zip_filename)
-
-    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        for item in semesters:
-            if item.marksheet:
-                file_path = item.marksheet.path
-                # Optional: make filename more meaningful
-                filename_in_zip = f"{request.user.username}_Sem-{item.semester}_marksheet{os.path.splitext(file_path)[1]}"
-                zipf.write(file_path, filename_in_zip)
-
-    with open(zip_path, 'rb') as f:
-        response = HttpResponse(f.read(), content_type="application/zip")
-        response["Content-Disposition"] = f'attachment; filename="{zip_filename}"'
-
-    os.remove(zip_path)
-    return response
+    # Optional: make filename more meaningful
+    entries = (
+        (item.marksheet.path, f"{request.user.username}_Sem-{item.semester}_marksheet{os.path.splitext(item.marksheet.path)[1]}")
+        for item in semesters if item.marksheet
+    )
+    return zip_response(entries, zip_filename)
 
 
 @login_required
@@ -1525,20 +1465,11 @@ def download_all_uploaded_documents_aggregated(request):
         return HttpResponse("No documents available.")
 
     zip_filename = f"{request.user.username}_{request.user.profile.student_name}_ALL_UPLOADED_DOCUMENTS.zip"
-    zip_path = os.path.join(settings.MEDIA_ROOT, zip_filename)
-
-    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zipf:
-        for category, file_path in documents:
-            if os.path.exists(file_path):
-                filename = f"{category}_{os.path.basename(file_path)}".replace(" ", "_")
-                zipf.write(file_path, filename)
-
-    with open(zip_path, "rb") as f:
-        response = HttpResponse(f.read(), content_type="application/zip")
-        response["Content-Disposition"] = f'attachment; filename="{zip_filename}"'
-
-    os.remove(zip_path)
-    return response
+    entries = (
+        (file_path, f"{category}_{os.path.basename(file_path)}".replace(" ", "_"))
+        for category, file_path in documents
+    )
+    return zip_response(entries, zip_filename)
 #-----------------Uploaded documents page logic ends------------------
 
 
@@ -1776,6 +1707,10 @@ class ConversationDetailView(LoginRequiredMixin, UserPassesTestMixin, DetailView
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["is_mentor_view"] = False
+        # seq first: a change committed while the page loads is then replayed (renderMessage drops duplicates)
+        context["chat_seq"] = chat_changes.latest_seq(self.object.pk)
+        context["replies"], context["history_cursor"] = history_page(self.object.pk)
+        context["chat_short_keys"] = chat_framing.SHORT_KEYS
         return context
 
 
@@ -1822,10 +1757,55 @@ def con(request, pk):
     else:
         form = ChatReplyForm()
 
+    chat_seq = chat_changes.latest_seq(conv.pk)  # before the page, see ConversationDetailView
+    replies, history_cursor = history_page(conv.pk)
     return render(request, 'menti/conversation1.html', {
         'conv': conv,
         'form': form,
         'is_mentor_view': False,
+        'replies': replies,
+        'history_cursor': history_cursor,
+        'chat_seq': chat_seq,
+        'chat_short_keys': chat_framing.SHORT_KEYS,
+    })
+
+
+def _chat_access_denied(request, conversation_id):
+    """403 response unless the user takes part in the conversation (cached membership), 404 if it does not exist."""
+    members = chat_membership.participants(conversation_id)
+    if members is None:
+        raise Http404("Conversation not found")
+    if request.user.pk not in members:
+        return HttpResponseForbidden("Not a participant of this conversation")
+    return None
+
+
+@login_required
+def chat_history(request, pk):
+    """
+    Older messages of a conversation, for lazy loading on scroll.
+    ?before=<cursor> continues from the previous page's next_cursor; ?limit= caps the page size.
+    """
+    denied = _chat_access_denied(request, pk)
+    if denied:
+        return denied
+
+    before = None
+    if request.GET.get("before"):
+        try:
+            before = decode_cursor(request.GET["before"])
+        except ValueError:
+            return JsonResponse({"error": "invalid cursor"}, status=400)
+    try:
+        limit = min(max(int(request.GET.get("limit", HISTORY_PAGE_SIZE)), 1), HISTORY_MAX_PAGE_SIZE)
+    except ValueError:
+        limit = HISTORY_PAGE_SIZE
+
+    replies, next_cursor = history_page(pk, before=before, limit=limit)
+    return JsonResponse({
+        "messages": [serialize_reply(r) for r in replies],
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None,
     })
 
 
@@ -1835,38 +1815,29 @@ def upload_reply(request, pk):
     if request.method != "POST":
         return JsonResponse({"error": "Invalid request"}, status=400)
 
-    conv = get_object_or_404(Conversation, pk=pk)
+    denied = _chat_access_denied(request, pk)
+    if denied:
+        return denied
 
     text = request.POST.get("reply", "")
     uploaded_file = request.FILES.get("file")
 
     reply = Reply.objects.create(
-        conversation=conv,
+        conversation_id=pk,
         sender=request.user,
         reply=text or "",
         file=uploaded_file if uploaded_file else None,
         replied_at=timezone.now()
     )
 
-    # Prepare broadcast payload
-    payload = {
-        "id": reply.id,
-        "sender_id": reply.sender.id,
-        "text": reply.reply,
-        "file_url": reply.file.url if reply.file else None,
-        "replied_at": reply.replied_at.isoformat(),
-        "seen_count": reply.seen_by.count(),
-    }
+    # Prepare broadcast payload (nobody's watermark can be past a reply that was just created)
+    payload = serialize_reply(reply)
 
-    # Broadcast to WebSocket group
-    channel_layer = get_channel_layer()
-    async_to_sync(channel_layer.group_send)(
-        f"conversation_{pk}",
-        {
-            "type": "new_message",
-            "message": payload
-        }
-    )
+    # Broadcast to WebSocket group (through the change log, so reconnecting clients catch up)
+    chat_changes.publish(pk, {
+        "type": "new_message",
+        "message": payload
+    })
 
     # Return HTTP response (so AJAX doesn't show alert)
     return JsonResponse({
@@ -1887,7 +1858,7 @@ def edit_reply(request, pk):
         return JsonResponse({"status": "error", "message": "POST only"}, status=405)
 
     r = get_object_or_404(Reply, pk=pk)
-    if r.sender != request.user:
+    if r.sender_id != request.user.pk:
         return HttpResponseForbidden("Not allowed")
 
     new_text = request.POST.get("reply", "")
@@ -1899,8 +1870,8 @@ def edit_reply(request, pk):
 
     payload = {
         "id": r.id,
-        "sender_id": r.sender.id,
-        "sender_username": getattr(r.sender, "username", ""),
+        "sender_id": r.sender_id,
+        "sender_username": request.user.username,  # the sender, checked above
         "text": r.reply,
         "file_url": r.file.url if getattr(r, "file", None) else None,
         "replied_at": r.replied_at.isoformat() if r.replied_at else None,
@@ -1909,16 +1880,10 @@ def edit_reply(request, pk):
     }
 
     # broadcast edited_message
-    channel_layer = get_channel_layer()
-    group_name = f"conversation_{r.conversation.pk}"
-
-    async_to_sync(channel_layer.group_send)(
-        group_name,
-        {
-            "type": "edited_message",
-            "message": payload
-        }
-    )
+    chat_changes.publish(r.conversation_id, {
+        "type": "edited_message",
+        "message": payload
+    })
 
     return JsonResponse({"status": "ok", "text": payload["text"], "replied_at": payload["replied_at"], "edited": True})
 
@@ -1934,18 +1899,16 @@ def delete_reply(request, pk):
 
     r = get_object_or_404(Reply, pk=pk)
     # permission check: allow sender or conversation owner (adjust if needed)
-    if r.sender != request.user:
+    if r.sender_id != request.user.pk:
         return HttpResponseForbidden("Not allowed")
 
     payload = {"id": r.id}
-    conv_pk = r.conversation.pk
+    conv_pk = r.conversation_id
     # soft-delete or delete; here we delete
     r.delete()
 
     # broadcast deleted_message
-    channel_layer = get_channel_layer()
-    group_name = f"conversation_{conv_pk}"
-    async_to_sync(channel_layer.group_send)(group_name, {
+    chat_changes.publish(conv_pk, {
         "type": "deleted_message",
         "message": payload
     })
@@ -3,7 +3,6 @@ import uuid
 import base64
 from django.core.mail import send_mail
 from django.shortcuts import render, redirect, get_object_or_404
-import io
 from django.utils.decorators import method_decorator
 import os
 import re
@@ -27,6 +26,15 @@ from ..models import (Profile, Msg, Conversation, Reply, Meeting, Mentor, Mentee
                       PaperPublication, SemesterResult, SportsCulturalEvent, CertificationCourse, OtherEvent, Project,
                       MentorMenteeInteraction, Notification, ReminderLog, WeeklyAgenda)
 from ..utils import get_document_progress, mentor_required, mentor_or_staff_required
+from ..zip_stream import zip_response, filefield_path
+from ..export_jobs import export_job, report_progress
+from ..cohort import mentor_cohort, mentor_reminder_counts, cohort_documents
+from ..academic_years import catalogue_years, filter_years
+from ..analytics_cache import cached_json, request_mentor_scope
+from ..achievements import branch_totals
+from ..pivot import CHART_MODELS, CohortPivot, mentor_user_ids
+from .. import chat_changes, chat_framing
+from ..chat_history import history_page
 from django.views.decorators.csrf import csrf_exempt
 from mentee.ai_utils import generate_ai_summary
 from datetime import datetime, timedelta
@@ -74,7 +82,6 @@ from reportlab.lib.pagesizes import A4
 from reportlab.platypus import (SimpleDocTemplate, Table as RLTable, TableStyle as RLTableStyle, Paragraph, Spacer, Image as RLImage, PageBreak)
 from reportlab.lib import colors
 from reportlab.lib.units import cm
-from itertools import chain
 from reportlab.graphics.shapes import Drawing
 from reportlab.graphics.charts.lineplots import LinePlot
 
@@ -102,43 +109,23 @@ class AccountView(LoginRequiredMixin, UserPassesTestMixin, View):
         return super().handle_no_permission()
 
     def get(self, request):
-        # --- MESSAGE REMINDERS ---
-        unapproved_messages = Msg.objects.filter(
-            receipient=request.user,
-            is_approved=False
-        ).count()
+        mentor = get_object_or_404(Mentor.objects.select_related("user"), user=request.user)
 
-        # --- QUERY REMINDERS ---
-        mentor = get_object_or_404(Mentor, user=request.user)
-        pending_queries = Query.objects.filter(
-            mentor=mentor,
-            status__in=["pending", "open"]
-        ).count()
-
-        # --- MEETING REMINDERS ---
-        pending_meetings = [
-            m for m in Meeting.objects.filter(mentor=mentor, status='scheduled')
-            if m.meeting_end_datetime > timezone.localtime(timezone.now())
-        ]
-        pending_meetings_count = len(pending_meetings)
+        # --- MESSAGE / QUERY / MEETING REMINDERS ---
+        counts = mentor_reminder_counts(mentor)
 
         form = MoodleIdForm()
-        mentor = get_object_or_404(Mentor, user=request.user)
-
-        mentee_mappings = MentorMentee.objects.filter(mentor=mentor).select_related("mentee__user")
 
         mentees = []
         no_document_mentees = []
 
-        for mapping in mentee_mappings:
-            user = mapping.mentee.user
-            profile = Profile.objects.filter(user=user).first()
-
-            completed_count, total_required, has_pending = get_document_progress(user)
+        for member in mentor_cohort(mentor):
+            user, profile = member["user"], member["profile"]
+            completed_count, total_required = member["completed"], member["total"]
             progress_percent = int((completed_count / total_required) * 100)
 
             mentee_data = {
-                "id": mapping.mentee.pk,
+                "id": member["mentee"].pk,
                 "moodle_id": profile.moodle_id if profile else "",
                 "name": profile.student_name if profile else user.username,
                 "semester": profile.semester if profile else "",
@@ -146,7 +133,7 @@ class AccountView(LoginRequiredMixin, UserPassesTestMixin, View):
                 "progress": f"{completed_count}/{total_required}",
                 "progress_percent": progress_percent,
                 "has_any_document": completed_count > 0,
-                "has_pending": has_pending,
+                "has_pending": member["has_pending"],
             }
 
             mentees.append(mentee_data)
@@ -159,9 +146,9 @@ class AccountView(LoginRequiredMixin, UserPassesTestMixin, View):
             "mentees": mentees,
             "no_document_mentees": no_document_mentees,
             "pending_reminder_count": pending_reminder_count,
-            "unapproved_messages": unapproved_messages,
-            "pending_queries": pending_queries,
-            "pending_meetings": pending_meetings_count,
+            "unapproved_messages": counts["unapproved_messages"],
+            "pending_queries": counts["pending_queries"],
+            "pending_meetings": counts["pending_meetings"],
         })
 
     def post(self, request):
@@ -242,20 +229,14 @@ def remind_mentee(request, mentee_id):
 def remind_all_mentees(request):
     mentor = get_object_or_404(Mentor, user=request.user)
 
-    mentee_mappings = MentorMentee.objects.filter(mentor=mentor).select_related(
-        "mentee__user", "mentee__user__profile"
-    )
-
     reminded_count = 0
 
-    for mapping in mentee_mappings:
-        mentee = mapping.mentee
-        user = mentee.user
-
-        completed_count, total_required, has_pending = get_document_progress(user)
+    for member in mentor_cohort(mentor):
+        mentee = member["mentee"]
+        user = member["user"]
 
         # Skip mentees with no pending documents
-        if not has_pending:
+        if not member["has_pending"]:
             continue
 
         # ✅ 1. Save Notification
@@ -538,24 +519,22 @@ def mentee_documents(request):
 
     mentor = get_object_or_404(Mentor, user=request.user)
 
-    mentee_mappings = MentorMentee.objects.filter(mentor=mentor).select_related("mentee__user")
     mentees = []
     mentee_map = {}  # moodle_id(str) -> {"user": user, "name": name}
 
-    for mapping in mentee_mappings:
-        profile = Profile.objects.filter(user=mapping.mentee.user).first()
-        if not profile or not profile.moodle_id:
+    for member in mentor_cohort(mentor, with_progress=False):
+        if not member["moodle_id"]:
             continue
 
-        moodle_str = str(profile.moodle_id).strip()
-        name = (profile.student_name or mapping.mentee.user.username)
+        moodle_str = member["moodle_id"]
+        name = (member["profile"].student_name or member["user"].username)
 
         mentees.append({
-            "user_id": mapping.mentee.user.id,
+            "user_id": member["user"].id,
             "moodle_id": moodle_str,
             "name": name,
         })
-        mentee_map[moodle_str] = {"user": mapping.mentee.user, "name": name}
+        mentee_map[moodle_str] = {"user": member["user"], "name": name}
 
     if request.method == "POST":
         selected_moodles = [m.strip() for m in request.POST.getlist("moodle_ids") if m.strip()]
@@ -591,39 +570,30 @@ def mentee_documents(request):
                         "is_available": is_available,
                     })
 
-                # Build docs for each selected mentee
+                # Build docs for each selected mentee (one query per document type for all of them)
+                moodle_by_user = {}
                 for moodle_id in selected_moodles:
-                    mentee_user = mentee_map[moodle_id]["user"]
-                    mentee_name = mentee_map[moodle_id]["name"]
-
                     selected_mentees_info.append({
                         "moodle_id": moodle_id,
-                        "name": mentee_name,
+                        "name": mentee_map[moodle_id]["name"],
                     })
+                    moodle_by_user[mentee_map[moodle_id]["user"].pk] = moodle_id
 
-                    for item in InternshipPBL.objects.filter(user=mentee_user):
-                        add_doc(moodle_id, mentee_name, item.certificate,
-                                item.title or "Internship / PBL Certificate", "Internship / PBL", "internship", item.pk)
-
-                    for item in SportsCulturalEvent.objects.filter(user=mentee_user):
-                        add_doc(moodle_id, mentee_name, item.certificate,
-                                item.name_of_event or "Sports / Cultural Event", "Sports / Cultural", "sports", item.pk)
-
-                    for item in OtherEvent.objects.filter(user=mentee_user):
-                        add_doc(moodle_id, mentee_name, item.certificate,
-                                item.name_of_event or "Other Event", "Other Event", "other", item.pk)
-
-                    for item in CertificationCourse.objects.filter(user=mentee_user):
-                        add_doc(moodle_id, mentee_name, item.certificate,
-                                item.title or "Certification Course", "Course", "course", item.pk)
-
-                    for item in PaperPublication.objects.filter(user=mentee_user):
-                        add_doc(moodle_id, mentee_name, item.certificate,
-                                item.title or "Paper Publication", "Publication", "publication", item.pk)
-
-                    for item in SemesterResult.objects.filter(user=mentee_user):
-                        add_doc(moodle_id, mentee_name, item.marksheet,
-                                f"Semester {item.semester} Marksheet", "Semester Result", "semester", item.pk)
+                selected_users = [mentee_map[m]["user"] for m in dict.fromkeys(selected_moodles)]
+                for mentee_user, dtype, dtype_key, item, file in cohort_documents(selected_users):
+                    moodle_id = moodle_by_user[mentee_user.pk]
+                    mentee_name = mentee_map[moodle_id]["name"]
+                    if dtype == "Semester Result":
+                        label = f"Semester {item.semester} Marksheet"
+                    elif dtype in ("Sports / Cultural", "Other Event"):
+                        label = item.name_of_event or ("Sports / Cultural Event" if dtype == "Sports / Cultural" else "Other Event")
+                    else:
+                        label = item.title or {
+                            "Internship / PBL": "Internship / PBL Certificate",
+                            "Course": "Certification Course",
+                            "Publication": "Paper Publication",
+                        }[dtype]
+                    add_doc(moodle_id, mentee_name, file, label, dtype, dtype_key, item.pk)
 
                 # Optional: stable ordering (group by mentee then type then name)
                 documents.sort(key=lambda d: (d["owner_moodle"], d["type"], (d["name"] or "")))
@@ -643,14 +613,12 @@ def download_all_documents(request):
         return redirect("mentee_documents")
 
     mentor = get_object_or_404(Mentor, user=request.user)
-    mappings = MentorMentee.objects.filter(mentor=mentor).select_related("mentee__user")
 
-    # Build {moodle_id: user}
+    # Build {moodle_id: member}
     mentees = {}
-    for mapping in mappings:
-        profile = Profile.objects.filter(user=mapping.mentee.user).first()
-        if profile and profile.moodle_id:
-            mentees[str(profile.moodle_id).strip()] = mapping.mentee.user
+    for member in mentor_cohort(mentor, with_progress=False):
+        if member["moodle_id"]:
+            mentees[member["moodle_id"]] = member
 
     download_scope = request.POST.get("download_scope", "selected")  # "all" or "selected"
     selected_moodles = [m.strip() for m in request.POST.getlist("moodle_ids") if m.strip()]  # multi-select
@@ -695,83 +663,55 @@ def download_all_documents(request):
         return "/".join(safe_name(part) for part in (path or "").split("/"))
 
     def try_add(filefield, arcname):
-        if not filefield:
-            return
-        try:
-            fs_path = filefield.path
-        except Exception:
-            return
+        fs_path = filefield_path(filefield)
         if fs_path and os.path.exists(fs_path):
             files_to_zip.append((fs_path, arcname))
 
-    for moodle in target_moodles:
-        mentee_user = mentees[moodle]
-        profile = Profile.objects.filter(user=mentee_user).first()
+    folder_by_user = {}
+    for moodle in dict.fromkeys(target_moodles):
+        member = mentees[moodle]
+        profile = member["profile"]
         student_name = (getattr(profile, "student_name", "") or getattr(profile, "name", "") or "Student").strip()
 
         # Put each mentee into its own folder in the zip
-        base_folder = safe_name(f"{moodle}_{student_name}")
-
-        if "Internship / PBL" in allowed_types:
-            for item in InternshipPBL.objects.filter(user=mentee_user):
-                title = safe_name((item.title or "").strip()[:40])
-                try_add(item.certificate, f"{base_folder}/Internship_PBL/{title or 'certificate'}_{os.path.basename(item.certificate.name)}")
-
-        if "Sports / Cultural" in allowed_types:
-            for item in SportsCulturalEvent.objects.filter(user=mentee_user):
-                ev = safe_name((item.name_of_event or "").strip()[:40])
-                try_add(item.certificate, f"{base_folder}/Sports_Cultural/{ev or 'certificate'}_{os.path.basename(item.certificate.name)}")
-
-        if "Other Event" in allowed_types:
-            for item in OtherEvent.objects.filter(user=mentee_user):
-                ev = safe_name((item.name_of_event or "").strip()[:40])
-                try_add(item.certificate, f"{base_folder}/Other_Event/{ev or 'certificate'}_{os.path.basename(item.certificate.name)}")
-
-        if "Course" in allowed_types:
-            for item in CertificationCourse.objects.filter(user=mentee_user):
-                title = safe_name((item.title or "").strip()[:40])
-                try_add(item.certificate, f"{base_folder}/Course/{title or 'certificate'}_{os.path.basename(item.certificate.name)}")
-
-        if "Publication" in allowed_types:
-            for item in PaperPublication.objects.filter(user=mentee_user):
-                title = safe_name((item.title or "").strip()[:40])
-                try_add(item.certificate, f"{base_folder}/Publication/{title or 'certificate'}_{os.path.basename(item.certificate.name)}")
-
-        if "Semester Result" in allowed_types:
-            for item in SemesterResult.objects.filter(user=mentee_user):
-                sem = safe_name(str(item.semester or ""))
-                try_add(item.marksheet, f"{base_folder}/Semester_Result/Sem_{sem}_{os.path.basename(item.marksheet.name)}")
+        folder_by_user[member["user"].pk] = safe_name(f"{moodle}_{student_name}")
+
+    folders = {
+        "Internship / PBL": "Internship_PBL",
+        "Sports / Cultural": "Sports_Cultural",
+        "Other Event": "Other_Event",
+        "Course": "Course",
+        "Publication": "Publication",
+        "Semester Result": "Semester_Result",
+    }
+    target_users = [mentees[m]["user"] for m in dict.fromkeys(target_moodles)]
+    for mentee_user, dtype, _, item, file in cohort_documents(target_users, types=allowed_types):
+        if not file:
+            continue
+        base_folder = folder_by_user[mentee_user.pk]
+        if dtype == "Semester Result":
+            sem = safe_name(str(item.semester or ""))
+            try_add(file, f"{base_folder}/{folders[dtype]}/Sem_{sem}_{os.path.basename(file.name)}")
+            continue
+        if dtype in ("Sports / Cultural", "Other Event"):
+            label = safe_name((item.name_of_event or "").strip()[:40])
+        else:
+            label = safe_name((item.title or "").strip()[:40])
+        try_add(file, f"{base_folder}/{folders[dtype]}/{label or 'certificate'}_{os.path.basename(file.name)}")
 
     if not files_to_zip:
         messages.info(request, "No documents available for the selected mentee(s) and filter.")
         return redirect("mentee_documents")
 
-    # Create zip in-memory
-    buffer = io.BytesIO()
-    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
-        used = set()
-        for fs_path, arcname in files_to_zip:
-            arcname = safe_path(arcname)  # IMPORTANT: keep slashes
-
-            candidate = arcname
-            base, ext = os.path.splitext(candidate)
-            i = 1
-            while candidate in used:
-                candidate = f"{base}_{i}{ext}"
-                i += 1
-            used.add(candidate)
-
-            zf.write(fs_path, arcname=candidate)
-
-    buffer.seek(0)
-
     # filename
     scope_label = "ALL" if download_scope == "all" else "SELECTED"
     zip_filename = f"{scope_label}_mentees_documents.zip"
 
-    response = HttpResponse(buffer.read(), content_type="application/zip")
-    response["Content-Disposition"] = f'attachment; filename="{zip_filename}"'
-    return response
+    # Stream the archive instead of building it in memory
+    return zip_response(
+        ((fs_path, safe_path(arcname)) for fs_path, arcname in files_to_zip),  # IMPORTANT: keep slashes
+        zip_filename,
+    )
 #-------------------Download mentee docs logic ends----------------------
 
 #-----------------Download student data logic starts--------------------
@@ -832,6 +772,7 @@ CATEGORY_MODELS = {
 
 
 @login_required
+@export_job(methods=("POST",))
 def download_student_data(request):
     """
     Mentor-only view to download mentees' data.
@@ -859,7 +800,7 @@ def download_student_data(request):
             ("courses", "Courses / Certifications"),
             ("publications", "Paper Publications"),
         ],
-        "years": [f"{y}-{str(y+1)[-2:]}" for y in range(2017, 2027)],
+        "years": filter_years(mentor=mentor),
         "branches": ["ALL", "IT", "CSE", "AIML", "DS", "MECH", "CIVIL"],
     }
 
@@ -1250,8 +1191,11 @@ def download_student_data(request):
         excel_buf = BytesIO()
         wb.save(excel_buf)
         excel_buf.seek(0)
+        report_progress(request, 35)
         pdf_buf = build_pdf_bytes()
+        report_progress(request, 70)
         csvs = build_csv_and_json()
+        report_progress(request, 85)
 
         zip_buffer = BytesIO()
         with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zf:
@@ -1543,6 +1487,10 @@ class ConversationDetailView(LoginRequiredMixin, UserPassesTestMixin, DetailView
         context = super().get_context_data(**kwargs)
         context["form"] = ChatReplyForm()
         context["is_mentor_view"] = True
+        # seq first: a change committed while the page loads is then replayed (renderMessage drops duplicates)
+        context["chat_seq"] = chat_changes.latest_seq(self.object.pk)
+        context["replies"], context["history_cursor"] = history_page(self.object.pk)
+        context["chat_short_keys"] = chat_framing.SHORT_KEYS
         return context
 
     def post(self, request, *args, **kwargs):
@@ -2149,6 +2097,7 @@ def undo_ai_summary(request, pk):
 
 
 @login_required
+@export_job()
 def export_interactions(request, export_type):
     mentor = get_object_or_404(Mentor, user=request.user)
     qs = MentorMenteeInteraction.objects.filter(mentor=request.user).prefetch_related("mentees__profile")
@@ -2484,67 +2433,15 @@ def export_interactions(request, export_type):
 def student_visualization(request):
     mentor_obj = get_object_or_404(Mentor, user=request.user)
 
-    mentee_user_ids = (
-        MentorMentee.objects
-        .filter(mentor=mentor_obj)
-        .values_list("mentee__user_id", flat=True)
-    )
-
-    internship_data = list(
-        InternshipPBL.objects
-        .filter(user_id__in=mentee_user_ids)
-        .values("user__profile__branch")
-        .annotate(total=Count("id"))
-    )
-
-    project_data = list(
-        Project.objects
-        .filter(user_id__in=mentee_user_ids)
-        .values("user__profile__branch")
-        .annotate(total=Count("id"))
-    )
-
-    sports_data = list(
-        SportsCulturalEvent.objects
-        .filter(user_id__in=mentee_user_ids)
-        .values("user__profile__branch")
-        .annotate(total=Count("id"))
-    )
-
-    course_data = list(
-        CertificationCourse.objects
-        .filter(user_id__in=mentee_user_ids)
-        .values("user__profile__branch")
-        .annotate(total=Count("id"))
-    )
-
-    hackathon_data = list(
-        OtherEvent.objects
-        .filter(user_id__in=mentee_user_ids)
-        .values("user__profile__branch")
-        .annotate(total=Count("id"))
-    )
-
-    paper_data = list(
-        PaperPublication.objects
-        .filter(user_id__in=mentee_user_ids)
-        .values("user__profile__branch")
-        .annotate(total=Count("id"))
-    )
-    # ✅ Collect all academic years from all models
-    year_sets = [
-        InternshipPBL.objects.values_list("academic_year", flat=True),
-        Project.objects.values_list("academic_year", flat=True),
-        SportsCulturalEvent.objects.values_list("academic_year", flat=True),
-        CertificationCourse.objects.values_list("academic_year", flat=True),
-        OtherEvent.objects.values_list("academic_year", flat=True),
-        PaperPublication.objects.values_list("academic_year", flat=True),
-    ]
-
-    academic_years = sorted(
-        set(y for y in chain(*year_sets) if y),
-        reverse=True
-    )
+    # one GROUP BY over the fact table instead of six aggregates + six full year scans
+    totals = branch_totals(mentor_user_ids(mentor_obj))
+    internship_data = totals["internship"]
+    project_data = totals["project"]
+    sports_data = totals["sports"]
+    course_data = totals["course"]
+    hackathon_data = totals["other"]
+    paper_data = totals["paper"]
+    academic_years = catalogue_years(mentor=mentor_obj, newest_first=True)
 
     return render(request, "mentor/student_visualization.html", {
         "internship_data": internship_data,
@@ -2558,56 +2455,20 @@ def student_visualization(request):
 
 
 @login_required
+@cached_json("get_chart_data", request_mentor_scope)
 def get_chart_data(request):
     mentor_obj = get_object_or_404(Mentor, user=request.user)
 
     category = request.GET.get("category")
     academic_year = request.GET.get("year")
 
-    model_map = {
-        "internship": InternshipPBL,
-        "project": Project,
-        "sports": SportsCulturalEvent,
-        "course": CertificationCourse,
-        "other": OtherEvent,
-        "paper": PaperPublication,
-    }
-
-    model = model_map.get(category)
+    model = CHART_MODELS.get(category)
     if not model:
         return JsonResponse({"labels": [], "data": []})
 
-    # ✅ Only this mentor’s mentees
-    mentee_user_ids = (
-        MentorMentee.objects
-        .filter(mentor=mentor_obj)
-        .values_list("mentee__user_id", flat=True)
-    )
-
-    qs = model.objects.filter(user_id__in=mentee_user_ids)
-
-    if academic_year:
-        qs = qs.filter(academic_year=academic_year)
-
-    # ✅ GROUP BY STUDENT (not department)
-    data = (
-        qs.values(
-            "user_id",
-            "user__profile__student_name",
-            "user__username",
-            "user__profile__branch",
-        )
-        .annotate(count=Count("id"))
-        .order_by("user__profile__student_name")
-    )
-
-    labels = [
-        d["user__profile__student_name"]
-        or d["user__username"]
-        for d in data
-    ]
-
-    counts = [d["count"] for d in data]
+    # ✅ Only this mentor’s mentees, GROUP BY STUDENT (not department)
+    pivot = CohortPivot.for_category(category, mentor_user_ids(mentor_obj), year=academic_year)
+    labels, counts = pivot.student_totals()
 
     return JsonResponse({
         "labels": labels,
@@ -2628,16 +2489,19 @@ def export_department_students_excel(request):
     if not category or not student_name:
         return HttpResponse("Missing category or student", status=400)
 
-    model_map = {
-        "internship": (InternshipPBL, "Internships_PBL"),
-        "project": (Project, "Projects"),
-        "sports": (SportsCulturalEvent, "Sports_Cultural"),
-        "course": (CertificationCourse, "Courses_Certifications"),
-        "other": (OtherEvent, "Other_Achievements"),
-        "paper": (PaperPublication, "Paper_Publications"),
+    category_labels = {
+        "internship": "Internships_PBL",
+        "project": "Projects",
+        "sports": "Sports_Cultural",
+        "course": "Courses_Certifications",
+        "other": "Other_Achievements",
+        "paper": "Paper_Publications",
     }
+    if category not in CHART_MODELS:
+        return HttpResponse("Unknown category", status=400)
 
-    Model, category_label = model_map[category]
+    # the sheet lists individual records, so it reads the raw table rather than AchievementFact
+    Model, category_label = CHART_MODELS[category], category_labels[category]
 
     mentee_users = User.objects.filter(
         id__in=MentorMentee.objects.filter(
@@ -2649,7 +2513,7 @@ def export_department_students_excel(request):
     if not mentee_users.exists():
         return HttpResponse("Student not found", status=404)
 
-    qs = Model.objects.filter(user__in=mentee_users)
+    qs = Model.objects.filter(user__in=mentee_users).select_related("user__profile")
 
     if academic_year:
         qs = qs.filter(academic_year=academic_year)
@@ -2725,125 +2589,39 @@ def export_department_students_excel(request):
 
 
 @login_required
+@cached_json("get_chart_data_compare", request_mentor_scope)
 def get_chart_data_compare(request):
     mentor_obj = get_object_or_404(Mentor, user=request.user)
     category = request.GET.get("category")
 
-    model_map = {
-        "internship": InternshipPBL,
-        "project": Project,
-        "sports": SportsCulturalEvent,
-        "course": CertificationCourse,
-        "other": OtherEvent,
-        "paper": PaperPublication,
-    }
-
-    model = model_map.get(category)
+    model = CHART_MODELS.get(category)
     if not model:
         return JsonResponse({"labels": [], "datasets": []})
 
-    mentee_user_ids = (
-        MentorMentee.objects
-        .filter(mentor=mentor_obj)
-        .values_list("mentee__user_id", flat=True)
-    )
-
-    qs = model.objects.filter(user_id__in=mentee_user_ids)
-
-    years = sorted(qs.values_list("academic_year", flat=True).distinct())
-
-    # ✅ STUDENTS instead of departments
-    students = list(
-        qs.values(
-            "user_id",
-            "user__profile__student_name",
-            "user__username"
-        ).distinct()
-    )
-
-    labels = years  # X-axis = years
-    datasets = []
-
-    for s in students:
-        student_label = s["user__profile__student_name"] or s["user__username"]
-        data = []
-
-        for year in years:
-            count = qs.filter(
-                user_id=s["user_id"],
-                academic_year=year
-            ).count()
-            data.append(count)
-
-        datasets.append({
-            "label": student_label,
-            "data": data
-        })
+    pivot = CohortPivot.for_category(category, mentor_user_ids(mentor_obj))
 
     return JsonResponse({
-        "labels": labels,     # years on X-axis
-        "datasets": datasets # one line per student
+        "labels": pivot.years,         # years on X-axis
+        "datasets": pivot.series(),    # one line per student
     })
 
 
 @login_required
+@cached_json("get_heatmap_data", request_mentor_scope)
 def get_heatmap_data(request):
     mentor_obj = get_object_or_404(Mentor, user=request.user)
     category = request.GET.get("category")
 
-    model_map = {
-        "internship": InternshipPBL,
-        "project": Project,
-        "sports": SportsCulturalEvent,
-        "course": CertificationCourse,
-        "other": OtherEvent,
-        "paper": PaperPublication,
-    }
-
-    model = model_map.get(category)
+    model = CHART_MODELS.get(category)
     if not model:
         return JsonResponse({"years": [], "students": [], "matrix": []})
 
-    mentee_user_ids = (
-        MentorMentee.objects
-        .filter(mentor=mentor_obj)
-        .values_list("mentee__user_id", flat=True)
-    )
-
-    qs = model.objects.filter(user_id__in=mentee_user_ids)
-
-    years = sorted(qs.values_list("academic_year", flat=True).distinct())
-
-    students = list(
-        qs.values(
-            "user_id",
-            "user__profile__student_name",
-            "user__username"
-        ).distinct()
-    )
-
-    student_labels = [
-        s["user__profile__student_name"] or s["user__username"]
-        for s in students
-    ]
-
-    matrix = []
-
-    for year in years:
-        row = []
-        for s in students:
-            row.append(
-                qs.filter(
-                    user_id=s["user_id"],
-                    academic_year=year
-                ).count()
-            )
-        matrix.append(row)
+    pivot = CohortPivot.for_category(category, mentor_user_ids(mentor_obj))
 
     return JsonResponse({
-        "years": years,
-        "students": student_labels,
-        "matrix": matrix
+        "years": pivot.years,
+        "students": pivot.labels,
+        "matrix": pivot.heatmap(),
     })
 
 
@@ -2954,6 +2732,7 @@ def generate_performance_insights(user, mentor_user):
 
 
 @login_required
+@export_job()
 def export_progress_pdf(request):
     mentor_obj = get_object_or_404(Mentor, user=request.user)
     mentor_name = mentor_obj.name or request.user.username
@@ -3077,17 +2856,7 @@ def export_progress_pdf(request):
     # =====================================================
     # COLLECT ALL YEARS
     # =====================================================
-    year_sets = [
-        InternshipPBL.objects.values_list("academic_year", flat=True),
-        Project.objects.values_list("academic_year", flat=True),
-        SportsCulturalEvent.objects.values_list("academic_year", flat=True),
-        CertificationCourse.objects.values_list("academic_year", flat=True),
-        PaperPublication.objects.values_list("academic_year", flat=True),
-        OtherEvent.objects.values_list("academic_year", flat=True),
-        SemesterResult.objects.values_list("academic_year", flat=True),
-    ]
-
-    all_years = sorted(set(y for y in chain(*year_sets) if y))
+    all_years = catalogue_years(mentor=mentor_obj)
 
     # =====================================================
     # PER STUDENT PAGES
@@ -3283,6 +3052,7 @@ def export_progress_pdf(request):
 
 
 @login_required
+@export_job()
 def export_progress_excel(request):
     mentor_obj = get_object_or_404(Mentor, user=request.user)
     mentor_name = mentor_obj.name or request.user.username
@@ -3356,17 +3126,7 @@ def export_progress_excel(request):
     # =====================================================
     # COLLECT YEARS
     # =====================================================
-    year_sets = [
-        InternshipPBL.objects.values_list("academic_year", flat=True),
-        Project.objects.values_list("academic_year", flat=True),
-        SportsCulturalEvent.objects.values_list("academic_year", flat=True),
-        CertificationCourse.objects.values_list("academic_year", flat=True),
-        PaperPublication.objects.values_list("academic_year", flat=True),
-        OtherEvent.objects.values_list("academic_year", flat=True),
-        SemesterResult.objects.values_list("academic_year", flat=True),
-    ]
-
-    all_years = sorted(set(y for y in chain(*year_sets) if y))
+    all_years = catalogue_years(mentor=mentor_obj)
 
     # =====================================================
     # PER STUDENT SHEETS
@@ -3514,81 +3274,22 @@ def export_progress_excel(request):
 
 
 @login_required
+@cached_json("get_department_trends", request_mentor_scope)
 def get_department_trends(request):
     mentor_obj = get_object_or_404(Mentor, user=request.user)
     category = request.GET.get("category")
 
-    model_map = {
-        "internship": InternshipPBL,
-        "project": Project,
-        "sports": SportsCulturalEvent,
-        "course": CertificationCourse,
-        "other": OtherEvent,
-        "paper": PaperPublication,
-    }
-
-    model = model_map.get(category)
+    model = CHART_MODELS.get(category)
     if not model:
         return JsonResponse({})
 
-    mentee_user_ids = MentorMentee.objects.filter(
-        mentor=mentor_obj
-    ).values_list("mentee__user_id", flat=True)
-
-    qs = model.objects.filter(user_id__in=mentee_user_ids)
-
-    years = sorted(qs.values_list("academic_year", flat=True).distinct())
-
-    if len(years) < 2:
-        return JsonResponse({})
-
-    current = years[-1]
-    previous = years[-2]
-
-    trends = {}
-    percentages = {}
-
-    students = qs.values(
-        "user_id",
-        "user__profile__student_name",
-        "user__username"
-    ).distinct()
-
-    for s in students:
-        student_label = s["user__profile__student_name"] or s["user__username"]
-
-        curr_count = qs.filter(
-            user_id=s["user_id"],
-            academic_year=current
-        ).count()
-
-        prev_count = qs.filter(
-            user_id=s["user_id"],
-            academic_year=previous
-        ).count()
-
-        if curr_count > prev_count:
-            trends[student_label] = "up"
-        elif curr_count < prev_count:
-            trends[student_label] = "down"
-        else:
-            trends[student_label] = "same"
-
-        percentages[student_label] = round(
-            ((curr_count - prev_count) / max(prev_count, 1)) * 100,
-            1
-        )
-
-    return JsonResponse({
-        "current": current,
-        "previous": previous,
-        "trends": trends,
-        "percentages": percentages
-    })
+    trends = CohortPivot.for_category(category, mentor_user_ids(mentor_obj)).trends()
+    return JsonResponse(trends or {})
 
 
 @login_required
 @csrf_exempt
+@export_job(methods=("POST",))
 def export_filtered_progress_pdf(request):
     mentor_obj = get_object_or_404(Mentor, user=request.user)
 
@@ -3815,6 +3516,7 @@ def export_filtered_progress_pdf(request):
 
 @login_required
 @csrf_exempt
+@export_job(methods=("POST",))
 def export_filtered_progress_excel(request):
     # ---------- SECURITY ----------
     if request.method != "POST":
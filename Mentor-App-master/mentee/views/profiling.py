@@ -0,0 +1,34 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
+from django.shortcuts import render
+from .. import analytics_cache, profiling
+
+
+@staff_member_required
+def view_profile_report(request):
+    """Views ranked by p95 latency (or ?sort=queries|avg|requests); ?format=json for the raw data."""
+    try:
+        hours = max(1, min(int(request.GET.get("hours", 24)), 24 * 30))
+    except ValueError:
+        hours = 24
+    sort = request.GET.get("sort", "p95")
+
+    # include what is still sitting in this process's ring buffer
+    profiling.get_buffer().flush()
+    rows = profiling.build_report(hours=hours, sort=sort)
+
+    if request.GET.get("format") == "json":
+        return JsonResponse({"hours": hours, "sort": sort, "views": rows})
+    return render(request, "admin/view-profile.html", {"rows": rows, "hours": hours, "sort": sort})
+
+
+@staff_member_required
+def analytics_cache_stats(request):
+    """Hit / miss / 304 counters of the analytics cache in this process; POST resets them."""
+    if request.method == "POST":
+        analytics_cache.reset_stats()
+    return JsonResponse({
+        "enabled": analytics_cache.enabled(),
+        "backend": analytics_cache.get_cache().__class__.__name__,
+        "stats": analytics_cache.stats(),
+    })
@@ -0,0 +1,96 @@
+import io
+import os
+import zipfile
+from django.http import StreamingHttpResponse
+
+# Formats that are already compressed; deflating them again only costs CPU.
+STORED_EXTENSIONS = {
+    ".pdf", ".jpg", ".jpeg", ".png", ".gif", ".webp",
+    ".zip", ".docx", ".xlsx", ".pptx", ".mp4", ".mp3",
+}
+
+CHUNK_SIZE = 64 * 1024
+
+
+class _ZipSink(io.RawIOBase):
+    """Write-only, non-seekable buffer that ZipFile streams into; drained after every chunk."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _unique_name(arcname, used):
+    candidate = arcname
+    base, ext = os.path.splitext(arcname)
+    i = 1
+    while candidate in used:
+        candidate = f"{base}_{i}{ext}"
+        i += 1
+    used.add(candidate)
+    return candidate
+
+
+def iter_zip(entries, chunk_size=CHUNK_SIZE):
+    """
+    Yields a ZIP archive of `entries` ((fs_path, arcname) pairs) piece by piece.
+    Only one chunk of one file is held in memory at a time, plus the central directory.
+    Missing files are skipped and duplicate arcnames get a _1, _2 ... suffix.
+    """
+    sink = _ZipSink()
+    used = set()
+
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as zf:
+        for fs_path, arcname in entries:
+            if not fs_path or not os.path.isfile(fs_path):
+                continue
+
+            zinfo = zipfile.ZipInfo.from_file(fs_path, _unique_name(arcname, used))
+            ext = os.path.splitext(fs_path)[1].lower()
+            zinfo.compress_type = zipfile.ZIP_STORED if ext in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+
+            with open(fs_path, "rb") as src, zf.open(zinfo, "w") as dst:
+                while True:
+                    chunk = src.read(chunk_size)
+                    if not chunk:
+                        break
+                    dst.write(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+
+            data = sink.drain()
+            if data:
+                yield data
+
+    # central directory, written when the ZipFile closes
+    yield sink.drain()
+
+
+def zip_response(entries, filename):
+    """StreamingHttpResponse that sends `entries` as a ZIP download named `filename`."""
+    response = StreamingHttpResponse(iter_zip(entries), content_type="application/zip")
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+def filefield_path(filefield):
+    """Filesystem path of a FileField value, or None if empty / not on local storage."""
+    if not filefield:
+        return None
+    try:
+        return filefield.path
+    except (ValueError, NotImplementedError):
+        return None
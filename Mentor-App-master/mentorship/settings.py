@@ -72,6 +72,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'mentee.middleware.ViewProfilingMiddleware',
     'mentee.middleware.RequestCaptureMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -178,6 +179,85 @@ MEDIA_URL = '/media/'
 
 SESSION_INACTIVITY_TIMEOUT_IN_SECONDS = 100
 
+# Background exports (mentee/export_jobs.py). Off by default: exports are built inline until a deployment
+# runs `python manage.py run_export_worker` alongside the web server and sets this to True.
+EXPORT_JOBS_ASYNC = False
+EXPORT_JOB_TTL_SECONDS = 30 * 60
+EXPORT_WORKER_PROCESSES = 2
+
+# Activity log writer (mentee/audit.py): rows are buffered per request and bulk-inserted.
+ACTIVITY_LOG_BATCHING = True
+ACTIVITY_LOG_BUFFER_SIZE = 500
+ACTIVITY_LOG_ASYNC = False          # True = write batches from a background thread
+ACTIVITY_LOG_MODULES = None         # e.g. ["Msg", "Authentication"]; None logs every module
+ACTIVITY_LOG_EXCLUDE_MODULES = []   # e.g. ["Notification"]
+
+# Activity log archive (mentee/log_archive.py, `manage.py cleanup_activity_logs`)
+ACTIVITY_LOG_HOT_DAYS = 90
+ACTIVITY_LOG_ARCHIVE_DIR = BASE_DIR / 'log_archive'
+
+# Per-view profiling (mentee/profiling.py); report at /admin/view-profile/
+VIEW_PROFILING = False
+VIEW_PROFILING_BUFFER_SIZE = 1000
+VIEW_PROFILING_FLUSH_SECONDS = 60
+
+# Analytics cache (mentee/analytics_cache.py); counters at /admin/analytics-cache/
+# For several nodes point "analytics" at a shared backend, e.g.
+#   "BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": "redis://127.0.0.1:6379/1"
+# or django.core.cache.backends.filebased.FileBasedCache with a LOCATION directory.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "analytics": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "analytics",
+        "TIMEOUT": 600,
+        "OPTIONS": {"MAX_ENTRIES": 2000},
+    },
+    # shared by the web and the socket processes (the Redis of CHANNEL_LAYERS); chat state that one
+    # process writes and another reads lives here
+    "chat": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": "redis://127.0.0.1:6379/2",
+    },
+}
+ANALYTICS_CACHE_ENABLED = True
+ANALYTICS_CACHE_ALIAS = "analytics"
+
+# Chat receipt micro-batching (mentee/chat_batching.py)
+CHAT_RECEIPT_BATCHING = True
+CHAT_BATCH_WINDOW_MS = 250
+CHAT_BATCH_MAX_PENDING = 200
+
+# Chat change log for reconnect catch-up (mentee/chat_changes.py)
+CHAT_CHANGELOG_MAX_EVENTS = 1000
+CHAT_CHANGELOG_RETENTION_HOURS = 72
+CHAT_CHANGELOG_MAX_REPLAY = 500
+
+# Text replies sent over the chat socket (mentee/chat_messages.py)
+CHAT_MAX_MESSAGE_LENGTH = 5000
+
+# Cached conversation participants for chat authorisation (mentee/chat_membership.py).
+# Must be shared: the HTTP process invalidates what the socket process reads.
+CHAT_MEMBERSHIP_CACHE_ALIAS = "chat"
+CHAT_MEMBERSHIP_TTL = 3600
+
+# Presence registry of the chat sockets (mentee/chat_presence.py); shared so that sockets on
+# different workers see each other
+CHAT_PRESENCE_CACHE_ALIAS = "chat"
+CHAT_PRESENCE_TTL = 60
+CHAT_PRESENCE_HEARTBEAT = 20
+CHAT_PRESENCE_DIFF_MS = 500
+
+# Typing indicators aggregated per conversation (mentee/chat_typing.py)
+CHAT_TYPING_AGGREGATION = True
+CHAT_TYPING_TICK_MS = 300
+CHAT_TYPING_EXPIRE_MS = 5000
+
+# Chat wire formats negotiated by subprotocol (mentee/chat_framing.py)
+CHAT_FRAME_BATCH_MS = 5
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'